@@ -0,0 +1,199 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from dotenv import load_dotenv
+from fastapi import Depends, Header, HTTPException
+from queries import db_connection, execute, fetch_all, placeholders, register_query
+
+"""
+Tokens de sesión firmados con HMAC-SHA256.
+
+El token lleva el id de usuario, el rol y la expiración, así que las
+rutas protegidas se autentican en memoria sin consultar la tabla User.
+La revocación (logout, cuentas desactivadas) se guarda en TokenRevocation
+y cada worker mantiene una copia en memoria que refresca periódicamente.
+"""
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+AUTH_SECRET = os.getenv("AUTH_SECRET")
+AUTH_TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", 8 * 3600))  # segundos
+AUTH_DENYLIST_REFRESH = float(os.getenv("AUTH_DENYLIST_REFRESH", 30))  # segundos
+
+if not AUTH_SECRET:
+    # sin secreto compartido los tokens sólo son válidos en este proceso
+    logger.warning("AUTH_SECRET no configurado, se usa un secreto temporal")
+    AUTH_SECRET = secrets.token_hex(32)
+
+_SECRET = AUTH_SECRET.encode('utf-8')
+
+register_query("tokens.revocados", """
+    SELECT Jti, UserId, UNIX_TIMESTAMP(RevokedAt) AS RevokedAt
+    FROM TokenRevocation
+    WHERE ExpiresAt > NOW()
+""")
+register_query("tokens.revocar_jti", """
+    INSERT INTO TokenRevocation (Jti, UserId, ExpiresAt)
+    VALUES (%s, %s, FROM_UNIXTIME(%s))
+""")
+register_query("tokens.revocar_usuario", """
+    INSERT INTO TokenRevocation (UserId, ExpiresAt)
+    VALUES (%s, NOW() + INTERVAL %s SECOND)
+""")
+# una fila por usuario existente de la lista, en una sola sentencia
+register_query("tokens.revocar_usuarios", """
+    INSERT INTO TokenRevocation (UserId, ExpiresAt)
+    SELECT UserId, NOW() + INTERVAL %s SECOND FROM `User` WHERE UserId IN ({ids})
+""")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _firmar(body: str) -> str:
+    return _b64encode(hmac.new(_SECRET, body.encode('ascii'), hashlib.sha256).digest())
+
+
+def crear_token(user_id: int, rol: str) -> str:
+    ahora = int(time.time())
+    claims = {
+        "sub": user_id,
+        "rol": rol,
+        "iat": ahora,
+        "exp": ahora + AUTH_TOKEN_TTL,
+        "jti": secrets.token_hex(8),
+    }
+    body = _b64encode(json.dumps(claims, separators=(",", ":")).encode('utf-8'))
+    return f"{body}.{_firmar(body)}"
+
+
+class Denylist:
+    """Copia en memoria de TokenRevocation: jti revocados y usuarios revocados desde una fecha."""
+
+    def __init__(self):
+        self.jtis = set()
+        self.usuarios = {}  # UserId -> epoch desde el que sus tokens no valen
+
+    def revocado(self, claims: dict) -> bool:
+        if claims["jti"] in self.jtis:
+            return True
+        desde = self.usuarios.get(claims["sub"])
+        return desde is not None and claims["iat"] <= desde
+
+    async def refrescar(self, app):
+        async with db_connection(app) as conn:
+            rows = await fetch_all(conn, "tokens.revocados")
+        jtis = set()
+        usuarios = {}
+        for row in rows:
+            if row["Jti"]:
+                jtis.add(row["Jti"])
+            else:
+                usuarios[row["UserId"]] = max(usuarios.get(row["UserId"], 0), int(row["RevokedAt"]))
+        self.jtis = jtis
+        self.usuarios = usuarios
+
+    async def run(self, app):
+        while True:
+            try:
+                await self.refrescar(app)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error al refrescar la lista de tokens revocados: {e}")
+            await asyncio.sleep(AUTH_DENYLIST_REFRESH)
+
+
+denylist = Denylist()
+
+
+async def revocar_token(conn, claims: dict):
+    """Revoca un token concreto (logout), usando la conexión del llamador."""
+    await execute(conn, "tokens.revocar_jti", (claims["jti"], claims["sub"], claims["exp"]))
+    denylist.jtis.add(claims["jti"])
+
+
+async def revocar_usuario(conn, user_id: int):
+    """Invalida todos los tokens emitidos hasta ahora para el usuario."""
+    await execute(conn, "tokens.revocar_usuario", (user_id, AUTH_TOKEN_TTL))
+    denylist.usuarios[user_id] = int(time.time())
+
+
+async def revocar_usuarios(conn, user_ids: list) -> int:
+    """revocar_usuario para varios usuarios a la vez; devuelve cuántos se revocaron."""
+    if not user_ids:
+        return 0
+    result = await execute(
+        conn, "tokens.revocar_usuarios", (AUTH_TOKEN_TTL, *user_ids), ids=placeholders(len(user_ids))
+    )
+    ahora = int(time.time())
+    for user_id in user_ids:
+        denylist.usuarios[user_id] = ahora
+    return result.rowcount
+
+
+def verificar_token(token: str) -> dict:
+    # un token con caracteres no ASCII falla al firmarse (UnicodeEncodeError es
+    # ValueError) o al compararse (TypeError): es tan inválido como una firma errónea
+    try:
+        body, firma = token.split(".")
+        valido = hmac.compare_digest(firma, _firmar(body))
+        claims = json.loads(_b64decode(body)) if valido else None
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=401, detail="Token inválido")
+    if not valido:
+        raise HTTPException(status_code=401, detail="Token inválido")
+    if claims["exp"] < time.time():
+        raise HTTPException(status_code=401, detail="Sesión expirada")
+    if denylist.revocado(claims):
+        raise HTTPException(status_code=401, detail="Sesión revocada")
+    return claims
+
+
+async def usuario_actual(authorization: str = Header(None)) -> dict:
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=401,
+            detail="No autenticado",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return verificar_token(authorization[len("Bearer "):])
+
+
+async def requiere_admin(claims: dict = Depends(usuario_actual)) -> dict:
+    if claims["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="Acceso restringido a administradores")
+    return claims
+
+
+async def requiere_usuario(user_id: int, claims: dict = Depends(usuario_actual)) -> dict:
+    # el user_id de la ruta debe ser el del token (los administradores pueden ver cualquiera)
+    if claims["sub"] != user_id and claims["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No puedes acceder a datos de otro usuario")
+    return claims
+
+
+def start_denylist_refresh(app):
+    app.state.denylist_task = asyncio.create_task(denylist.run(app))
+
+
+async def stop_denylist_refresh(app):
+    task = getattr(app.state, "denylist_task", None)
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
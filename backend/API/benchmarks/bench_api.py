@@ -0,0 +1,333 @@
+"""
+Benchmark de punta a punta de la API: recorre las rutas de main.py (login,
+registro, checkout, wallet, gastos, historial y todos los reportes de
+administración) y reporta por endpoint throughput y latencia p50/p95/p99.
+
+Dos modos:
+  - asgi: la app corre dentro del mismo proceso (httpx.ASGITransport), sin
+    red ni uvicorn; mide el costo de la API y de MySQL.
+  - http: contra una API levantada (--url). Con --procesos N la carga se
+    reparte en N procesos generadores, así el cliente no es el cuello de
+    botella.
+
+Requiere MySQL con DBSubPlatm.sql (o generar_datos.py) y el .env de la API.
+Los usuarios de --email y --admin-email deben existir (contraseña "test" en
+los datos de ejemplo). register, checkout y wallet.recarga escriben: crean
+usuarios bench_*, suscripciones y movimientos en la base usada.
+
+Los resultados se guardan en JSON (--salida) y --comparar marca las
+regresiones entre dos corridas.
+
+Uso (desde backend/API):
+    python -m benchmarks.bench_api --modo asgi --peticiones 200 --concurrencia 20 --salida base.json
+    python -m benchmarks.bench_api --modo http --url http://localhost:8000 --procesos 4 --salida nuevo.json
+    python -m benchmarks.bench_api --solo login,gastos,admin.metricas --salida parcial.json
+    python -m benchmarks.bench_api --comparar base.json nuevo.json --umbral 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import httpx
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    if not valores:
+        return 0
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def escenarios(ctx: dict) -> list:
+    """
+    (nombre, método, ruta, cuerpo, token) de cada endpoint. cuerpo es None,
+    un dict fijo o el nombre de un generador de cuerpo() para los que
+    necesitan datos únicos por petición.
+    """
+    uid = ctx["user_id"]
+    usuario = ctx["token_usuario"]
+    admin = ctx["token_admin"]
+    return [
+        ("raiz", "GET", "/", None, None),
+        ("login", "POST", "/login", {"email": ctx["email"], "password": ctx["password"]}, None),
+        ("register", "POST", "/register", "registro", None),
+        ("checkout", "POST", f"/checkout/{uid}", {
+            "items": [{"service_id": ctx["service_id"], "plant_type": ctx["plan_type"]}],
+            "PaymentMethod": "card",
+        }, usuario),
+        ("wallet.saldo", "GET", f"/wallet/balance/{uid}", None, usuario),
+        ("wallet.movimientos", "GET", f"/wallet/transactions/{uid}", None, usuario),
+        ("wallet.recarga", "POST", f"/wallet/update/{uid}", {"tipo": "recharge", "monto": 1}, usuario),
+        ("metodos_pago", "GET", f"/payment-methods/{uid}", None, usuario),
+        ("gastos", "GET", f"/expenses/{uid}?limit=50", None, usuario),
+        ("gastos.resumen", "GET", f"/expenses/{uid}/summary", None, usuario),
+        ("suscripciones.historial", "GET", f"/subscription/{uid}", None, usuario),
+        ("servicios", "GET", "/admin/servicios", None, usuario),
+        ("admin.metricas", "GET", "/admin/metricas", None, admin),
+        ("admin.usuarios", "GET", "/admin/usuarios?limit=50", None, admin),
+        ("admin.suscripciones", "GET", "/admin/suscripciones?limit=50", None, admin),
+        ("admin.reportes.por_usuario", "GET", "/admin/reportes/suscripciones-por-usuario", None, admin),
+        ("admin.reportes.por_usuario.csv", "GET", "/admin/reportes/suscripciones-por-usuario?format=csv", None, admin),
+        ("admin.reportes.por_categoria", "GET", "/admin/reportes/suscripciones-por-categoria", None, admin),
+        ("admin.reportes.total_ingresos", "GET", "/admin/reportes/total-ingresos", None, admin),
+        ("admin.reportes.resumen", "GET", "/admin/reportes/resumen", None, admin),
+    ]
+
+
+def cuerpo(plantilla):
+    if plantilla == "registro":
+        sufijo = uuid.uuid4().hex[:12]
+        return {
+            "username": f"b{sufijo}",
+            "name": "Bench registro",
+            "email": f"bench_{sufijo}@bench.local",
+            "password": "bench",
+        }
+    return plantilla
+
+
+async def _cargar(client, escenario, peticiones: int, concurrencia: int) -> dict:
+    _, metodo, ruta, plantilla, token = escenario
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    semaforo = asyncio.Semaphore(concurrencia)
+    latencias = []
+    codigos = {}
+
+    async def una():
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                r = await client.request(metodo, ruta, json=cuerpo(plantilla), headers=headers)
+                codigo = str(r.status_code)
+            except httpx.HTTPError as e:
+                codigo = type(e).__name__
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            codigos[codigo] = codigos.get(codigo, 0) + 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*[una() for _ in range(peticiones)])
+    return {"latencias": latencias, "codigos": codigos, "duracion": time.perf_counter() - inicio}
+
+
+def _cargar_en_proceso(url, escenario, peticiones, concurrencia):
+    # punto de entrada de cada proceso generador en modo http
+    async def correr():
+        limites = httpx.Limits(max_connections=concurrencia)
+        async with httpx.AsyncClient(base_url=url, limits=limites, timeout=120) as client:
+            return await _cargar(client, escenario, peticiones, concurrencia)
+    return asyncio.run(correr())
+
+
+def _partes(total: int, n: int) -> list:
+    return [total // n + (1 if i < total % n else 0) for i in range(n)]
+
+
+async def medir(client, escenario, args, pool) -> dict:
+    # el calentamiento va siempre por el cliente de este proceso
+    if args.calentamiento:
+        await _cargar(client, escenario, args.calentamiento, args.concurrencia)
+
+    if pool is None:
+        resultado = await _cargar(client, escenario, args.peticiones, args.concurrencia)
+        latencias, codigos, duracion = resultado["latencias"], resultado["codigos"], resultado["duracion"]
+    else:
+        loop = asyncio.get_running_loop()
+        inicio = time.perf_counter()
+        partes = await asyncio.gather(*[
+            loop.run_in_executor(pool, _cargar_en_proceso, args.url, escenario, peticiones, concurrencia)
+            for peticiones, concurrencia in zip(
+                _partes(args.peticiones, args.procesos),
+                [max(c, 1) for c in _partes(args.concurrencia, args.procesos)],
+            )
+            if peticiones
+        ])
+        duracion = time.perf_counter() - inicio
+        latencias = [ms for parte in partes for ms in parte["latencias"]]
+        codigos = {}
+        for parte in partes:
+            for codigo, n in parte["codigos"].items():
+                codigos[codigo] = codigos.get(codigo, 0) + n
+
+    errores = sum(n for codigo, n in codigos.items() if not (codigo.isdigit() and int(codigo) < 400))
+    return {
+        "peticiones": len(latencias),
+        "errores": errores,
+        "codigos": codigos,
+        "duracion_s": round(duracion, 3),
+        "rps": round(len(latencias) / duracion, 1) if duracion else 0,
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p95_ms": round(percentil(latencias, 95), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        "max_ms": round(max(latencias, default=0), 2),
+    }
+
+
+async def preparar(client, args) -> dict:
+    """Tokens de usuario y administrador y un plan existente para el checkout."""
+    async def login(email):
+        r = await client.post("/login", json={"email": email, "password": args.password})
+        if r.status_code != 200:
+            raise SystemExit(f"No se pudo iniciar sesión con {email}: {r.status_code} {r.text}")
+        return r.json()
+
+    usuario = await login(args.email)
+    admin = await login(args.admin_email)
+    if admin["user_rol"] != "admin":
+        raise SystemExit(f"{args.admin_email} no es administrador")
+    r = await client.get("/admin/servicios", headers={"Authorization": f"Bearer {usuario['token']}"})
+    planes = r.json().get("planes_servicios") or []
+    if not planes:
+        raise SystemExit("No hay planes en el catálogo para el checkout")
+    plan = planes[0]
+    return {
+        "email": args.email,
+        "password": args.password,
+        "user_id": usuario["user_id"],
+        "token_usuario": usuario["token"],
+        "token_admin": admin["token"],
+        "service_id": plan["ServiceId"],
+        "plan_type": plan["PlanType"],
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def imprimir(resultados: dict):
+    print(f"{'endpoint':34} {'pet':>5} {'err':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for nombre, r in resultados.items():
+        print(
+            f"{nombre:34} {r['peticiones']:5} {r['errores']:4} {r['rps']:8.1f} "
+            f"{r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f}"
+        )
+
+
+async def correr(args) -> dict:
+    pool = None
+    if args.modo == "asgi":
+        import main
+        # el lifespan no lo ejecuta ASGITransport: pool, scheduler, outbox, etc.
+        await main.app.router.startup()
+        transporte = httpx.ASGITransport(app=main.app)
+        client = httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=120)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120)
+        if args.procesos > 1:
+            pool = ProcessPoolExecutor(max_workers=args.procesos)
+
+    resultados = {}
+    try:
+        ctx = await preparar(client, args)
+        solo = set(args.solo.split(",")) if args.solo else None
+        for escenario in escenarios(ctx):
+            nombre = escenario[0]
+            if solo and nombre not in solo:
+                continue
+            # con pool, cada proceso abre su propio cliente contra --url
+            r = resultados[nombre] = await medir(client, escenario, args, pool)
+            print(f"  {nombre}: {r['rps']} pet/s, p95 {r['p95_ms']}ms, errores {r['errores']}", file=sys.stderr)
+    finally:
+        await client.aclose()
+        if pool is not None:
+            pool.shutdown()
+        if args.modo == "asgi":
+            await main.app.router.shutdown()
+
+    return {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "modo": args.modo,
+            "url": args.url if args.modo == "http" else None,
+            "peticiones": args.peticiones,
+            "concurrencia": args.concurrencia,
+            "procesos": args.procesos if args.modo == "http" else 1,
+            "calentamiento": args.calentamiento,
+        },
+        "endpoints": resultados,
+    }
+
+
+def comparar(base_ruta: str, nuevo_ruta: str, umbral: float) -> int:
+    """Marca como regresión un p95 o p99 que sube, o un rps que baja, más de umbral %."""
+    with open(base_ruta, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(nuevo_ruta, encoding="utf-8") as f:
+        nuevo = json.load(f)
+    for clave in ("modo", "concurrencia", "procesos"):
+        if base["meta"].get(clave) != nuevo["meta"].get(clave):
+            print(f"AVISO  {clave} distinto: {base['meta'].get(clave)} -> {nuevo['meta'].get(clave)}")
+
+    def cambio(antes, despues):
+        return (despues - antes) / antes * 100 if antes else 0
+
+    regresiones = 0
+    print(f"{'endpoint':34} {'rps':>16} {'p95 ms':>18} {'p99 ms':>18}")
+    for nombre, b in base["endpoints"].items():
+        n = nuevo["endpoints"].get(nombre)
+        if n is None:
+            print(f"{nombre:34} sin datos en {nuevo_ruta}")
+            continue
+        motivos = []
+        if cambio(b["rps"], n["rps"]) < -umbral:
+            motivos.append("rps")
+        for p in ("p95_ms", "p99_ms"):
+            if cambio(b[p], n[p]) > umbral:
+                motivos.append(p[:3])
+        if n["errores"] > b["errores"]:
+            motivos.append("errores")
+        estado = f"REGRESIÓN ({', '.join(motivos)})" if motivos else "ok"
+        regresiones += bool(motivos)
+        print(
+            f"{nombre:34} {b['rps']:7.1f}->{n['rps']:7.1f} "
+            f"{b['p95_ms']:8.1f}->{n['p95_ms']:8.1f} {b['p99_ms']:8.1f}->{n['p99_ms']:8.1f}  {estado}"
+        )
+    print(f"{regresiones} regresiones con umbral {umbral}%")
+    return 1 if regresiones else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modo", choices=["asgi", "http"], default="asgi")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--peticiones", type=int, default=200, help="peticiones por endpoint")
+    parser.add_argument("--concurrencia", type=int, default=20)
+    parser.add_argument("--procesos", type=int, default=1, help="procesos generadores de carga (modo http)")
+    parser.add_argument("--calentamiento", type=int, default=10, help="peticiones previas no medidas")
+    parser.add_argument("--solo", help="endpoints separados por coma")
+    parser.add_argument("--email", default="juan.perez@email.com")
+    parser.add_argument("--admin-email", default="maria.garcia@email.com")
+    parser.add_argument("--password", default="test")
+    parser.add_argument("--salida", help="archivo JSON con los resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="compara dos resultados guardados")
+    parser.add_argument("--umbral", type=float, default=10, help="% de empeoramiento que cuenta como regresión")
+    args = parser.parse_args()
+
+    if args.comparar:
+        sys.exit(comparar(*args.comparar, args.umbral))
+
+    if args.modo == "asgi":
+        # el pool debe admitir la concurrencia pedida sin que la espera por conexión falle
+        os.environ.setdefault("DB_POOL_MAX_SIZE", str(max(args.concurrencia, 10)))
+    resultado = asyncio.run(correr(args))
+    imprimir(resultado["endpoints"])
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
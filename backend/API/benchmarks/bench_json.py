@@ -0,0 +1,175 @@
+"""
+Benchmark de serialización JSON de las respuestas más grandes.
+
+Compara la ruta por defecto de FastAPI (jsonable_encoder + JSONResponse,
+json.dumps de la biblioteca estándar) contra RespuestaJSON (orjson), sobre
+cargas con la forma de:
+  - /admin/reportes/suscripciones-por-usuario (solo texto)
+  - /admin/reportes/suscripciones-por-categoria (Decimal, agrupado)
+  - /admin/suscripciones (Decimal y datetime, una página de 200)
+  - /wallet/transactions (tuplas con Decimal y datetime)
+
+Reporta el tiempo por respuesta, µs por KB de salida y la mejora. Por
+defecto las filas son sintéticas y no hace falta MySQL; con --bd se usan
+las filas reales de la base configurada en el .env.
+
+Uso (desde backend/API):
+    python -m benchmarks.bench_json --filas 5000 --repeticiones 20
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from respuestas import RespuestaJSON
+
+CATEGORIAS = ["Streaming", "Música", "Educación", "Productividad", "Juegos", "Noticias"]
+ESTADOS = ["active", "cancelled", "expired"]
+
+
+def _monto(rnd):
+    return Decimal(rnd.randint(199, 9999)) / 100
+
+
+def _fecha(rnd):
+    return datetime(2024, 1, 1) + timedelta(seconds=rnd.randint(0, 540 * 86400))
+
+
+def cargas_sinteticas(filas: int) -> dict:
+    rnd = random.Random(42)
+    por_usuario = [
+        {
+            "Usuario": f"Usuario {rnd.randint(1, filas)}",
+            "Servicio": f"Servicio {rnd.randint(1, 200)}",
+            "Categoria": rnd.choice(CATEGORIAS),
+            "TipoPlan": rnd.choice(["monthly", "annual"]),
+            "Estado": rnd.choice(ESTADOS),
+        }
+        for _ in range(filas)
+    ]
+    por_categoria = [
+        {
+            "Categoria": rnd.choice(CATEGORIAS),
+            "Servicio": f"Servicio {i}",
+            "TotalSuscripciones": rnd.randint(0, 5000),
+            "Activas": rnd.randint(0, 3000),
+            "Canceladas": rnd.randint(0, 1000),
+            "Expiradas": rnd.randint(0, 1000),
+            "IngresosPorServicio": _monto(rnd) * rnd.randint(1, 5000),
+        }
+        for i in range(max(filas // 10, 1))
+    ]
+    agrupadas = {}
+    for row in por_categoria:
+        agrupadas.setdefault(row["Categoria"], []).append(row)
+    suscripciones = []
+    for i in range(200):
+        inicio = _fecha(rnd)
+        suscripciones.append({
+            "SubscriptionId": filas - i,
+            "UserId": rnd.randint(1, filas),
+            "username": f"usuario{i}",
+            "email": f"usuario{i}@correo.com",
+            "service": f"Servicio {rnd.randint(1, 200)}",
+            "category": rnd.choice(CATEGORIAS),
+            "StartDate": inicio,
+            "EndDate": inicio + timedelta(days=30),
+            "Status": rnd.choice(ESTADOS),
+            "AmountPaid": _monto(rnd),
+            "PaymentMethod": rnd.choice(["card", "cash", "wallet"]),
+        })
+    saldo = Decimal("1000.00")
+    transacciones = []
+    for i in range(filas):
+        monto = _monto(rnd)
+        saldo -= monto
+        transacciones.append((i + 1, "deduction", monto, _fecha(rnd), saldo))
+    return {
+        "reportes.por_usuario": {
+            "success": True, "message": "Reporte", "data": por_usuario, "total_registros": len(por_usuario),
+        },
+        "reportes.por_categoria": {
+            "success": True, "message": "Reporte", "data": por_categoria,
+            "data_agrupada": agrupadas, "total_registros": len(por_categoria),
+        },
+        "admin.suscripciones": {"suscripciones": suscripciones, "next_cursor": filas - 200, "total": filas},
+        "wallet.transacciones": {"success": True, "data": transacciones},
+    }
+
+
+async def cargas_bd() -> dict:
+    import queries as q
+    import main  # noqa: F401  registra las consultas de todos los routers
+    q.register_query("bench.usuario_mas_movimientos", """
+        SELECT UserId FROM WalletTransaction GROUP BY UserId ORDER BY COUNT(*) DESC LIMIT 1
+    """)
+    app = SimpleNamespace(state=SimpleNamespace())
+    try:
+        async with q.db_connection(app) as conn:
+            por_usuario = await q.fetch_all(conn, "reportes.por_usuario")
+            por_categoria = await q.fetch_all(conn, "reportes.por_categoria")
+            suscripciones = await q.fetch_all(conn, "admin.suscripciones.listar", (201,), where="1 = 1")
+            usuario = await q.fetch_one(conn, "bench.usuario_mas_movimientos")
+            transacciones = await q.fetch_all(
+                conn, "wallet.transacciones", (usuario["UserId"] if usuario else 1,), dict_rows=False
+            )
+    finally:
+        if hasattr(app.state, "db_pool"):
+            app.state.db_pool.close()
+            await app.state.db_pool.wait_closed()
+    agrupadas = {}
+    for row in por_categoria:
+        agrupadas.setdefault(row["Categoria"], []).append(row)
+    return {
+        "reportes.por_usuario": {"success": True, "data": por_usuario, "total_registros": len(por_usuario)},
+        "reportes.por_categoria": {"success": True, "data": por_categoria, "data_agrupada": agrupadas},
+        "admin.suscripciones": {"suscripciones": suscripciones, "next_cursor": None, "total": None},
+        "wallet.transacciones": {"success": True, "data": transacciones},
+    }
+
+
+def fastapi_por_defecto(contenido) -> bytes:
+    # lo que hace FastAPI con un dict devuelto por la ruta
+    return JSONResponse(jsonable_encoder(contenido)).body
+
+
+def orjson_directo(contenido) -> bytes:
+    return RespuestaJSON(contenido).body
+
+
+def medir(fn, contenido, repeticiones: int):
+    cuerpo = fn(contenido)  # calentamiento
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn(contenido)
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2], len(cuerpo)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=5000, help="filas de los reportes sintéticos")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--bd", action="store_true", help="usa las filas reales de MySQL")
+    args = parser.parse_args()
+
+    cargas = asyncio.run(cargas_bd()) if args.bd else cargas_sinteticas(args.filas)
+    print(f"{'carga':24} {'KB':>8} {'antes ms':>9} {'µs/KB':>7} {'orjson ms':>10} {'µs/KB':>7} {'mejora':>7}")
+    for nombre, contenido in cargas.items():
+        antes, tamano = medir(fastapi_por_defecto, contenido, args.repeticiones)
+        despues, tamano_orjson = medir(orjson_directo, contenido, args.repeticiones)
+        kb = tamano / 1024
+        print(
+            f"{nombre:24} {kb:8.1f} {antes * 1000:9.2f} {antes * 1e6 / kb:7.1f} "
+            f"{despues * 1000:10.2f} {despues * 1e6 / (tamano_orjson / 1024):7.1f} {antes / despues:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark de una ráfaga de logins: mide el throughput de /login y, al
+mismo tiempo, la latencia de una ruta ajena (GET /) para comprobar que
+el cálculo de bcrypt ya no bloquea el event loop.
+
+Requiere la API levantada y un usuario existente (los datos de
+DBSubPlatm.sql usan la contraseña "test").
+
+Uso (desde backend/API):
+    python -m benchmarks.bench_login --url http://localhost:8000 --logins 200 --concurrencia 50
+"""
+import argparse
+import asyncio
+import time
+import httpx
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    if not valores:
+        return 0
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--email", default="juan.perez@email.com")
+    parser.add_argument("--password", default="test")
+    parser.add_argument("--intervalo-sonda-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    limites = httpx.Limits(max_connections=args.concurrencia + 1)
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=60) as client:
+        semaforo = asyncio.Semaphore(args.concurrencia)
+        codigos = {}
+        latencias_login = []
+        latencias_sonda = []
+        terminado = asyncio.Event()
+
+        async def login():
+            async with semaforo:
+                inicio = time.perf_counter()
+                r = await client.post("/login", json={"email": args.email, "password": args.password})
+                latencias_login.append((time.perf_counter() - inicio) * 1000)
+                codigos[r.status_code] = codigos.get(r.status_code, 0) + 1
+
+        async def sonda():
+            # ruta ajena al login, debería responder rápido durante toda la ráfaga
+            async with httpx.AsyncClient(base_url=args.url, timeout=60) as sonda_client:
+                while not terminado.is_set():
+                    inicio = time.perf_counter()
+                    await sonda_client.get("/")
+                    latencias_sonda.append((time.perf_counter() - inicio) * 1000)
+                    await asyncio.sleep(args.intervalo_sonda_ms / 1000)
+
+        tarea_sonda = asyncio.create_task(sonda())
+        inicio = time.perf_counter()
+        await asyncio.gather(*[login() for _ in range(args.logins)])
+        duracion = time.perf_counter() - inicio
+        terminado.set()
+        await tarea_sonda
+
+    print(f"logins: {args.logins} en {duracion:.2f}s ({args.logins / duracion:.1f} logins/s), códigos {codigos}")
+    print(f"latencia /login ms: p50={percentil(latencias_login, 50):.1f} p99={percentil(latencias_login, 99):.1f}")
+    print(
+        f"latencia GET / durante la ráfaga ms: p50={percentil(latencias_sonda, 50):.1f} "
+        f"p99={percentil(latencias_sonda, 99):.1f} ({len(latencias_sonda)} muestras)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Benchmark de envío de correos: smtplib con una conexión por mensaje
+(implementación anterior) contra el pool asíncrono de mailer.py.
+
+Levanta un servidor SMTP local mínimo que acepta y descarta los mensajes,
+con una latencia artificial por comando para simular la red.
+
+Uso (desde backend/API):
+    python -m benchmarks.bench_mailer --mensajes 200 --latencia-ms 5
+"""
+import argparse
+import asyncio
+import os
+import smtplib
+import time
+
+
+class SumideroSMTP(asyncio.Protocol):
+    """Servidor SMTP de depuración: responde a todo con éxito."""
+
+    latencia = 0.0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.en_data = False
+        self.buffer = b""
+        self.transport.write(b"220 localhost ESMTP bench\r\n")
+
+    def data_received(self, data):
+        self.buffer += data
+        while b"\r\n" in self.buffer:
+            linea, self.buffer = self.buffer.split(b"\r\n", 1)
+            asyncio.get_running_loop().call_later(self.latencia, self._responder, linea)
+
+    def _responder(self, linea):
+        if self.transport.is_closing():
+            return
+        if self.en_data:
+            if linea == b".":
+                self.en_data = False
+                self.transport.write(b"250 OK\r\n")
+            return
+        comando = linea[:4].upper()
+        if comando in (b"EHLO", b"HELO"):
+            self.transport.write(b"250-localhost\r\n250 8BITMIME\r\n")
+        elif comando == b"DATA":
+            self.en_data = True
+            self.transport.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+        elif comando == b"QUIT":
+            self.transport.write(b"221 Bye\r\n")
+            self.transport.close()
+        else:
+            self.transport.write(b"250 OK\r\n")
+
+
+def enviar_sync(msg, host, port):
+    # comportamiento anterior: conexión nueva por cada mensaje
+    with smtplib.SMTP(host, port) as server:
+        server.send_message(msg)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mensajes", type=int, default=200)
+    parser.add_argument("--latencia-ms", type=float, default=5)
+    parser.add_argument("--pool", type=int, default=4)
+    parser.add_argument("--port", type=int, default=2525)
+    args = parser.parse_args()
+
+    os.environ.update({
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(args.port),
+        "SMTP_STARTTLS": "false",
+        "SMTP_POOL_SIZE": str(args.pool),
+        "MAIL_FROM": "bench@localhost",
+    })
+    os.environ.pop("SMTP_USER", None)
+    import mailer  # se importa después de fijar el entorno
+
+    SumideroSMTP.latencia = args.latencia_ms / 1000
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(SumideroSMTP, "127.0.0.1", args.port)
+
+    contexto = {"name": "Bench", "amount": 9.99}
+    msg = mailer.build_message("Bench", "destino@localhost", "confirm_payment.html", contexto)
+
+    # antes: to_thread + smtplib, una conexión por mensaje; se limita a la
+    # misma concurrencia que el pool para comparar en igualdad de condiciones
+    hilos = asyncio.Semaphore(args.pool)
+
+    async def enviar_en_hilo():
+        async with hilos:
+            await asyncio.to_thread(enviar_sync, msg, "127.0.0.1", args.port)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*[enviar_en_hilo() for _ in range(args.mensajes)])
+    antes = args.mensajes / (time.perf_counter() - inicio)
+
+    # después: pool de sesiones persistentes
+    inicio = time.perf_counter()
+    await asyncio.gather(*[
+        mailer.send_email("Bench", "destino@localhost", "confirm_payment.html", contexto)
+        for _ in range(args.mensajes)
+    ])
+    despues = args.mensajes / (time.perf_counter() - inicio)
+
+    print(f"smtplib por mensaje: {antes:8.1f} mensajes/s")
+    print(f"pool aiosmtplib:     {despues:8.1f} mensajes/s")
+    print(mailer.get_mailer_stats())
+
+    await mailer.close_mailer()
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
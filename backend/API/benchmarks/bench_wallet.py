@@ -0,0 +1,192 @@
+"""
+Benchmark de contención sobre una sola wallet: cientos de compras
+concurrentes contra el mismo saldo.
+
+Compara la deducción anterior (leer el saldo, comparar en Python y luego
+UPDATE, con autocommit) contra wallet.mover_saldo (UPDATE condicionado en
+una transacción corta). Reporta throughput, latencia, esperas por
+bloqueos de InnoDB y si el saldo final es correcto: nunca negativo y
+igual al inicial menos las compras aceptadas.
+
+Crea un usuario temporal con su wallet por estrategia y lo borra al
+terminar (salvo --conservar). Requiere MySQL con el esquema actual y el
+.env de la API.
+
+Uso (desde backend/API):
+    python -m benchmarks.bench_wallet --compras 500 --concurrencia 50 --saldo 100 --monto 1
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    if not valores:
+        return 0
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def registrar_consultas(register_query):
+    register_query("bench.crear_usuario", """
+        INSERT INTO `User` (Username, Name, Email, Rol, Password, ConfirmedEmail)
+        VALUES (%s, %s, %s, 'user', 'bench', 'yes')
+    """)
+    register_query("bench.crear_wallet", """
+        INSERT INTO PaymentMethod (UserId, Type, WalletBalance) VALUES (%s, 'wallet', 0)
+    """)
+    # deducción anterior: sin condición de saldo, la verificación ocurre en Python
+    register_query("bench.descontar_sin_guarda", """
+        UPDATE PaymentMethod SET WalletBalance = WalletBalance - %s
+        WHERE UserId = %s AND Type = 'wallet'
+    """)
+    register_query("bench.row_lock", """
+        SHOW GLOBAL STATUS WHERE Variable_name IN ('Innodb_row_lock_waits', 'Innodb_row_lock_time')
+    """)
+    register_query("bench.borrar_snapshots", "DELETE FROM WalletSnapshot WHERE UserId = %s")
+    register_query("bench.borrar_movimientos", "DELETE FROM WalletTransaction WHERE UserId = %s")
+    register_query("bench.borrar_metodos", "DELETE FROM PaymentMethod WHERE UserId = %s")
+    register_query("bench.borrar_usuario", "DELETE FROM `User` WHERE UserId = %s")
+
+
+async def estado_bloqueos(app, q):
+    async with q.db_connection(app) as conn:
+        rows = await q.fetch_all(conn, "bench.row_lock")
+    return {row["Variable_name"]: int(row["Value"]) for row in rows}
+
+
+async def crear_usuario(app, q, wallet, saldo):
+    sufijo = uuid.uuid4().hex[:10]
+    async with q.db_connection(app, transaction=True) as conn:
+        result = await q.execute(
+            conn, "bench.crear_usuario",
+            (f"bw{sufijo}", "Bench wallet", f"bench.wallet.{sufijo}@bench.local")
+        )
+        user_id = result.lastrowid
+        await q.execute(conn, "bench.crear_wallet", (user_id,))
+        await wallet.mover_saldo(conn, user_id, wallet.RECARGA, saldo)
+    return user_id
+
+
+async def borrar_usuario(app, q, user_id):
+    async with q.db_connection(app, transaction=True) as conn:
+        for tabla in ("snapshots", "movimientos", "metodos", "usuario"):
+            await q.execute(conn, f"bench.borrar_{tabla}", (user_id,))
+
+
+async def compra_guardada(app, q, wallet, user_id, monto):
+    try:
+        async with q.db_connection(app, transaction=True) as conn:
+            await wallet.mover_saldo(conn, user_id, wallet.DEDUCCION, monto)
+        return True
+    except wallet.SaldoInsuficiente:
+        return False
+
+
+async def compra_leer_comparar(app, q, wallet, user_id, monto):
+    async with q.db_connection(app) as conn:
+        actual = await wallet.saldo(conn, user_id)
+        if actual < monto:
+            return False
+        await q.execute(conn, "bench.descontar_sin_guarda", (monto, user_id))
+        await q.execute(conn, "wallet.registrar_movimiento", (user_id, wallet.DEDUCCION, monto, None))
+    return True
+
+
+async def correr(app, q, wallet, estrategia, args):
+    saldo_inicial = Decimal(str(args.saldo))
+    monto = Decimal(str(args.monto))
+    user_id = await crear_usuario(app, q, wallet, saldo_inicial)
+    compra = compra_guardada if estrategia == "guardado" else compra_leer_comparar
+
+    semaforo = asyncio.Semaphore(args.concurrencia)
+    latencias = []
+    resultados = {"aceptadas": 0, "rechazadas": 0, "errores": 0}
+
+    async def una():
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                if await compra(app, q, wallet, user_id, monto):
+                    resultados["aceptadas"] += 1
+                else:
+                    resultados["rechazadas"] += 1
+            except Exception as e:
+                # 1205 lock wait timeout, 1213 deadlock
+                resultados["errores"] += 1
+                if resultados["errores"] <= 3:
+                    print(f"  error: {e}")
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    bloqueos_antes = await estado_bloqueos(app, q)
+    inicio = time.perf_counter()
+    await asyncio.gather(*[una() for _ in range(args.compras)])
+    duracion = time.perf_counter() - inicio
+    bloqueos_despues = await estado_bloqueos(app, q)
+
+    async with q.db_connection(app) as conn:
+        saldo_final = await wallet.saldo(conn, user_id)
+        verificacion = await wallet.verificar(conn, user_id)
+    esperado = saldo_inicial - resultados["aceptadas"] * monto
+    maximo = int(saldo_inicial // monto)
+    correcto = saldo_final == esperado and saldo_final >= 0 and resultados["aceptadas"] <= maximo
+
+    print(f"[{estrategia}] {args.compras} compras en {duracion:.2f}s ({args.compras / duracion:.1f} compras/s)")
+    print(
+        f"  aceptadas={resultados['aceptadas']} (máximo posible {maximo}) "
+        f"rechazadas={resultados['rechazadas']} errores={resultados['errores']}"
+    )
+    print(
+        f"  latencia ms: p50={percentil(latencias, 50):.1f} p95={percentil(latencias, 95):.1f} "
+        f"p99={percentil(latencias, 99):.1f}"
+    )
+    print(
+        f"  esperas por bloqueo InnoDB: "
+        f"{bloqueos_despues['Innodb_row_lock_waits'] - bloqueos_antes['Innodb_row_lock_waits']} "
+        f"({bloqueos_despues['Innodb_row_lock_time'] - bloqueos_antes['Innodb_row_lock_time']}ms en total, "
+        f"contador global del servidor)"
+    )
+    print(
+        f"  saldo final={saldo_final} esperado={esperado} -> {'CORRECTO' if correcto else 'INCORRECTO'}; "
+        f"libro mayor {'consistente' if verificacion['consistente'] else 'inconsistente'}"
+    )
+
+    if not args.conservar:
+        await borrar_usuario(app, q, user_id)
+    return correcto
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--compras", type=int, default=500)
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--saldo", type=float, default=100)
+    parser.add_argument("--monto", type=float, default=1)
+    parser.add_argument("--estrategia", choices=["guardado", "leer-comparar", "ambas"], default="ambas")
+    parser.add_argument("--conservar", action="store_true", help="no borra los usuarios de prueba")
+    args = parser.parse_args()
+
+    # el pool debe admitir la concurrencia pedida sin que la espera por conexión falle
+    os.environ.setdefault("DB_POOL_MAX_SIZE", str(args.concurrencia))
+    os.environ.setdefault("DB_ACQUIRE_TIMEOUT", "120")
+    import queries as q
+    import wallet
+    registrar_consultas(q.register_query)
+
+    app = SimpleNamespace(state=SimpleNamespace())
+    estrategias = ["leer-comparar", "guardado"] if args.estrategia == "ambas" else [args.estrategia]
+    try:
+        for estrategia in estrategias:
+            await correr(app, q, wallet, estrategia, args)
+    finally:
+        if hasattr(app.state, "db_pool"):
+            app.state.db_pool.close()
+            await app.state.db_pool.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+
+"""
+Caché en memoria de resultados de los reportes de administración.
+
+Cada entrada guarda el valor, su vencimiento (TTL por endpoint) y la
+versión de las etiquetas de las que depende ("suscripciones", "servicios",
+"usuarios"). Las escrituras llaman a invalidar(...) después del commit y
+suben la versión de esas etiquetas, así las entradas afectadas dejan de
+servirse al instante en este worker; los demás workers las recargan al
+vencer el TTL.
+
+Las cargas son single-flight: si N peticiones piden la misma clave fría,
+solo una ejecuta las consultas y las demás esperan ese mismo resultado.
+"""
+
+logger = logging.getLogger(__name__)
+
+# segundos de vida por endpoint; acotan lo que un worker puede servir
+# desactualizado después de una escritura hecha en otro worker
+CACHE_TTL_REPORTES = float(os.getenv("CACHE_TTL_REPORTES", 60))
+CACHE_TTL_METRICAS = float(os.getenv("CACHE_TTL_METRICAS", 30))
+
+SUSCRIPCIONES = "suscripciones"
+SERVICIOS = "servicios"
+USUARIOS = "usuarios"
+
+
+class _Entrada:
+    __slots__ = ("valor", "vence", "versiones")
+
+    def __init__(self, valor, vence: float, versiones: tuple):
+        self.valor = valor
+        self.vence = vence
+        self.versiones = versiones
+
+
+class ResultCache:
+
+    def __init__(self):
+        self._entradas = {}
+        self._en_vuelo = {}  # clave -> tarea que la está cargando
+        self._versiones = defaultdict(int)
+        self._contadores = defaultdict(lambda: {"hits": 0, "misses": 0, "stale": 0, "esperas": 0, "errores": 0})
+
+    def _version(self, etiquetas) -> tuple:
+        return tuple(self._versiones[etiqueta] for etiqueta in etiquetas)
+
+    def invalidar(self, *etiquetas: str):
+        for etiqueta in etiquetas:
+            self._versiones[etiqueta] += 1
+
+    async def obtener(self, clave: str, ttl: float, etiquetas: tuple, cargar):
+        """Devuelve el valor en caché de la clave o lo carga con cargar() una sola vez."""
+        contador = self._contadores[clave]
+        entrada = self._entradas.get(clave)
+        if entrada is not None:
+            if entrada.vence > time.monotonic() and entrada.versiones == self._version(etiquetas):
+                contador["hits"] += 1
+                return entrada.valor
+            contador["stale"] += 1
+        else:
+            contador["misses"] += 1
+
+        tarea = self._en_vuelo.get(clave)
+        if tarea is not None:
+            contador["esperas"] += 1
+        else:
+            # la carga corre en su propia tarea: si la petición que la inició
+            # se cancela, las que esperan el mismo resultado no se quedan sin él
+            tarea = asyncio.create_task(self._cargar(clave, ttl, etiquetas, cargar))
+            tarea.add_done_callback(self._fin_carga)
+            self._en_vuelo[clave] = tarea
+        return await asyncio.shield(tarea)
+
+    async def _cargar(self, clave, ttl, etiquetas, cargar):
+        # versión tomada antes de consultar: si se invalida durante la carga
+        # el resultado se entrega pero ya nace desactualizado
+        versiones = self._version(etiquetas)
+        try:
+            valor = await cargar()
+        except Exception:
+            self._contadores[clave]["errores"] += 1
+            raise
+        finally:
+            self._en_vuelo.pop(clave, None)
+        self._entradas[clave] = _Entrada(valor, time.monotonic() + ttl, versiones)
+        return valor
+
+    @staticmethod
+    def _fin_carga(tarea):
+        # evita el aviso de excepción no recuperada cuando todos los que
+        # esperaban se cancelaron antes de que terminara la carga
+        if not tarea.cancelled() and tarea.exception() is not None:
+            logger.debug(f"Carga de caché fallida: {tarea.exception()}")
+
+    def stats(self) -> dict:
+        totales = {"hits": 0, "misses": 0, "stale": 0, "esperas": 0, "errores": 0}
+        for contador in self._contadores.values():
+            for nombre, valor in contador.items():
+                totales[nombre] += valor
+        consultas = totales["hits"] + totales["misses"] + totales["stale"]
+        return {
+            "entradas": len(self._entradas),
+            "cargando": len(self._en_vuelo),
+            **totales,
+            "hit_ratio": round(totales["hits"] / consultas, 3) if consultas else 0,
+            "versiones": dict(self._versiones),
+            "por_clave": {clave: dict(contador) for clave, contador in self._contadores.items()},
+        }
+
+
+cache = ResultCache()
+
+
+def invalidar(*etiquetas: str):
+    """Llamar después del commit de una escritura que cambia esas etiquetas."""
+    cache.invalidar(*etiquetas)
+
+
+def get_cache_stats() -> dict:
+    return cache.stats()
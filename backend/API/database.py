@@ -1,3 +1,6 @@
+import asyncio
+import time
+from collections import deque
 import aiomysql
 from dotenv import load_dotenv
 import os
@@ -10,17 +13,128 @@ db_user = os.getenv("DB_USER")
 db_password = os.getenv("DB_PASSWORD")
 db_name = os.getenv("DB_NAME")
 
+# Dimensionamiento del pool
+db_pool_min_size = int(os.getenv("DB_POOL_MIN_SIZE", 2))
+db_pool_max_size = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+# segundos tras los que una conexión se recicla, debe ser menor al wait_timeout de MySQL
+db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", 1800))
+db_connect_timeout = float(os.getenv("DB_CONNECT_TIMEOUT", 10))
+# segundos máximos esperando una conexión libre antes de fallar
+db_acquire_timeout = float(os.getenv("DB_ACQUIRE_TIMEOUT", 5))
+
+
+class PoolAcquireTimeout(Exception):
+    """No hubo una conexión libre en el pool dentro de DB_ACQUIRE_TIMEOUT."""
+
+
+class _AcquireContext:
+    # igual que aiomysql: sirve con "await pool.acquire()" y con "async with pool.acquire()"
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+
+    def __await__(self):
+        return self._pool._acquire().__await__()
+
+    async def __aenter__(self):
+        self._conn = await self._pool._acquire()
+        return self._conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._pool.release(self._conn)
+        self._conn = None
+
+
+class InstrumentedPool:
+    """
+    Envoltorio del pool de aiomysql que aplica el timeout de adquisición y
+    registra la espera por conexión, las conexiones en uso y los timeouts.
+    """
+
+    def __init__(self, pool, acquire_timeout: float):
+        self._pool = pool
+        self.acquire_timeout = acquire_timeout
+        self._waits = deque(maxlen=1000)  # ms esperando conexión
+        self.acquires = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def __getattr__(self, name):
+        # size, freesize, minsize, maxsize, close, wait_closed, ...
+        return getattr(self._pool, name)
+
+    def acquire(self):
+        return _AcquireContext(self)
+
+    async def _acquire(self):
+        inicio = time.perf_counter()
+        self.waiting += 1
+        try:
+            conn = await asyncio.wait_for(self._pool.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PoolAcquireTimeout(
+                f"Sin conexiones libres tras {self.acquire_timeout}s (en uso: {self.in_use})"
+            )
+        finally:
+            self.waiting -= 1
+            self._waits.append((time.perf_counter() - inicio) * 1000)
+        self.acquires += 1
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return conn
+
+    def release(self, conn):
+        self.in_use -= 1
+        return self._pool.release(conn)
+
+    async def prewarm(self):
+        # abre y valida minsize conexiones antes de recibir tráfico
+        conns = await asyncio.gather(*[self._acquire() for _ in range(self._pool.minsize)])
+        try:
+            for conn in conns:
+                await conn.ping(reconnect=True)
+        finally:
+            for conn in conns:
+                await self.release(conn)
+
+    def stats(self) -> dict:
+        esperas = sorted(self._waits)
+        n = len(esperas)
+        return {
+            "minsize": self._pool.minsize,
+            "maxsize": self._pool.maxsize,
+            "abiertas": self._pool.size,
+            "libres": self._pool.freesize,
+            "en_uso": self.in_use,
+            "pico_en_uso": self.peak_in_use,
+            "esperando": self.waiting,
+            "adquisiciones": self.acquires,
+            "timeouts": self.timeouts,
+            "espera_ms": {
+                "promedio": round(sum(esperas) / n, 2) if n else 0,
+                "p95": round(esperas[min(n - 1, int(n * 0.95))], 2) if n else 0,
+                "max": round(esperas[-1], 2) if n else 0,
+            },
+        }
+
 
 async def get_db_pool(app):
     """Establece la conexión a la base de datos y devuelve el pool de conexiones."""
-    if not hasattr(app.state, "db_pool"): 
-        app.state.db_pool = await aiomysql.create_pool(
+    if not hasattr(app.state, "db_pool"):
+        pool = await aiomysql.create_pool(
             host=db_host,  # Nombre del servicio del contenedor (en docker-compose)
             port=db_port,   # Puerto de MySQL
             user=db_user,  # Usuario de MySQL
             password=db_password,  # Contraseña de root
             db=db_name,  # Nombre de la base de datos
-            autocommit=True  # Autocommit solucion a bug????
+            autocommit=True,  # Autocommit solucion a bug????
+            minsize=db_pool_min_size,
+            maxsize=db_pool_max_size,
+            pool_recycle=db_pool_recycle,
+            connect_timeout=db_connect_timeout,
         )
+        app.state.db_pool = InstrumentedPool(pool, db_acquire_timeout)
     return app.state.db_pool
-
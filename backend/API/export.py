@@ -0,0 +1,96 @@
+import csv
+import io
+import logging
+import os
+import zlib
+from contextlib import aclosing
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from queries import db_connection, execute, register_query, stream
+from respuestas import serializar
+
+"""
+Exportación de reportes en CSV o NDJSON.
+
+Las filas se leen con un cursor del lado del servidor y se escriben en la
+respuesta bloque a bloque, así la memoria del worker no depende del tamaño
+del reporte y el primer byte sale en cuanto MySQL entrega el primer bloque.
+Si el cliente acepta gzip, la salida se comprime sobre la marcha.
+"""
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 1000))
+# segundos que MySQL espera a que el cliente lea el siguiente bloque;
+# un cliente lento mantiene el cursor abierto mientras descarga
+EXPORT_WRITE_TIMEOUT = int(os.getenv("EXPORT_WRITE_TIMEOUT", 3600))
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+register_query("sesion.net_write_timeout", "SET SESSION net_write_timeout = %s")
+
+
+def _bloque_csv(rows, encabezado: list = None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if encabezado is not None:
+        writer.writerow(encabezado)
+    writer.writerows(row.values() for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _bloque_ndjson(rows) -> bytes:
+    # mismo formato de números y fechas que las respuestas JSON
+    return b"".join(serializar(row) + b"\n" for row in rows)
+
+
+async def _filas(app, query_name: str, params, formato: str):
+    try:
+        async with db_connection(app) as conn:
+            await execute(conn, "sesion.net_write_timeout", (EXPORT_WRITE_TIMEOUT,))
+            # el encabezado CSV sale de la descripción del cursor: un reporte
+            # vacío igual lleva los nombres de las columnas
+            columnas = []
+            async with aclosing(stream(
+                conn, query_name, params, chunk_size=EXPORT_CHUNK_SIZE, columnas=columnas
+            )) as bloques:
+                primero = True
+                async for rows in bloques:
+                    if formato == "csv":
+                        yield _bloque_csv(rows, columnas if primero else None)
+                    else:
+                        yield _bloque_ndjson(rows)
+                    primero = False
+            if primero and formato == "csv":
+                yield _bloque_csv([], columnas)
+    except Exception as e:
+        # los encabezados ya se enviaron, solo queda cortar la respuesta
+        logger.error(f"Error al exportar '{query_name}': {e}")
+        raise
+
+
+async def _gzip(chunks):
+    # wbits=31: formato gzip (cabecera + CRC), lo que espera Content-Encoding: gzip
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            salida = compresor.compress(chunk)
+            if salida:
+                yield salida
+    yield compresor.flush()
+
+
+def exportar(request: Request, query_name: str, formato: str, nombre: str, params=None) -> StreamingResponse:
+    """Respuesta en streaming con el resultado de una consulta registrada."""
+    body = _filas(request.app, query_name, params, formato)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{nombre}.{formato}"',
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        body = _gzip(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=FORMATOS[formato], headers=headers)
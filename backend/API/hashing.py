@@ -0,0 +1,49 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from fastapi import HTTPException
+
+"""
+Hash y verificación de contraseñas fuera del event loop.
+
+bcrypt libera el GIL mientras calcula, así que un pool de hilos dedicado
+basta para que un pico de logins no congele las demás rutas del worker.
+Las solicitudes que no consiguen lugar en la cola en HASH_QUEUE_TIMEOUT
+segundos se rechazan con 503 en vez de acumularse sin límite.
+"""
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", 4))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", 64))
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", 2))
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_pendientes = asyncio.Semaphore(HASH_MAX_PENDING)
+
+
+async def _ejecutar(fn, *args):
+    try:
+        await asyncio.wait_for(_pendientes.acquire(), HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado, intenta de nuevo",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _pendientes.release()
+
+
+async def hash_password(password: str) -> str:
+    hashed = await _ejecutar(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+    return hashed.decode('utf-8')
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await _ejecutar(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def shutdown_hashing():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,263 @@
+import csv
+import io
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+from queries import db_connection, execute_many, fetch_all, placeholders, register_query
+from versiones import incrementar_version
+
+"""
+Importación masiva del catálogo (servicios y sus planes) en CSV o NDJSON.
+
+CSV: una fila por plan, con encabezado name, category, description,
+plan_type, price. Las filas con el mismo name forman un servicio.
+
+NDJSON: un servicio por línea,
+    {"name": ..., "category": ..., "description": ..., "plans": [{"type": "monthly", "price": 9.99}]}
+o una línea por plan con los mismos campos que el CSV.
+
+Todo se valida antes de escribir. Los servicios con alguna fila inválida
+(o cuyo nombre ya existe) se omiten y se informan por número de fila; el
+resto se escribe en bloques de IMPORT_CHUNK_SIZE servicios, cada bloque
+en su propia transacción con un INSERT multi-fila para Service y otro
+para Plan.
+"""
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 500))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", 20 * 1024 * 1024))
+# errores devueltos en la respuesta; el total se informa siempre
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 1000))
+
+TIPOS_PLAN = ("monthly", "annual")
+PRECIO_MAXIMO = Decimal("99999999.99")
+
+register_query("importacion.nombres_existentes", """
+    SELECT Name FROM Service WHERE Name IN ({nombres})
+""")
+register_query("importacion.insertar_servicios", """
+    INSERT INTO Service (Name, Category, Description) VALUES (%s, %s, %s)
+""")
+# ids de los servicios recién insertados, por nombre y dentro de la misma transacción.
+# No se usa lastrowid: si el bloque no cabe en max_allowed_packet, executemany lo
+# parte en varios INSERT y lastrowid es solo el primero del último
+register_query("importacion.ids_insertados", """
+    SELECT ServiceId, Name FROM Service
+    WHERE Name IN ({nombres})
+    ORDER BY ServiceId
+""")
+register_query("importacion.insertar_planes", """
+    INSERT INTO Plan (ServiceId, Type, Price) VALUES (%s, %s, %s)
+""")
+
+
+class ArchivoDemasiadoGrande(Exception):
+    pass
+
+
+class FormatoInvalido(Exception):
+    pass
+
+
+async def leer_cuerpo(request) -> bytes:
+    """Lee el cuerpo de la petición cortando en IMPORT_MAX_BYTES."""
+    partes = []
+    leidos = 0
+    async for parte in request.stream():
+        leidos += len(parte)
+        if leidos > IMPORT_MAX_BYTES:
+            raise ArchivoDemasiadoGrande(f"El archivo supera {IMPORT_MAX_BYTES} bytes")
+        partes.append(parte)
+    return b"".join(partes)
+
+
+def _filas_csv(texto: str):
+    reader = csv.DictReader(io.StringIO(texto))
+    faltantes = {"name", "category", "plan_type", "price"} - set(reader.fieldnames or [])
+    if faltantes:
+        raise FormatoInvalido(f"Faltan columnas en el encabezado: {', '.join(sorted(faltantes))}")
+    for row in reader:
+        yield reader.line_num, row, None
+
+
+def _filas_ndjson(texto: str):
+    for numero, linea in enumerate(texto.splitlines(), start=1):
+        if not linea.strip():
+            continue
+        try:
+            obj = json.loads(linea)
+        except json.JSONDecodeError as e:
+            yield numero, None, f"JSON inválido: {e.msg}"
+            continue
+        if not isinstance(obj, dict):
+            yield numero, None, "Cada línea debe ser un objeto JSON"
+            continue
+        planes = obj.get("plans")
+        if planes is None:
+            yield numero, obj, None
+            continue
+        if not isinstance(planes, list) or not planes:
+            yield numero, None, "plans debe ser una lista con al menos un plan"
+            continue
+        for plan in planes:
+            if not isinstance(plan, dict):
+                yield numero, None, "Cada plan debe ser un objeto con type y price"
+                continue
+            yield numero, {**obj, "plan_type": plan.get("type"), "price": plan.get("price")}, None
+
+
+def _texto(row: dict, campo: str, maximo: int, requerido: bool = True):
+    valor = row.get(campo)
+    valor = "" if valor is None else str(valor).strip()
+    if not valor:
+        if requerido:
+            raise ValueError(f"{campo} es obligatorio")
+        return None
+    if len(valor) > maximo:
+        raise ValueError(f"{campo} supera {maximo} caracteres")
+    return valor
+
+
+def _precio(valor) -> Decimal:
+    try:
+        precio = Decimal(str(valor).strip())
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"price inválido: {valor!r}")
+    if not precio.is_finite() or precio <= 0 or precio > PRECIO_MAXIMO:
+        raise ValueError(f"price fuera de rango: {valor}")
+    if precio.as_tuple().exponent < -2:
+        raise ValueError(f"price admite dos decimales: {valor}")
+    return precio
+
+
+def validar(contenido: bytes, formato: str):
+    """
+    Devuelve (servicios válidos, errores, filas leídas). Cada servicio es
+    {"name", "category", "description", "plans": [(tipo, precio)], "filas": [...]}.
+    """
+    try:
+        texto = contenido.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise FormatoInvalido("El archivo debe estar en UTF-8")
+    filas = _filas_csv(texto) if formato == "csv" else _filas_ndjson(texto)
+
+    servicios = {}
+    invalidos = set()
+    errores = []
+    leidas = 0
+    for numero, row, error in filas:
+        leidas += 1
+        nombre = str((row or {}).get("name") or "").strip() or None
+        if error is None:
+            try:
+                nombre = _texto(row, "name", 150)
+                categoria = _texto(row, "category", 50)
+                descripcion = _texto(row, "description", 250, requerido=False)
+                tipo = _texto(row, "plan_type", 20)
+                if tipo not in TIPOS_PLAN:
+                    raise ValueError(f"plan_type debe ser {' o '.join(TIPOS_PLAN)}")
+                precio = _precio(row.get("price"))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            errores.append({"fila": numero, "error": error})
+            if nombre:
+                invalidos.add(nombre.casefold())
+            continue
+
+        # se agrupa sin distinguir mayúsculas, igual que la comparación con el catálogo
+        clave = nombre.casefold()
+        servicio = servicios.get(clave)
+        if servicio is None:
+            servicios[clave] = {
+                "name": nombre, "category": categoria, "description": descripcion,
+                "plans": [(tipo, precio)], "filas": [numero],
+            }
+            continue
+        if (servicio["category"], servicio["description"]) != (categoria, descripcion):
+            errores.append({"fila": numero, "error": f"'{nombre}' tiene otra categoría o descripción en la fila {servicio['filas'][0]}"})
+            invalidos.add(clave)
+        elif any(t == tipo for t, _ in servicio["plans"]):
+            errores.append({"fila": numero, "error": f"'{nombre}' ya tiene un plan {tipo}"})
+            invalidos.add(clave)
+        else:
+            servicio["plans"].append((tipo, precio))
+            servicio["filas"].append(numero)
+
+    validos = [s for clave, s in servicios.items() if clave not in invalidos]
+    return validos, errores, leidas
+
+
+async def descartar_existentes(app, servicios: list, errores: list) -> list:
+    """Quita los servicios cuyo nombre ya está en el catálogo, consultando por bloques."""
+    existentes = set()
+    async with db_connection(app) as conn:
+        for i in range(0, len(servicios), IMPORT_CHUNK_SIZE):
+            nombres = [s["name"] for s in servicios[i:i + IMPORT_CHUNK_SIZE]]
+            rows = await fetch_all(
+                conn, "importacion.nombres_existentes", nombres, nombres=placeholders(len(nombres))
+            )
+            # la collation de MySQL compara sin distinguir mayúsculas
+            existentes.update(row["Name"].casefold() for row in rows)
+    for servicio in servicios:
+        if servicio["name"].casefold() in existentes:
+            errores.append({"fila": servicio["filas"][0], "error": f"Ya existe un servicio '{servicio['name']}'"})
+    return [s for s in servicios if s["name"].casefold() not in existentes]
+
+
+async def escribir(app, servicios: list, version_nombre: str):
+    """
+    Inserta los servicios por bloques, un bloque por transacción. Devuelve
+    (servicios creados, planes creados, última versión del catálogo, error).
+    Si un bloque falla se detiene ahí: los anteriores ya quedaron confirmados.
+    """
+    creados = 0
+    planes_creados = 0
+    version = None
+    for i in range(0, len(servicios), IMPORT_CHUNK_SIZE):
+        bloque = servicios[i:i + IMPORT_CHUNK_SIZE]
+        nombres = [s["name"] for s in bloque]
+        try:
+            version = await _escribir_bloque(app, bloque, nombres, version_nombre)
+        except Exception as e:
+            return creados, planes_creados, version, f"Bloque desde la fila {bloque[0]['filas'][0]}: {e}"
+        creados += len(bloque)
+        planes_creados += sum(len(s["plans"]) for s in bloque)
+    return creados, planes_creados, version, None
+
+
+async def _escribir_bloque(app, bloque: list, nombres: list, version_nombre: str):
+    async with db_connection(app, transaction=True) as conn:
+        await execute_many(
+            conn, "importacion.insertar_servicios",
+            [(s["name"], s["category"], s["description"]) for s in bloque]
+        )
+        rows = await fetch_all(
+            conn, "importacion.ids_insertados", nombres,
+            nombres=placeholders(len(nombres))
+        )
+        # los nombres ya existentes se descartaron antes, así cada nombre es uno
+        # de este bloque; la collation compara sin distinguir mayúsculas
+        ids = {}
+        for row in rows:
+            ids[row["Name"].casefold()] = row["ServiceId"]
+        planes = [
+            (ids[s["name"].casefold()], tipo, precio)
+            for s in bloque
+            for tipo, precio in s["plans"]
+        ]
+        await execute_many(conn, "importacion.insertar_planes", planes)
+        return await incrementar_version(conn, version_nombre)
+
+
+def reporte(leidas: int, errores: list, inicio: float, **extra) -> dict:
+    duracion = time.perf_counter() - inicio
+    errores = sorted(errores, key=lambda e: e["fila"])
+    return {
+        "filas": leidas,
+        **extra,
+        "total_errores": len(errores),
+        "errores": errores[:IMPORT_MAX_ERRORS],
+        "duracion_s": round(duracion, 3),
+        "filas_por_segundo": round(leidas / duracion, 1) if duracion else 0,
+    }
@@ -1,10 +1,15 @@
 import os
-import smtplib
+import time
 import asyncio
+import logging
+from collections import deque
 from email.message import EmailMessage
+import aiosmtplib
 from jinja2 import Environment, FileSystemLoader
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # carga variables de entorno
 load_dotenv()
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
@@ -12,12 +17,145 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASS = os.getenv("SMTP_PASS")
 MAIL_FROM = os.getenv("MAIL_FROM")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 30))
+
+# tamaño del pool de sesiones SMTP y segundos que una sesión puede estar ociosa
+# antes de reconectar (gmail cierra las sesiones inactivas a los pocos minutos)
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 4))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", 60))
 
 # prepara Jinja2 para plantillas
 jinja_env = Environment(loader=FileSystemLoader("templates"))
 
-async def send_email(subject: str, to: str, template_name: str, context: dict):
-    
+
+class SMTPPool:
+    """
+    Pool acotado de sesiones SMTP ya autenticadas (STARTTLS + LOGIN).
+    Las sesiones se reutilizan entre mensajes y se reconectan cuando
+    superan el tiempo ocioso o el servidor las cerró.
+    """
+
+    def __init__(self, size: int, idle_timeout: float):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._idle = deque()  # (sesion, ultimo_uso)
+        self._slots = asyncio.Semaphore(size)
+        self._in_use = 0
+        self._latencies = deque(maxlen=1000)  # ms de los últimos envíos
+        self.sent = 0
+        self.failed = 0
+        self.connects = 0
+        self.reconnects = 0
+
+    async def _connect(self):
+        smtp = aiosmtplib.SMTP(
+            hostname=SMTP_HOST,
+            port=SMTP_PORT,
+            start_tls=SMTP_STARTTLS,
+            username=SMTP_USER,
+            password=SMTP_PASS,
+            timeout=SMTP_TIMEOUT,
+        )
+        await smtp.connect()
+        self.connects += 1
+        return smtp
+
+    async def _discard(self, smtp):
+        # cierra la sesión ignorando errores: puede estar ya desconectada
+        try:
+            await smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    async def _acquire(self):
+        # toma la sesión más reciente; las vencidas se cierran y se descartan
+        while self._idle:
+            smtp, last_used = self._idle.pop()
+            if smtp.is_connected and time.monotonic() - last_used < self.idle_timeout:
+                return smtp
+            self.reconnects += 1
+            await self._discard(smtp)
+        return await self._connect()
+
+    async def send(self, msg: EmailMessage):
+        async with self._slots:
+            self._in_use += 1
+            start = time.perf_counter()
+            smtp = None
+            try:
+                smtp = await self._acquire()
+                try:
+                    await smtp.send_message(msg)
+                except aiosmtplib.SMTPServerDisconnected:
+                    # el servidor cerró la sesión entre envíos: se libera la vieja
+                    # y se reintenta una vez con una nueva
+                    self.reconnects += 1
+                    anterior, smtp = smtp, None
+                    await self._discard(anterior)
+                    smtp = await self._connect()
+                    await smtp.send_message(msg)
+                self._idle.append((smtp, time.monotonic()))
+                self.sent += 1
+            except Exception:
+                self.failed += 1
+                if smtp is not None:
+                    smtp.close()
+                raise
+            finally:
+                self._in_use -= 1
+                self._latencies.append((time.perf_counter() - start) * 1000)
+
+    async def close(self):
+        while self._idle:
+            smtp, _ = self._idle.pop()
+            await self._discard(smtp)
+
+    def stats(self) -> dict:
+        latencias = sorted(self._latencies)
+        n = len(latencias)
+        return {
+            "pool_size": self.size,
+            "abiertas": len(self._idle) + self._in_use,
+            "en_uso": self._in_use,
+            "ociosas": len(self._idle),
+            "enviados": self.sent,
+            "fallidos": self.failed,
+            "conexiones": self.connects,
+            "reconexiones": self.reconnects,
+            "latencia_ms": {
+                "promedio": round(sum(latencias) / n, 2) if n else 0,
+                "p50": round(latencias[n // 2], 2) if n else 0,
+                "p95": round(latencias[min(n - 1, int(n * 0.95))], 2) if n else 0,
+                "max": round(latencias[-1], 2) if n else 0,
+            },
+        }
+
+
+_pool = None
+
+
+def get_smtp_pool() -> SMTPPool:
+    global _pool
+    if _pool is None:
+        _pool = SMTPPool(SMTP_POOL_SIZE, SMTP_IDLE_TIMEOUT)
+    return _pool
+
+
+def get_mailer_stats() -> dict:
+    return get_smtp_pool().stats()
+
+
+async def close_mailer():
+    if _pool is not None:
+        await _pool.close()
+
+
+def build_message(subject: str, to: str, template_name: str, context: dict) -> EmailMessage:
+
     # renderiza la plantilla HTML
     template = jinja_env.get_template(template_name)
     html_content = template.render(**context)
@@ -28,13 +166,11 @@ async def send_email(subject: str, to: str, template_name: str, context: dict):
     msg["To"] = to
     msg["Subject"] = subject
     msg.set_content(html_content, subtype="html")
+    return msg
+
 
-    # función de envío sincrónico
-    def _sync_send():
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(msg)
+async def send_email(subject: str, to: str, template_name: str, context: dict):
+    msg = build_message(subject, to, template_name, context)
 
-    # lo ejecutamos en un hilo para no bloquear el event loop
-    await asyncio.to_thread(_sync_send)
+    # envío asíncrono reutilizando una sesión del pool
+    await get_smtp_pool().send(msg)
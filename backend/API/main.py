@@ -1,17 +1,26 @@
 from fastapi import FastAPI, Request
+from fastapi.exception_handlers import http_exception_handler as fastapi_http_exception_handler
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from routes.sistema import router as system_router
-from database import get_db_pool
+from database import get_db_pool, PoolAcquireTimeout
+from respuestas import RespuestaJSON
 import logging
 from routes.admin.gestionUsuarios import router as gestionUsuario_router
 from routes.admin.gestionSuscripciones import router as gestionSuscripciones_router
 from routes.admin.gestionSerivicios import router as gestionServicios_router
 from routes.admin.reportes import router as reporter_router
 from routes.admin.panelControl import router as panelControl_router
+from routes.admin.diagnostico import router as diagnostico_router
 from routes.user.subscriptionUser import router as subscriptionUser_router
 from routes.user.paymentMethodUser import router as paymentMethodUser_router
 from routes.user.billsUser import router as billsUser_router
 from scheduler import start_scheduler
+from mailer import close_mailer
+from outbox import start_outbox_dispatcher, stop_outbox_dispatcher
+from hashing import shutdown_hashing
+from auth import start_denylist_refresh, stop_denylist_refresh
+from versiones import start_version_refresh, stop_version_refresh
 
 
 
@@ -19,7 +28,8 @@ from scheduler import start_scheduler
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# orjson para todas las respuestas JSON (ver respuestas.py)
+app = FastAPI(default_response_class=RespuestaJSON)
 
 # Configuración de CORS
 app.add_middleware(
@@ -28,6 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Incluir los routers
@@ -38,6 +49,7 @@ app.include_router(gestionSuscripciones_router)
 app.include_router(gestionServicios_router)
 app.include_router(reporter_router)
 app.include_router(panelControl_router)
+app.include_router(diagnostico_router)
 app.include_router(subscriptionUser_router)
 
 # Incluir los routers de usuario
@@ -48,20 +60,58 @@ app.include_router(billsUser_router)
 @app.on_event("startup")
 async def startup_event():
     try:
-        await get_db_pool(app)
+        pool = await get_db_pool(app)
+        await pool.prewarm()
         logger.info("Conexión a la base de datos establecida")
         start_scheduler(app)  # Iniciar el scheduler
         logger.info("Scheduler iniciado")
+        start_outbox_dispatcher(app)  # Iniciar el envío de correos del outbox
+        logger.info("Dispatcher del outbox iniciado")
+        start_denylist_refresh(app)  # Refrescar tokens revocados en memoria
+        start_version_refresh(app)  # Refrescar versiones de datos para los ETag
     except Exception as e:
         logger.error(f"Error al: {e}")
 
 # Evento de cierre de la aplicación para cerrar el pool de conexiones
 @app.on_event("shutdown")
 async def shutdown_event():
+    await stop_outbox_dispatcher(app)
+    await stop_denylist_refresh(app)
+    await stop_version_refresh(app)
     if hasattr(app.state, "db_pool"):
         app.state.db_pool.close()
         await app.state.db_pool.wait_closed()
         logger.info("Conexión a la base de datos cerrada")
+    await close_mailer()
+    shutdown_hashing()
+
+# Pool saturado: se responde 503 para que el cliente reintente
+@app.exception_handler(PoolAcquireTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolAcquireTimeout):
+    logger.warning(f"Timeout al adquirir conexión: {exc}")
+    return RespuestaJSON(status_code=503, content={"detail": "Servidor ocupado, intenta de nuevo"}, headers={"Retry-After": "1"})
+
+
+def _causa_pool(exc: BaseException):
+    # PoolAcquireTimeout en la cadena __cause__/__context__ de la excepción
+    vistas = set()
+    while exc is not None and id(exc) not in vistas:
+        if isinstance(exc, PoolAcquireTimeout):
+            return exc
+        vistas.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+# Las rutas envuelven cualquier error en HTTPException(500, str(e)); si el
+# origen fue el pool saturado se responde igual 503 con Retry-After, sin el
+# mensaje interno
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    causa = _causa_pool(exc) if exc.status_code >= 500 else None
+    if causa is not None:
+        return await pool_timeout_handler(request, causa)
+    return await fastapi_http_exception_handler(request, exc)
 
 # Ruta de ejemplo
 @app.get("/")
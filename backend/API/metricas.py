@@ -0,0 +1,199 @@
+import asyncio
+import os
+import random
+from collections import defaultdict
+from types import SimpleNamespace
+from queries import db_connection, execute, execute_many, fetch_all, fetch_one, register_query
+
+"""
+Tablas resumen del panel de control (GET /admin/metricas).
+
+En lugar de agregar User y Subscription completas en cada carga del
+panel, los contadores se actualizan en la misma transacción que la fila
+de negocio:
+- ServiceSubscriptionStats: suscripciones por servicio
+- MonthlyRevenue: ingresos y suscripciones por mes de inicio
+- SubscriptionStatusCount: suscripciones por estado
+- MetricCounter: contadores sueltos (usuarios registrados)
+
+Cada contador se reparte en METRICS_SLOTS filas y cada escritura suma en
+una al azar, para que las altas concurrentes no esperen todas el bloqueo
+de la misma fila. La lectura suma los slots.
+
+Reconstrucción completa desde las tablas base (carga inicial o después de
+cargar datos a mano):
+
+    python -m metricas
+"""
+
+METRICS_SLOTS = int(os.getenv("METRICS_SLOTS", 8))
+
+register_query("metricas.sumar_servicio", """
+    INSERT INTO ServiceSubscriptionStats (ServiceId, Slot, Subscriptions)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE Subscriptions = Subscriptions + VALUES(Subscriptions)
+""")
+# VALUES solo con %s (el mes llega ya como 'YYYY-MM'), así executemany lo
+# envía como un único INSERT multi-fila
+register_query("metricas.sumar_ingreso", """
+    INSERT INTO MonthlyRevenue (Month, Slot, Revenue, Subscriptions)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        Revenue = Revenue + VALUES(Revenue),
+        Subscriptions = Subscriptions + VALUES(Subscriptions)
+""")
+register_query("metricas.sumar_estado", """
+    INSERT INTO SubscriptionStatusCount (Status, Slot, Total)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE Total = Total + VALUES(Total)
+""")
+register_query("metricas.sumar_contador", """
+    INSERT INTO MetricCounter (Name, Slot, Value)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE Value = Value + VALUES(Value)
+""")
+
+register_query("metricas.leer_contador", """
+    SELECT COALESCE(SUM(Value), 0) AS total FROM MetricCounter WHERE Name = %s
+""")
+register_query("metricas.leer_top_servicios", """
+    SELECT
+        s.ServiceId,
+        s.Name,
+        SUM(st.Subscriptions) AS suscripciones
+    FROM ServiceSubscriptionStats AS st
+    JOIN Service AS s ON st.ServiceId = s.ServiceId
+    GROUP BY s.ServiceId, s.Name
+    HAVING suscripciones > 0
+    ORDER BY suscripciones DESC
+    LIMIT %s
+""")
+register_query("metricas.leer_ingresos_por_mes", """
+    SELECT Month AS mes, SUM(Revenue) AS ingresos
+    FROM MonthlyRevenue
+    GROUP BY Month
+    ORDER BY Month
+""")
+register_query("metricas.leer_estados", """
+    SELECT
+        COALESCE(SUM(CASE WHEN Status = 'active' THEN Total ELSE 0 END), 0)  AS activas,
+        COALESCE(SUM(CASE WHEN Status <> 'active' THEN Total ELSE 0 END), 0) AS inactivas
+    FROM SubscriptionStatusCount
+""")
+
+# reconstrucción: sin parámetros, los % del DATE_FORMAT van tal cual
+register_query("metricas.vaciar_servicios", "DELETE FROM ServiceSubscriptionStats")
+register_query("metricas.vaciar_ingresos", "DELETE FROM MonthlyRevenue")
+register_query("metricas.vaciar_estados", "DELETE FROM SubscriptionStatusCount")
+register_query("metricas.vaciar_contadores", "DELETE FROM MetricCounter")
+register_query("metricas.reconstruir_servicios", """
+    INSERT INTO ServiceSubscriptionStats (ServiceId, Slot, Subscriptions)
+    SELECT p.ServiceId, 0, COUNT(*)
+    FROM Subscription AS sub
+    JOIN Plan AS p ON sub.PlanId = p.PlanId
+    GROUP BY p.ServiceId
+""")
+register_query("metricas.reconstruir_ingresos", """
+    INSERT INTO MonthlyRevenue (Month, Slot, Revenue, Subscriptions)
+    SELECT DATE_FORMAT(StartDate, '%Y-%m'), 0, SUM(AmountPaid), COUNT(*)
+    FROM Subscription
+    GROUP BY DATE_FORMAT(StartDate, '%Y-%m')
+""")
+register_query("metricas.reconstruir_estados", """
+    INSERT INTO SubscriptionStatusCount (Status, Slot, Total)
+    SELECT Status, 0, COUNT(*)
+    FROM Subscription
+    WHERE Status IS NOT NULL
+    GROUP BY Status
+""")
+register_query("metricas.reconstruir_usuarios", """
+    INSERT INTO MetricCounter (Name, Slot, Value)
+    SELECT 'users', 0, COUNT(*) FROM `User`
+""")
+
+
+def _slot() -> int:
+    return random.randrange(METRICS_SLOTS)
+
+
+def _mes(fecha) -> str:
+    """'YYYY-MM' de un date/datetime o de una fecha ISO en texto."""
+    if hasattr(fecha, "strftime"):
+        return fecha.strftime("%Y-%m")
+    return str(fecha)[:7]
+
+
+async def registrar_suscripcion(conn, service_id: int, start_date, amount, status: str = "active"):
+    """Suma una suscripción nueva. Debe llamarse en la transacción del INSERT."""
+    await execute(conn, "metricas.sumar_servicio", (service_id, _slot(), 1))
+    await execute(conn, "metricas.sumar_ingreso", (_mes(start_date), _slot(), amount, 1))
+    await execute(conn, "metricas.sumar_estado", (status, _slot(), 1))
+
+
+async def registrar_suscripciones(conn, filas, status: str = "active"):
+    """
+    Igual que registrar_suscripcion para varias altas (service_id, start_date, amount)
+    de una misma transacción: una sentencia multi-fila por tabla resumen.
+    """
+    por_servicio = defaultdict(int)
+    por_mes = defaultdict(lambda: [0, 0])
+    for service_id, start_date, amount in filas:
+        por_servicio[service_id] += 1
+        por_mes[_mes(start_date)][0] += amount
+        por_mes[_mes(start_date)][1] += 1
+    await execute_many(
+        conn, "metricas.sumar_servicio",
+        [(service_id, _slot(), total) for service_id, total in por_servicio.items()]
+    )
+    await execute_many(
+        conn, "metricas.sumar_ingreso",
+        [(mes, _slot(), monto, total) for mes, (monto, total) in por_mes.items()]
+    )
+    await execute(conn, "metricas.sumar_estado", (status, _slot(), len(filas)))
+
+
+async def cambiar_estado(conn, anterior: str, nuevo: str, cantidad: int = 1):
+    """Mueve suscripciones de un estado a otro (cancelación, vencimiento)."""
+    if cantidad <= 0:
+        return
+    await execute(conn, "metricas.sumar_estado", (anterior, _slot(), -cantidad))
+    await execute(conn, "metricas.sumar_estado", (nuevo, _slot(), cantidad))
+
+
+async def registrar_usuario(conn, cantidad: int = 1):
+    await execute(conn, "metricas.sumar_contador", ("users", _slot(), cantidad))
+
+
+async def reconstruir(app):
+    """
+    Recalcula todas las tablas resumen desde Subscription y User en una sola
+    transacción. Las escrituras concurrentes esperan a que termine, conviene
+    ejecutarla con poco tráfico.
+    """
+    async with db_connection(app, transaction=True) as conn:
+        for tabla in ("servicios", "ingresos", "estados", "contadores"):
+            await execute(conn, f"metricas.vaciar_{tabla}")
+        await execute(conn, "metricas.reconstruir_servicios")
+        await execute(conn, "metricas.reconstruir_ingresos")
+        await execute(conn, "metricas.reconstruir_estados")
+        await execute(conn, "metricas.reconstruir_usuarios")
+
+        total = await fetch_one(conn, "metricas.leer_contador", ("users",))
+        meses = await fetch_all(conn, "metricas.leer_ingresos_por_mes")
+    return {"usuarios": total["total"], "meses": len(meses)}
+
+
+async def _main():
+    # el pool vive en app.state, se usa un contenedor equivalente fuera de FastAPI
+    app = SimpleNamespace(state=SimpleNamespace())
+    try:
+        resultado = await reconstruir(app)
+        print(f"Tablas resumen reconstruidas: {resultado['usuarios']} usuarios, {resultado['meses']} meses")
+    finally:
+        if hasattr(app.state, "db_pool"):
+            app.state.db_pool.close()
+            await app.state.db_pool.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,221 @@
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sys
+from datetime import date, timedelta
+from types import SimpleNamespace
+import aiomysql
+from queries import db_connection, execute, explain, fetch_all, fetch_one, register_query
+
+"""
+Migraciones del esquema, aplicadas al desplegar antes de levantar la API.
+
+Cada archivo de migrations/ se llama NNN_nombre.sql y se aplica una sola
+vez, en orden de NNN; las aplicadas quedan en SchemaMigration. Los
+archivos deben poder ejecutarse sobre una base que ya tenga el cambio
+(creada con el DBSubPlatm.sql actual): los errores de "ya existe" / "no
+existe" de la DDL se ignoran.
+
+Las sentencias se separan por un ";" al final de la línea y las líneas
+que empiezan con "--" se descartan.
+
+Uso (desde backend/API):
+    python -m migrate            aplica las pendientes
+    python -m migrate --status   lista aplicadas y pendientes
+    python -m migrate --check    EXPLAIN de las consultas críticas, falla si alguna recorre una tabla sin índice
+"""
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# segundos esperando a otro proceso que esté migrando (varios contenedores a la vez)
+MIGRATION_LOCK_TIMEOUT = int(os.getenv("MIGRATION_LOCK_TIMEOUT", 60))
+
+_ARCHIVO = re.compile(r"^(\d{3})_(\w+)\.sql$")
+
+# tabla ya existe, columna duplicada, índice duplicado, no existe al borrar, FK duplicada
+_ERRORES_IDEMPOTENTES = {1050, 1060, 1061, 1091, 1826}
+
+register_query("migraciones.crear_tabla", """
+    CREATE TABLE IF NOT EXISTS SchemaMigration(
+        Version INT PRIMARY KEY,
+        Name VARCHAR(100) NOT NULL,
+        AppliedAt DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+""")
+register_query("migraciones.aplicadas", "SELECT Version, Name, AppliedAt FROM SchemaMigration ORDER BY Version")
+register_query("migraciones.registrar", "INSERT INTO SchemaMigration (Version, Name) VALUES (%s, %s)")
+register_query("migraciones.bloquear", "SELECT GET_LOCK('schema_migration', %s) AS obtenido")
+register_query("migraciones.liberar", "SELECT RELEASE_LOCK('schema_migration')")
+
+
+def migraciones_disponibles() -> list:
+    """(versión, nombre, ruta) de cada archivo de migrations/, en orden."""
+    resultado = []
+    for archivo in sorted(os.listdir(MIGRATIONS_DIR)):
+        coincidencia = _ARCHIVO.match(archivo)
+        if coincidencia:
+            resultado.append((int(coincidencia.group(1)), coincidencia.group(2), os.path.join(MIGRATIONS_DIR, archivo)))
+    versiones = [version for version, _, _ in resultado]
+    if len(versiones) != len(set(versiones)):
+        raise ValueError("Hay dos migraciones con el mismo número")
+    return resultado
+
+
+def sentencias(ruta: str) -> list:
+    with open(ruta, encoding="utf-8") as f:
+        lineas = [linea for linea in f if not linea.lstrip().startswith("--")]
+    resultado = []
+    actual = []
+    for linea in lineas:
+        actual.append(linea)
+        if linea.rstrip().endswith(";"):
+            sentencia = "".join(actual).strip().rstrip(";").strip()
+            if sentencia:
+                resultado.append(sentencia)
+            actual = []
+    if "".join(actual).strip():
+        resultado.append("".join(actual).strip())
+    return resultado
+
+
+async def _aplicar(conn, version: int, nombre: str, ruta: str):
+    # las sentencias vienen de un archivo, no de register_query: sin parámetros,
+    # así los % (DATE_FORMAT) llegan tal cual a MySQL
+    async with conn.cursor() as cursor:
+        for sentencia in sentencias(ruta):
+            try:
+                await cursor.execute(sentencia)
+            except aiomysql.MySQLError as e:
+                if e.args and e.args[0] in _ERRORES_IDEMPOTENTES:
+                    logger.info(f"  {version:03d}: ya aplicado ({e.args[1]})")
+                    continue
+                raise
+    await execute(conn, "migraciones.registrar", (version, nombre))
+
+
+async def migrar(app) -> list:
+    """Aplica las migraciones pendientes y devuelve las que aplicó."""
+    aplicadas_ahora = []
+    async with db_connection(app) as conn:
+        # GET_LOCK es por conexión: todo el proceso usa esta misma
+        bloqueo = await fetch_one(conn, "migraciones.bloquear", (MIGRATION_LOCK_TIMEOUT,))
+        if bloqueo["obtenido"] != 1:
+            raise RuntimeError(f"Otro proceso está migrando el esquema (esperé {MIGRATION_LOCK_TIMEOUT}s)")
+        try:
+            await execute(conn, "migraciones.crear_tabla")
+            aplicadas = {row["Version"] for row in await fetch_all(conn, "migraciones.aplicadas")}
+            for version, nombre, ruta in migraciones_disponibles():
+                if version in aplicadas:
+                    continue
+                logger.info(f"Aplicando migración {version:03d}_{nombre}")
+                await _aplicar(conn, version, nombre, ruta)
+                aplicadas_ahora.append(f"{version:03d}_{nombre}")
+        finally:
+            await execute(conn, "migraciones.liberar")
+    return aplicadas_ahora
+
+
+async def estado(app) -> list:
+    async with db_connection(app) as conn:
+        await execute(conn, "migraciones.crear_tabla")
+        aplicadas = {row["Version"]: row for row in await fetch_all(conn, "migraciones.aplicadas")}
+    return [
+        {
+            "migracion": f"{version:03d}_{nombre}",
+            "aplicada": aplicadas[version]["AppliedAt"] if version in aplicadas else None,
+        }
+        for version, nombre, _ in migraciones_disponibles()
+    ]
+
+
+def _consultas_criticas() -> list:
+    """(consulta, parámetros de ejemplo, partes dinámicas) de las rutas más usadas."""
+    hoy = date.today()
+    hace_un_anio = hoy - timedelta(days=365)
+    return [
+        ("scheduler.por_vencer", (hoy, hoy + timedelta(days=1), 0), {}),
+        ("scheduler.vencer_bloque", (500,), {}),
+        ("wallet.balance", (1,), {}),
+        ("wallet.debitar", (1, 1, 1), {}),
+        ("wallet.transacciones", (1,), {}),
+        ("wallet.pendientes_snapshot", (1, 1), {}),
+        ("wallet.movimientos_desde", (1, 0), {}),
+        ("metodos_pago.listar", (1,), {}),
+        ("planes.por_servicio_tipo", (1, "monthly"), {}),
+        ("planes.resolver_carrito", (1, "monthly", 2, "annual"), {"pares": "(%s, %s), (%s, %s)"}),
+        ("gastos.listar", (1, hace_un_anio, hoy, 51, 1, hace_un_anio, hoy, 51, 51), {"cursor_wallet": "", "cursor_suscripcion": ""}),
+        ("gastos.resumen", (1, hace_un_anio, hoy, 1, hace_un_anio, hoy), {}),
+        ("importacion.nombres_existentes", ("Netflix Premium", "Spotify Premium"), {"nombres": "%s, %s"}),
+        ("suscripciones.historial", (1,), {}),
+        ("admin.suscripciones.listar", ("active", 51), {"where": "s.Status = %s"}),
+        ("admin.usuarios.pagina", (0, "active", 51), {"filtros": " AND AccountStatus = %s"}),
+        ("admin.usuarios.ids_pagina", (0, "active", 500), {"filtros": " AND AccountStatus = %s"}),
+        ("outbox.reclamar", (50,), {}),
+        ("tokens.revocados", None, {}),
+    ]
+
+
+async def verificar_indices(app) -> bool:
+    """
+    Ejecuta EXPLAIN sobre las consultas críticas. Falla si alguna recorre una
+    tabla completa (type = ALL), haya o no índices posibles: un índice que
+    MySQL no elige es un plan degradado. Con tablas casi vacías o estadísticas
+    viejas el optimizador puede preferir el recorrido; conviene revisar sobre
+    una base con datos (generar_datos.py) y tras ANALYZE TABLE.
+    """
+    # registra las consultas de todos los routers
+    import main  # noqa: F401
+
+    correcto = True
+    async with db_connection(app) as conn:
+        for nombre, params, fmt in _consultas_criticas():
+            recorre = False
+            for fila in await explain(conn, nombre, params, **fmt):
+                tabla = fila.get("table") or ""
+                # <union1,2>, <derived2>: tablas temporales del propio plan
+                if tabla.startswith("<") or fila.get("type") != "ALL":
+                    continue
+                recorre = True
+                if not fila.get("possible_keys"):
+                    print(f"FALLA  {nombre}: recorre {tabla} completa, sin índice posible")
+                else:
+                    print(f"FALLA  {nombre}: recorre {tabla} completa aunque puede usar {fila['possible_keys']} ({fila.get('rows')} filas)")
+            if recorre:
+                correcto = False
+            else:
+                print(f"ok     {nombre}")
+    return correcto
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de SubscriptionPlatform")
+    parser.add_argument("--status", action="store_true", help="lista las migraciones aplicadas y pendientes")
+    parser.add_argument("--check", action="store_true", help="verifica con EXPLAIN que las consultas críticas usan índices")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # el pool vive en app.state, se usa un contenedor equivalente fuera de FastAPI
+    app = SimpleNamespace(state=SimpleNamespace())
+    codigo = 0
+    try:
+        if args.status:
+            for fila in await estado(app):
+                print(f"{fila['migracion']:40} {fila['aplicada'] or 'pendiente'}")
+        elif args.check:
+            if not await verificar_indices(app):
+                codigo = 1
+        else:
+            aplicadas = await migrar(app)
+            print(f"Migraciones aplicadas: {', '.join(aplicadas) if aplicadas else 'ninguna pendiente'}")
+    finally:
+        if hasattr(app.state, "db_pool"):
+            app.state.db_pool.close()
+            await app.state.db_pool.wait_closed()
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,27 @@
+-- Índices compuestos para los predicados más frecuentes de la API.
+-- Las bases creadas con el DBSubPlatm.sql actual ya los tienen: el runner
+-- ignora "Duplicate key name" y la migración queda registrada igual.
+
+-- Scheduler (vencimientos) y reportes por estado / fechas
+CREATE INDEX IX_Subscription_Status_EndDate ON Subscription (Status, EndDate);
+CREATE INDEX IX_Subscription_EndDate ON Subscription (EndDate);
+CREATE INDEX IX_Subscription_StartDate ON Subscription (StartDate);
+CREATE INDEX IX_Subscription_PlanId_Status ON Subscription (PlanId, Status);
+-- Historial y gastos de un usuario
+CREATE INDEX IX_Subscription_UserId_StartDate ON Subscription (UserId, StartDate);
+
+-- Wallet (recargas, deducciones) y gastos por usuario y fecha
+CREATE INDEX IX_WalletTransaction_UserId_Type_Date ON WalletTransaction (UserId, Type, TransactionDate);
+CREATE INDEX IX_WalletTransaction_UserId_Date ON WalletTransaction (UserId, TransactionDate);
+
+-- Checkout: plan de un servicio por tipo
+CREATE INDEX IX_Plan_ServiceId_Type ON Plan (ServiceId, Type);
+
+-- Saldo de la wallet y métodos de pago de un usuario
+CREATE INDEX IX_PaymentMethod_UserId_Type ON PaymentMethod (UserId, Type);
+
+-- Listados del administrador
+CREATE INDEX IX_User_AccountStatus_Rol ON User (AccountStatus, Rol);
+CREATE INDEX IX_User_Rol ON User (Rol);
+CREATE INDEX IX_User_Name ON User (Name);
+CREATE INDEX IX_Service_Category ON Service (Category);
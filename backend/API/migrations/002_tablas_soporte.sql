@@ -0,0 +1,90 @@
+-- Tablas de soporte agregadas después del esquema original (scheduler,
+-- outbox, tokens revocados, tablas resumen y versiones de datos), para
+-- bases creadas con una versión anterior de DBSubPlatm.sql.
+
+CREATE TABLE IF NOT EXISTS JobCheckpoint(
+    JobName VARCHAR(50) NOT NULL,
+    TargetDate DATE NOT NULL,
+    LastId INT NOT NULL DEFAULT 0,
+    Processed INT NOT NULL DEFAULT 0,
+    Finished VARCHAR(3) DEFAULT 'no' CHECK (Finished IN ('yes','no')) NOT NULL,
+    UpdatedAt DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (JobName, TargetDate)
+);
+
+CREATE TABLE IF NOT EXISTS EmailOutbox(
+    OutboxId BIGINT PRIMARY KEY AUTO_INCREMENT,
+    Recipient VARCHAR(150) NOT NULL,
+    Subject VARCHAR(250) NOT NULL,
+    TemplateName VARCHAR(100) NOT NULL,
+    Context JSON NOT NULL,
+    Status VARCHAR(20) DEFAULT 'pending' CHECK (Status IN ('pending','sending','sent','failed')) NOT NULL,
+    Attempts INT NOT NULL DEFAULT 0,
+    NextAttemptAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    ClaimedAt DATETIME,
+    SentAt DATETIME,
+    LastError VARCHAR(250),
+    CreatedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX IX_EmailOutbox_Status_Next (Status, NextAttemptAt)
+);
+
+CREATE TABLE IF NOT EXISTS TokenRevocation(
+    RevocationId INT PRIMARY KEY AUTO_INCREMENT,
+    Jti VARCHAR(32),
+    UserId INT NOT NULL,
+    RevokedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    ExpiresAt DATETIME NOT NULL,
+    INDEX IX_TokenRevocation_ExpiresAt (ExpiresAt),
+    CONSTRAINT FK_User_TokenRevocation FOREIGN KEY (UserId) REFERENCES User(UserId)
+);
+
+CREATE TABLE IF NOT EXISTS ServiceSubscriptionStats(
+    ServiceId INT NOT NULL,
+    Slot TINYINT NOT NULL,
+    Subscriptions INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (ServiceId, Slot),
+    CONSTRAINT FK_Service_ServiceSubscriptionStats FOREIGN KEY (ServiceId) REFERENCES Service(ServiceId)
+);
+
+CREATE TABLE IF NOT EXISTS MonthlyRevenue(
+    Month CHAR(7) NOT NULL,
+    Slot TINYINT NOT NULL,
+    Revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    Subscriptions INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Month, Slot)
+);
+
+CREATE TABLE IF NOT EXISTS SubscriptionStatusCount(
+    Status VARCHAR(20) NOT NULL,
+    Slot TINYINT NOT NULL,
+    Total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Status, Slot)
+);
+
+CREATE TABLE IF NOT EXISTS MetricCounter(
+    Name VARCHAR(50) NOT NULL,
+    Slot TINYINT NOT NULL,
+    Value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Name, Slot)
+);
+
+CREATE TABLE IF NOT EXISTS DataVersion(
+    Name VARCHAR(50) PRIMARY KEY,
+    Version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Tablas resumen recalculadas desde las tablas base (igual que python -m metricas)
+START TRANSACTION;
+DELETE FROM ServiceSubscriptionStats;
+DELETE FROM MonthlyRevenue;
+DELETE FROM SubscriptionStatusCount;
+DELETE FROM MetricCounter;
+INSERT INTO ServiceSubscriptionStats (ServiceId, Slot, Subscriptions)
+SELECT p.ServiceId, 0, COUNT(*) FROM Subscription AS sub JOIN Plan AS p ON sub.PlanId = p.PlanId GROUP BY p.ServiceId;
+INSERT INTO MonthlyRevenue (Month, Slot, Revenue, Subscriptions)
+SELECT DATE_FORMAT(StartDate, '%Y-%m'), 0, SUM(AmountPaid), COUNT(*) FROM Subscription GROUP BY DATE_FORMAT(StartDate, '%Y-%m');
+INSERT INTO SubscriptionStatusCount (Status, Slot, Total)
+SELECT Status, 0, COUNT(*) FROM Subscription WHERE Status IS NOT NULL GROUP BY Status;
+INSERT INTO MetricCounter (Name, Slot, Value)
+SELECT 'users', 0, COUNT(*) FROM `User`;
+COMMIT;
@@ -0,0 +1,39 @@
+-- Libro mayor de la wallet (ver backend/API/wallet.py): cada movimiento guarda
+-- el saldo resultante y WalletSnapshot acota cuántos hay que repetir para verificarlo.
+
+ALTER TABLE WalletTransaction ADD COLUMN BalanceAfter DECIMAL(10,2) NULL;
+CREATE INDEX IX_WalletTransaction_UserId_Id ON WalletTransaction (UserId, TransactionId);
+
+CREATE TABLE IF NOT EXISTS WalletSnapshot(
+    UserId INT NOT NULL,
+    TransactionId INT NOT NULL,
+    Balance DECIMAL(10,2) NOT NULL,
+    CreatedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (UserId, TransactionId),
+    CONSTRAINT FK_User_WalletSnapshot FOREIGN KEY (UserId) REFERENCES User(UserId)
+);
+
+-- Saldo de cada movimiento histórico, calculado hacia atrás desde el saldo vigente:
+-- el último movimiento queda igual a PaymentMethod.WalletBalance
+UPDATE WalletTransaction AS wt
+JOIN (
+    SELECT
+        TransactionId,
+        COALESCE(SUM(CASE WHEN Type = 'recharge' THEN Amount ELSE -Amount END)
+            OVER (PARTITION BY UserId ORDER BY TransactionId ROWS BETWEEN 1 FOLLOWING AND UNBOUNDED FOLLOWING), 0) AS Posterior
+    FROM WalletTransaction
+) AS mov ON mov.TransactionId = wt.TransactionId
+JOIN PaymentMethod AS pm ON pm.UserId = wt.UserId AND pm.Type = 'wallet'
+SET wt.BalanceAfter = pm.WalletBalance - mov.Posterior
+WHERE wt.BalanceAfter IS NULL;
+
+-- Snapshot inicial en el último movimiento de cada usuario
+INSERT IGNORE INTO WalletSnapshot (UserId, TransactionId, Balance)
+SELECT wt.UserId, wt.TransactionId, wt.BalanceAfter
+FROM WalletTransaction AS wt
+JOIN (
+    SELECT UserId, MAX(TransactionId) AS TransactionId
+    FROM WalletTransaction
+    GROUP BY UserId
+) AS ultimo ON ultimo.TransactionId = wt.TransactionId
+WHERE wt.BalanceAfter IS NOT NULL;
@@ -0,0 +1,2 @@
+-- Búsqueda de servicios por nombre (importación masiva del catálogo)
+CREATE INDEX IX_Service_Name ON Service (Name);
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import os
+from mailer import send_email
+from queries import db_connection, execute, fetch_all, fetch_one, placeholders, register_query
+
+"""
+Outbox transaccional de correos.
+
+Los endpoints insertan el correo en EmailOutbox dentro de la misma
+transacción que la fila de negocio (encolar_correo) y nunca tocan SMTP.
+El dispatcher, que corre como tarea de fondo en cada worker, reclama
+lotes pendientes con FOR UPDATE SKIP LOCKED, los envía y reintenta los
+fallidos con backoff exponencial.
+"""
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 50))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 2))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 6))
+OUTBOX_BACKOFF_BASE = int(os.getenv("OUTBOX_BACKOFF_BASE", 30))  # segundos
+# tiempo tras el cual un correo 'sending' se considera huérfano (worker caído)
+OUTBOX_CLAIM_TIMEOUT = int(os.getenv("OUTBOX_CLAIM_TIMEOUT", 300))
+
+
+register_query("outbox.encolar", """
+    INSERT INTO EmailOutbox (Recipient, Subject, TemplateName, Context)
+    VALUES (%s, %s, %s, %s)
+""")
+register_query("outbox.liberar_huerfanos", """
+    UPDATE EmailOutbox SET Status = 'pending'
+    WHERE Status = 'sending' AND ClaimedAt < NOW() - INTERVAL %s SECOND
+""")
+register_query("outbox.reclamar", """
+    SELECT OutboxId, Recipient, Subject, TemplateName, Context, Attempts
+    FROM EmailOutbox
+    WHERE Status = 'pending' AND NextAttemptAt <= NOW()
+    ORDER BY NextAttemptAt
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+""")
+register_query("outbox.marcar_enviando", """
+    UPDATE EmailOutbox SET Status = 'sending', ClaimedAt = NOW()
+    WHERE OutboxId IN ({ids})
+""")
+register_query("outbox.marcar_enviados", """
+    UPDATE EmailOutbox
+    SET Status = 'sent', SentAt = NOW(), Attempts = Attempts + 1
+    WHERE OutboxId IN ({ids})
+""")
+register_query("outbox.reprogramar", """
+    UPDATE EmailOutbox
+    SET Status = %s, Attempts = %s, LastError = %s,
+        NextAttemptAt = NOW() + INTERVAL %s SECOND
+    WHERE OutboxId = %s
+""")
+register_query("outbox.cola", """
+    SELECT
+        COUNT(*) AS pendientes,
+        TIMESTAMPDIFF(SECOND, MIN(CreatedAt), NOW()) AS lag_segundos
+    FROM EmailOutbox
+    WHERE Status IN ('pending', 'sending')
+""")
+
+
+async def encolar_correo(conn, subject: str, to: str, template_name: str, context: dict):
+    """Inserta el correo en el outbox usando la conexión (y la transacción) del llamador."""
+    await execute(
+        conn, "outbox.encolar",
+        (to, subject, template_name, json.dumps(context, default=str))
+    )
+
+
+class OutboxDispatcher:
+
+    def __init__(self, app):
+        self.app = app
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def run(self):
+        while True:
+            try:
+                enviados = await self.despachar_lote()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error en el dispatcher del outbox: {e}")
+                enviados = 0
+            # si el lote vino lleno hay más trabajo, se sigue sin esperar
+            if enviados < OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+    async def reclamar_lote(self):
+        # devuelve a la cola los correos de un worker que murió a mitad de envío
+        async with db_connection(self.app) as conn:
+            await execute(conn, "outbox.liberar_huerfanos", (OUTBOX_CLAIM_TIMEOUT,))
+
+        async with db_connection(self.app, transaction=True) as conn:
+            rows = await fetch_all(conn, "outbox.reclamar", (OUTBOX_BATCH_SIZE,))
+            if rows:
+                ids = [row["OutboxId"] for row in rows]
+                await execute(conn, "outbox.marcar_enviando", ids, ids=placeholders(len(ids)))
+        return rows
+
+    async def enviar(self, row):
+        try:
+            await send_email(
+                row["Subject"],
+                row["Recipient"],
+                row["TemplateName"],
+                json.loads(row["Context"])
+            )
+            return None
+        except Exception as e:
+            return str(e)[:250]
+
+    async def despachar_lote(self):
+        rows = await self.reclamar_lote()
+        if not rows:
+            return 0
+
+        errores = await asyncio.gather(*[self.enviar(row) for row in rows])
+
+        async with db_connection(self.app) as conn:
+            enviados = [row["OutboxId"] for row, error in zip(rows, errores) if error is None]
+            if enviados:
+                await execute(conn, "outbox.marcar_enviados", enviados, ids=placeholders(len(enviados)))
+                self.sent += len(enviados)
+
+            for row, error in zip(rows, errores):
+                if error is None:
+                    continue
+                intentos = row["Attempts"] + 1
+                if intentos >= OUTBOX_MAX_ATTEMPTS:
+                    estado = "failed"
+                    self.failed += 1
+                else:
+                    estado = "pending"
+                    self.retried += 1
+                await execute(
+                    conn, "outbox.reprogramar",
+                    (estado, intentos, error, OUTBOX_BACKOFF_BASE * 2 ** row["Attempts"], row["OutboxId"])
+                )
+                logger.warning(f"Correo {row['OutboxId']} a {row['Recipient']} falló ({estado}): {error}")
+
+        return len(rows)
+
+    async def stats(self) -> dict:
+        async with db_connection(self.app) as conn:
+            cola = await fetch_one(conn, "outbox.cola")
+        return {
+            "pendientes": cola["pendientes"],
+            "lag_segundos": cola["lag_segundos"] or 0,
+            "enviados": self.sent,
+            "reintentados": self.retried,
+            "fallidos": self.failed,
+        }
+
+
+def start_outbox_dispatcher(app):
+    app.state.outbox = OutboxDispatcher(app)
+    app.state.outbox_task = asyncio.create_task(app.state.outbox.run())
+
+
+async def stop_outbox_dispatcher(app):
+    task = getattr(app.state, "outbox_task", None)
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,269 @@
+import asyncio
+import os
+import time
+import weakref
+from collections import namedtuple
+from contextlib import asynccontextmanager
+import aiomysql
+from database import get_db_pool
+
+"""
+Capa de acceso a datos.
+
+Cada módulo registra sus sentencias con un nombre (register_query) y las
+ejecuta por ese nombre con fetch_all / fetch_one / execute. Así todas las
+consultas pasan por un único punto que mide latencia y filas por nombre,
+y query_stats() muestra qué sentencias concentran el tiempo de MySQL.
+
+Las sentencias pueden tener partes dinámicas con llaves ({where}, {ids})
+que se completan con argumentos nombrados; los valores siempre van como
+parámetros %s.
+
+fetch_parallel() ejecuta consultas de lectura independientes en paralelo,
+cada una en su propia conexión del pool.
+"""
+
+# conexiones que fetch_parallel puede ocupar a la vez, sumando todas las
+# peticiones del proceso, y segundos máximos por consulta
+QUERY_FANOUT_CONCURRENCY = int(os.getenv("QUERY_FANOUT_CONCURRENCY", 4))
+QUERY_FANOUT_TIMEOUT = float(os.getenv("QUERY_FANOUT_TIMEOUT", 10))
+
+# un semáforo compartido por todas las llamadas (uno por event loop, un
+# asyncio.Semaphore no sirve en otro loop): varias cargas del panel o de
+# reportes a la vez no pueden acaparar el pool y dejar sin conexión al resto
+_fanout = weakref.WeakKeyDictionary()
+
+
+def _semaforo_fanout() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaforo = _fanout.get(loop)
+    if semaforo is None:
+        semaforo = _fanout[loop] = asyncio.Semaphore(QUERY_FANOUT_CONCURRENCY)
+    return semaforo
+
+
+QUERIES = {}
+
+ExecResult = namedtuple("ExecResult", ["rowcount", "lastrowid"])
+
+
+def register_query(name: str, sql: str):
+    if name in QUERIES and QUERIES[name] != sql:
+        raise ValueError(f"Consulta '{name}' registrada dos veces con SQL distinto")
+    QUERIES[name] = sql
+
+
+def placeholders(n: int) -> str:
+    """Lista de %s para cláusulas IN (...)."""
+    return ", ".join(["%s"] * n)
+
+
+class QueryStats:
+
+    def __init__(self):
+        self._stats = {}
+
+    def record(self, name: str, ms: float, rows: int, error: bool = False):
+        s = self._stats.get(name)
+        if s is None:
+            s = self._stats[name] = {"llamadas": 0, "errores": 0, "total_ms": 0.0, "max_ms": 0.0, "filas": 0}
+        s["llamadas"] += 1
+        s["total_ms"] += ms
+        s["max_ms"] = max(s["max_ms"], ms)
+        s["filas"] += max(rows, 0)
+        if error:
+            s["errores"] += 1
+
+    def snapshot(self) -> list:
+        resultado = []
+        for name, s in self._stats.items():
+            resultado.append({
+                "consulta": name,
+                "llamadas": s["llamadas"],
+                "errores": s["errores"],
+                "total_ms": round(s["total_ms"], 2),
+                "promedio_ms": round(s["total_ms"] / s["llamadas"], 2),
+                "max_ms": round(s["max_ms"], 2),
+                "filas": s["filas"],
+            })
+        # las que más tiempo acumulan primero
+        return sorted(resultado, key=lambda r: r["total_ms"], reverse=True)
+
+
+stats = QueryStats()
+
+
+def query_stats() -> list:
+    return stats.snapshot()
+
+
+@asynccontextmanager
+async def db_connection(app, transaction: bool = False):
+    """
+    Conexión del pool. Con transaction=True abre una transacción que se
+    confirma al salir del bloque y se revierte si ocurre cualquier excepción.
+    """
+    pool = await get_db_pool(app)
+    async with pool.acquire() as conn:
+        if not transaction:
+            yield conn
+            return
+        await conn.begin()
+        try:
+            yield conn
+        except BaseException:
+            await conn.rollback()
+            raise
+        await conn.commit()
+
+
+def _sql(name: str, fmt: dict) -> str:
+    sql = QUERIES[name]
+    return sql.format(**fmt) if fmt else sql
+
+
+async def _run(conn, name, params, fmt, dict_rows, fetch):
+    cursor_class = aiomysql.DictCursor if dict_rows else aiomysql.Cursor
+    inicio = time.perf_counter()
+    rows = 0
+    error = False
+    try:
+        async with conn.cursor(cursor_class) as cursor:
+            await cursor.execute(_sql(name, fmt), params)
+            if fetch == "all":
+                result = await cursor.fetchall()
+                rows = len(result)
+            elif fetch == "one":
+                result = await cursor.fetchone()
+                rows = 1 if result else 0
+            else:
+                result = ExecResult(cursor.rowcount, cursor.lastrowid)
+                rows = cursor.rowcount
+            return result
+    except BaseException:
+        error = True
+        raise
+    finally:
+        stats.record(name, (time.perf_counter() - inicio) * 1000, rows, error)
+
+
+async def fetch_all(conn, name: str, params=None, dict_rows: bool = True, **fmt):
+    return await _run(conn, name, params, fmt, dict_rows, "all")
+
+
+async def fetch_one(conn, name: str, params=None, dict_rows: bool = True, **fmt):
+    return await _run(conn, name, params, fmt, dict_rows, "one")
+
+
+async def explain(conn, name: str, params=None, **fmt) -> list:
+    """Plan de ejecución (EXPLAIN) de una consulta registrada, fila por tabla."""
+    async with conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute("EXPLAIN " + _sql(name, fmt), params)
+        return await cursor.fetchall()
+
+
+async def _consulta_aislada(app, semaforo, timeout, fn, name, params):
+    async with semaforo:
+        async with db_connection(app) as conn:
+            try:
+                return await asyncio.wait_for(fn(conn, name, params), timeout)
+            except asyncio.TimeoutError:
+                # el resultado quedó a medio leer, la conexión no vuelve al pool
+                conn.close()
+                raise TimeoutError(f"La consulta '{name}' superó {timeout}s")
+            except asyncio.CancelledError:
+                conn.close()
+                raise
+
+
+async def fetch_parallel(app, consultas: dict, timeout: float = None) -> dict:
+    """
+    Ejecuta lecturas independientes en paralelo, cada una en su propia
+    conexión y con `timeout` segundos por consulta. Entre todas las llamadas
+    en curso hay a lo sumo QUERY_FANOUT_CONCURRENCY consultas a la vez. La
+    latencia total es la de la consulta más lenta.
+
+        r = await fetch_parallel(app, {
+            "usuarios": (fetch_one, "reportes.resumen.usuarios"),
+            "top": (fetch_all, "metricas.leer_top_servicios", (5,)),
+        })
+        r["usuarios"], r["top"]
+
+    Si una falla, las demás se cancelan y se propaga el error.
+    """
+    semaforo = _semaforo_fanout()
+    timeout = timeout or QUERY_FANOUT_TIMEOUT
+    tareas = {}
+    for clave, (fn, name, *params) in consultas.items():
+        tareas[clave] = asyncio.create_task(
+            _consulta_aislada(app, semaforo, timeout, fn, name, params[0] if params else None)
+        )
+    try:
+        await asyncio.gather(*tareas.values())
+    except BaseException:
+        for tarea in tareas.values():
+            tarea.cancel()
+        await asyncio.gather(*tareas.values(), return_exceptions=True)
+        raise
+    return {clave: tarea.result() for clave, tarea in tareas.items()}
+
+
+async def execute(conn, name: str, params=None, **fmt) -> ExecResult:
+    return await _run(conn, name, params, fmt, False, None)
+
+
+async def execute_many(conn, name: str, seq_params, **fmt) -> ExecResult:
+    """executemany: los INSERT ... VALUES se envían como un único INSERT multi-fila."""
+    inicio = time.perf_counter()
+    rows = 0
+    error = False
+    try:
+        async with conn.cursor() as cursor:
+            await cursor.executemany(_sql(name, fmt), seq_params)
+            rows = cursor.rowcount
+            return ExecResult(cursor.rowcount, cursor.lastrowid)
+    except BaseException:
+        error = True
+        raise
+    finally:
+        stats.record(name, (time.perf_counter() - inicio) * 1000, rows, error)
+
+
+async def stream(conn, name: str, params=None, chunk_size: int = 500, columnas: list = None, **fmt):
+    """
+    Lee el resultado con un cursor del lado del servidor (SSDictCursor) y lo
+    entrega en bloques de chunk_size filas, sin cargarlo completo en memoria.
+    El tiempo registrado incluye lo que tarde el consumidor en procesar cada bloque.
+    Si se pasa la lista `columnas`, se completa con los nombres de las columnas
+    del resultado apenas se ejecuta la consulta, aunque no devuelva filas.
+
+    Si el consumidor abandona la lectura (aclose, cliente desconectado) la
+    conexión se cierra: MySQL no permite cortar un resultado sin buffer y
+    cerrar el cursor obligaría a leer todas las filas restantes. El pool
+    descarta las conexiones cerradas al devolverlas.
+    """
+    inicio = time.perf_counter()
+    rows = 0
+    error = False
+    cursor = await conn.cursor(aiomysql.SSDictCursor)
+    try:
+        await cursor.execute(_sql(name, fmt), params)
+        if columnas is not None:
+            columnas.extend(col[0] for col in cursor.description or ())
+        while True:
+            bloque = await cursor.fetchmany(chunk_size)
+            if not bloque:
+                break
+            rows += len(bloque)
+            yield bloque
+    except GeneratorExit:
+        conn.close()
+        raise
+    except BaseException:
+        error = True
+        conn.close()
+        raise
+    else:
+        await cursor.close()
+    finally:
+        stats.record(name, (time.perf_counter() - inicio) * 1000, rows, error)
@@ -0,0 +1,49 @@
+"""
+Serialización JSON de las respuestas con orjson.
+
+Las filas de DictCursor traen Decimal y datetime. Por la ruta por defecto
+de FastAPI (jsonable_encoder + json.dumps) cada valor se recorre dos veces
+en Python; orjson escribe datetime/date directamente y solo llama a
+_por_defecto() para los tipos que no conoce.
+
+RespuestaJSON es la clase de respuesta de toda la app (main.py). Aun así,
+si la ruta devuelve un dict FastAPI lo pasa antes por jsonable_encoder:
+las rutas con respuestas grandes devuelven RespuestaJSON(...) directamente
+para saltarse ese paso.
+
+Los números siguen el mismo formato que jsonable_encoder: un Decimal sin
+decimales sale como entero y el resto como float (49.99, 10.0).
+"""
+from datetime import timedelta
+from decimal import Decimal
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+_OPCIONES = orjson.OPT_NON_STR_KEYS
+
+
+def _por_defecto(valor):
+    if isinstance(valor, Decimal):
+        return int(valor) if valor.as_tuple().exponent >= 0 else float(valor)
+    if isinstance(valor, timedelta):
+        return valor.total_seconds()
+    if isinstance(valor, (set, frozenset)):
+        return list(valor)
+    if isinstance(valor, BaseModel):
+        return valor.model_dump(mode="json")
+    if isinstance(valor, bytes):
+        return valor.decode("utf-8", errors="replace")
+    raise TypeError(f"Tipo no serializable a JSON: {type(valor).__name__}")
+
+
+def serializar(contenido) -> bytes:
+    """JSON en UTF-8 con el mismo formato que las respuestas de la API."""
+    return orjson.dumps(contenido, default=_por_defecto, option=_OPCIONES)
+
+
+class RespuestaJSON(JSONResponse):
+
+    def render(self, content) -> bytes:
+        return serializar(content)
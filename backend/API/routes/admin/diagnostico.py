@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, Request
+from mailer import get_mailer_stats
+from database import get_db_pool
+from queries import db_connection, query_stats
+from cache import get_cache_stats
+from auth import requiere_admin
+from wallet import verificar
+
+"""
+Endpoints de diagnóstico para dimensionar la API con tráfico real:
+- estado del pool de sesiones SMTP y latencia de envío
+- profundidad y atraso de la cola del outbox de correos
+- espera por conexión, conexiones en uso y timeouts del pool de MySQL
+- llamadas, latencia y filas por consulta nombrada
+- aciertos, fallos y recargas de la caché de reportes
+- última ejecución del vencimiento de suscripciones
+- saldo de una wallet contra el reconstruido desde su último snapshot
+"""
+
+router = APIRouter(dependencies=[Depends(requiere_admin)])
+
+@router.get("/admin/diagnostico/mailer")
+async def estado_mailer():
+    return {"mailer": get_mailer_stats()}
+
+
+@router.get("/admin/diagnostico/outbox")
+async def estado_outbox(request: Request):
+    return {"outbox": await request.app.state.outbox.stats()}
+
+
+@router.get("/admin/diagnostico/db")
+async def estado_pool_db(request: Request):
+    pool = await get_db_pool(request.app)
+    return {"db_pool": pool.stats()}
+
+
+@router.get("/admin/diagnostico/queries")
+async def estado_consultas():
+    # ordenadas por tiempo acumulado, las más costosas primero
+    return {"consultas": query_stats()}
+
+
+@router.get("/admin/diagnostico/cache")
+async def estado_cache():
+    return {"cache": get_cache_stats()}
+
+
+@router.get("/admin/diagnostico/vencimientos")
+async def estado_vencimientos(request: Request):
+    return {"ultimo_vencimiento": getattr(request.app.state, "ultimo_vencimiento", None)}
+
+
+@router.get("/admin/diagnostico/wallet/{user_id}")
+async def verificar_wallet(user_id: int, request: Request):
+    async with db_connection(request.app) as conn:
+        return {"wallet": await verificar(conn, user_id)}
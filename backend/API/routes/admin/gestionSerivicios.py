@@ -1,7 +1,13 @@
-import aiomysql
-from fastapi import APIRouter, Request, HTTPException
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, Request, HTTPException, Query
 from pydantic import BaseModel
-from database import get_db_pool
+from queries import db_connection, execute, fetch_all, register_query
+from auth import requiere_admin, usuario_actual
+from cache import invalidar, SERVICIOS
+from versiones import etag_de, incrementar_version, marcar_etag, no_modificado, publicar_version, respuesta_304
+import importacion
+from respuestas import RespuestaJSON
 
 """
 el administrador podrá registrar, editar o eliminar servicios 
@@ -16,138 +22,179 @@ class Service(BaseModel):
     price: float
     plan_type: str  #mensual, anual
 
+register_query("servicios.listar_planes", """
+    SELECT 
+        s.ServiceId, 
+        s.Name AS ServiceName, 
+        s.Category, 
+        s.Description, 
+        p.PlanId,
+        p.Type AS PlanType, 
+        p.Price
+    FROM Plan p
+    JOIN Service s ON p.ServiceId = s.ServiceId
+""")
+register_query("servicios.insertar", """
+    INSERT INTO Service (Name, Category, Description)
+    VALUES (%s, %s, %s)
+""")
+register_query("planes.insertar", """
+    INSERT INTO Plan (ServiceId, Type, Price)
+    VALUES (%s, %s, %s)
+""")
+register_query("servicios.actualizar", """
+    UPDATE Service
+    SET Name=%s, Category=%s, Description=%s
+    WHERE ServiceId=%s
+""")
+register_query("planes.actualizar_por_servicio", """
+    UPDATE Plan
+    SET Type=%s, Price=%s
+    WHERE ServiceId=%s
+""")
+register_query("planes.eliminar_por_servicio", "DELETE FROM Plan WHERE ServiceId=%s")
+register_query("servicios.eliminar", "DELETE FROM Service WHERE ServiceId=%s")
+
 router = APIRouter()
 
-@router.get("/admin/servicios")  # Listar todos los planes y sus servicios relacionados
+@router.get("/admin/servicios", dependencies=[Depends(usuario_actual)])  # Listar todos los planes y sus servicios relacionados
 async def listar_servicios(request: Request):
+    # el catálogo solo cambia con las escrituras de abajo, que suben su versión;
+    # si el cliente ya tiene esta versión se responde 304 sin ir a MySQL
+    etag = etag_de(SERVICIOS)
+    if no_modificado(request, etag):
+        return respuesta_304(etag)
+
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                get_plans_sql = """
-                    SELECT 
-                        s.ServiceId, 
-                        s.Name AS ServiceName, 
-                        s.Category, 
-                        s.Description, 
-                        p.PlanId,
-                        p.Type AS PlanType, 
-                        p.Price
-                    FROM Plan p
-                    JOIN Service s ON p.ServiceId = s.ServiceId
-                """
-                await cursor.execute(get_plans_sql)
-                planes_servicios = await cursor.fetchall()
-
-                return {"planes_servicios": planes_servicios}
+        async with db_connection(request.app) as conn:
+            planes_servicios = await fetch_all(conn, "servicios.listar_planes")
+
+        response = RespuestaJSON({"planes_servicios": planes_servicios})
+        marcar_etag(response, etag)
+        return response
                 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar planes y servicios: {str(e)}")
 
 
-@router.post("/admin/servicios")  # Registrar un nuevo servicio
+@router.post("/admin/servicios", dependencies=[Depends(requiere_admin)])  # Registrar un nuevo servicio
 async def registrar_servicio(request: Request, servicio: Service):
     try:
-        pool = await get_db_pool(request.app)
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-
-                insert_service_sql = """
-                    INSERT INTO Service (Name, Category, Description)
-                    VALUES (%s, %s, %s)
-                """
-                await cursor.execute(
-                    insert_service_sql,
-                    (servicio.name, servicio.category, servicio.description)
-                )
-                # obtengo el id generado
-                service_id = cursor.lastrowid
-
-                # insertar en Plan, vinculando al Service recién creado
-                insert_plan_sql = """
-                    INSERT INTO Plan (ServiceId, Type, Price)
-                    VALUES (%s, %s, %s)
-                """
-                await cursor.execute(
-                    insert_plan_sql,
-                    (service_id, servicio.plan_type, servicio.price)
-                )
-
-                await conn.commit()
-
-                return {
-                    "message": "Servicio registrado exitosamente",
-                    "service_id": service_id,
-                    "plan_id": cursor.lastrowid
-                }
+        async with db_connection(request.app, transaction=True) as conn:
+            result = await execute(
+                conn, "servicios.insertar",
+                (servicio.name, servicio.category, servicio.description)
+            )
+            # obtengo el id generado
+            service_id = result.lastrowid
+
+            # insertar en Plan, vinculando al Service recién creado
+            plan = await execute(
+                conn, "planes.insertar",
+                (service_id, servicio.plan_type, servicio.price)
+            )
+            version = await incrementar_version(conn, SERVICIOS)
+
+        publicar_version(SERVICIOS, version)
+        invalidar(SERVICIOS)
+        return {
+            "message": "Servicio registrado exitosamente",
+            "service_id": service_id,
+            "plan_id": plan.lastrowid
+        }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al registrar servicio: {str(e)}")
 
 
 
-@router.put("/admin/servicios/{service_id}")  # Editar un servicio existente
+@router.post("/admin/servicios/importar", dependencies=[Depends(requiere_admin)])  # Importar un catálogo completo
+async def importar_servicios(
+    request: Request,
+    formato: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+    strict: bool = False,
+):
+    """
+    Importa servicios y planes desde un CSV o NDJSON enviado como cuerpo de
+    la petición (ver importacion.py). Con strict=true no escribe nada si
+    alguna fila tiene errores.
+    """
+    inicio = time.perf_counter()
+    if formato is None:
+        content_type = request.headers.get("content-type", "")
+        if "csv" in content_type:
+            formato = "csv"
+        elif "ndjson" in content_type or "jsonl" in content_type:
+            formato = "ndjson"
+        else:
+            raise HTTPException(status_code=400, detail="Indica format=csv o format=ndjson")
+
+    try:
+        contenido = await importacion.leer_cuerpo(request)
+        servicios, errores, leidas = importacion.validar(contenido, formato)
+    except importacion.ArchivoDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except importacion.FormatoInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    servicios = await importacion.descartar_existentes(request.app, servicios, errores)
+    if strict and errores:
+        return RespuestaJSON(
+            status_code=422,
+            content=importacion.reporte(leidas, errores, inicio, servicios_creados=0, planes_creados=0),
+        )
+
+    creados, planes, version, interrumpido = await importacion.escribir(request.app, servicios, SERVICIOS)
+    if version is not None:
+        publicar_version(SERVICIOS, version)
+        invalidar(SERVICIOS)
+
+    resultado = importacion.reporte(leidas, errores, inicio, servicios_creados=creados, planes_creados=planes)
+    if interrumpido:
+        resultado["interrumpido"] = interrumpido
+        return RespuestaJSON(status_code=500, content=resultado)
+    return resultado
+
+
+@router.put("/admin/servicios/{service_id}", dependencies=[Depends(requiere_admin)])  # Editar un servicio existente
 async def editar_servicio(request: Request, service_id: int, servicio: Service):
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-
-                update_service_sql = """
-                    UPDATE Service
-                    SET Name=%s, Category=%s, Description=%s
-                    WHERE ServiceId=%s
-                """
-                await cursor.execute(
-                    update_service_sql,
-                    (servicio.name, servicio.category, servicio.description, service_id)
-                )
-
-                # actualizar el plan asociado
-                update_plan_sql = """
-                    UPDATE Plan
-                    SET Type=%s, Price=%s
-                    WHERE ServiceId=%s
-                """
-                await cursor.execute(
-                    update_plan_sql,
-                    (servicio.plan_type, servicio.price, service_id)
-                )
-
-                await conn.commit()
-
-                return {"message": "Servicio actualizado exitosamente"}
+        async with db_connection(request.app, transaction=True) as conn:
+            await execute(
+                conn, "servicios.actualizar",
+                (servicio.name, servicio.category, servicio.description, service_id)
+            )
+
+            # actualizar el plan asociado
+            await execute(
+                conn, "planes.actualizar_por_servicio",
+                (servicio.plan_type, servicio.price, service_id)
+            )
+            version = await incrementar_version(conn, SERVICIOS)
+
+        publicar_version(SERVICIOS, version)
+        invalidar(SERVICIOS)
+        return {"message": "Servicio actualizado exitosamente"}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al editar servicio: {str(e)}")
     
 
 
-@router.delete("/admin/servicios/{service_id}")  # Eliminar un servicio
+@router.delete("/admin/servicios/{service_id}", dependencies=[Depends(requiere_admin)])  # Eliminar un servicio
 async def eliminar_servicio(request: Request, service_id: int):
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-
-                # Primero elimina los planes asociados
-                delete_plan_sql = """
-                    DELETE FROM Plan WHERE ServiceId=%s
-                """
-                await cursor.execute(delete_plan_sql, (service_id,))
-
-                # Luego elimina el servicio
-                delete_service_sql = """
-                    DELETE FROM Service WHERE ServiceId=%s
-                """
-                await cursor.execute(delete_service_sql, (service_id,))
+        async with db_connection(request.app, transaction=True) as conn:
+            # Primero elimina los planes asociados
+            await execute(conn, "planes.eliminar_por_servicio", (service_id,))
 
-                await conn.commit()
+            # Luego elimina el servicio
+            await execute(conn, "servicios.eliminar", (service_id,))
+            version = await incrementar_version(conn, SERVICIOS)
 
-                return {"message": "Servicio eliminado exitosamente"}
+        publicar_version(SERVICIOS, version)
+        invalidar(SERVICIOS)
+        return {"message": "Servicio eliminado exitosamente"}
 
     except Exception as e:
         print(f"Error al eliminar servicio: {str(e)}")
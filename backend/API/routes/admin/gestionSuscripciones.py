@@ -1,7 +1,10 @@
-import aiomysql
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, HTTPException, Query
 from pydantic import BaseModel
-from database import get_db_pool
+from typing import Optional
+from datetime import date, timedelta
+from queries import db_connection, fetch_all, fetch_one, register_query
+from auth import requiere_admin
+from respuestas import RespuestaJSON
 
 """
 el administrador podrá ver todas las suscripciones activas, 
@@ -9,34 +12,111 @@ canceladas o vencidas de todos los usuarios, podrá filtrarlas
 por estado,tipo de servicio o fecha de vencimiento.
 """
 
-router = APIRouter()
+# más recientes primero; la página siguiente empieza bajo el último SubscriptionId visto
+register_query("admin.suscripciones.listar", """
+    SELECT 
+        s.SubscriptionId,
+        u.Name AS user,
+        u.Email AS email,
+        sv.Name AS service,
+        sv.Category AS category,
+        s.StartDate,
+        s.EndDate,
+        s.Status,
+        s.AmountPaid,
+        s.PaymentMethod
+    FROM Subscription s
+    JOIN User u ON s.UserId = u.UserId
+    JOIN Plan p ON s.PlanId = p.PlanId
+    JOIN Service sv ON p.ServiceId = sv.ServiceId
+    WHERE {where}
+    ORDER BY s.SubscriptionId DESC
+    LIMIT %s
+""")
+register_query("admin.suscripciones.contar", """
+    SELECT COUNT(*) AS total
+    FROM Subscription s
+    JOIN Plan p ON s.PlanId = p.PlanId
+    JOIN Service sv ON p.ServiceId = sv.ServiceId
+    WHERE {where}
+""")
 
-@router.get("/admin/suscripciones")  # Listar suscripciones, se deben filtrar en el frontend
-async def listar_suscripciones(request: Request):
+
+def filtros_suscripciones(status, category, service_id, end_from, end_to, start_from, start_to):
+    """
+    Condiciones y parámetros comunes al listado y al conteo.
+    Los rangos de fecha son inclusivos y se comparan sin funciones sobre la
+    columna para que MySQL use los índices de Status/EndDate/StartDate.
+    """
+    condiciones = []
+    params = []
+    if status:
+        condiciones.append("s.Status = %s")
+        params.append(status)
+    if category:
+        condiciones.append("sv.Category = %s")
+        params.append(category)
+    if service_id:
+        condiciones.append("sv.ServiceId = %s")
+        params.append(service_id)
+    if end_from:
+        condiciones.append("s.EndDate >= %s")
+        params.append(end_from)
+    if end_to:
+        condiciones.append("s.EndDate < %s")
+        params.append(end_to + timedelta(days=1))
+    if start_from:
+        condiciones.append("s.StartDate >= %s")
+        params.append(start_from)
+    if start_to:
+        condiciones.append("s.StartDate < %s")
+        params.append(start_to + timedelta(days=1))
+    return condiciones, params
+
+
+router = APIRouter(dependencies=[Depends(requiere_admin)])
+
+@router.get("/admin/suscripciones")  # Listar suscripciones filtradas y paginadas por SubscriptionId
+async def listar_suscripciones(
+    request: Request,
+    status: Optional[str] = Query(None, pattern="^(active|cancelled|expired)$"),
+    category: Optional[str] = Query(None, max_length=50),
+    service_id: Optional[int] = Query(None, ge=1),
+    end_from: Optional[date] = None,
+    end_to: Optional[date] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    cursor: Optional[int] = Query(None, ge=1),  # último SubscriptionId de la página anterior
+    limit: int = Query(50, ge=1, le=200),
+):
     try:
-        pool = await get_db_pool(request.app)
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute("""
-                    SELECT 
-                        s.SubscriptionId,
-                        u.Name AS user,
-                        u.Email AS email,
-                        sv.Name AS service,
-                        sv.Category AS category,
-                        s.StartDate,
-                        s.EndDate,
-                        s.Status,
-                        s.AmountPaid,
-                        s.PaymentMethod
-                    FROM Subscription s
-                    JOIN User u ON s.UserId = u.UserId
-                    JOIN Plan p ON s.PlanId = p.PlanId
-                    JOIN Service sv ON p.ServiceId = sv.ServiceId
-                """)
-                suscripciones = await cursor.fetchall()
-                return {"suscripciones": suscripciones}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al listar suscripciones: {str(e)}")
+        condiciones, params = filtros_suscripciones(
+            status, category, service_id, end_from, end_to, start_from, start_to
+        )
+        where = " AND ".join(condiciones) or "1 = 1"
+
+        async with db_connection(request.app) as conn:
+            # el total solo se calcula en la primera página, el cursor no lo cambia
+            total = None
+            if cursor is None:
+                row = await fetch_one(conn, "admin.suscripciones.contar", params, where=where)
+                total = row["total"]
+
+            pagina = where
+            pagina_params = list(params)
+            if cursor is not None:
+                pagina += " AND s.SubscriptionId < %s"
+                pagina_params.append(cursor)
 
+            # se pide una fila de más para saber si hay otra página
+            suscripciones = await fetch_all(
+                conn, "admin.suscripciones.listar", (*pagina_params, limit + 1), where=pagina
+            )
 
+        next_cursor = None
+        if len(suscripciones) > limit:
+            suscripciones = suscripciones[:limit]
+            next_cursor = suscripciones[-1]["SubscriptionId"]
+        return RespuestaJSON({"suscripciones": suscripciones, "next_cursor": next_cursor, "total": total})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al listar suscripciones: {str(e)}")
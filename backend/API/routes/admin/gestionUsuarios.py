@@ -1,8 +1,15 @@
-import aiomysql
-from fastapi import APIRouter, Request, HTTPException
+import logging
+import os
+import time
+from datetime import datetime
+from fastapi import APIRouter, Depends, Request, HTTPException, Query
+from typing import List, Literal, Optional
 from pydantic import BaseModel
-from database import get_db_pool
-import bcrypt
+from queries import db_connection, execute, fetch_all, fetch_one, placeholders, register_query
+from hashing import hash_password
+from auth import requiere_admin, revocar_usuario, revocar_usuarios
+from respuestas import RespuestaJSON
+from cache import invalidar, USUARIOS
 
 """
 el administrador podrá visualizar un listado de los usuarios registrados, 
@@ -19,18 +26,120 @@ class userData(BaseModel):
     user: str  # username
 
 
+class FiltroUsuarios(BaseModel):
+    status: Optional[Literal["active", "deactivated", "deleted"]] = None
+    rol: Optional[Literal["user", "administrator"]] = None
+    registrado_desde: Optional[datetime] = None
+    registrado_hasta: Optional[datetime] = None
 
-router = APIRouter()
-@router.get("/admin/usuarios") # Listar usuarios
-async def listar_usuarios(request: Request):
+
+class OperacionMasiva(BaseModel):
+    # una de las dos formas de elegir usuarios: lista de ids o filtro
+    user_ids: Optional[List[int]] = None
+    filtro: Optional[FiltroUsuarios] = None
+    accountStatus: Optional[Literal["active", "deactivated", "deleted"]] = None
+    rol: Optional[Literal["user", "administrator"]] = None
+
+
+logger = logging.getLogger(__name__)
+
+# usuarios por UPDATE/transacción en las operaciones masivas y máximo de ids por petición
+USER_BULK_CHUNK_SIZE = int(os.getenv("USER_BULK_CHUNK_SIZE", 500))
+USER_BULK_MAX_IDS = int(os.getenv("USER_BULK_MAX_IDS", 10000))
+
+
+# nunca se devuelven Password ni ConfirmationCode
+USUARIO_COLUMNAS = """
+    UserId, Name, Email, Username, Rol, AccountStatus, SessionStatus, ConfirmedEmail, RegisterDate
+"""
+
+# página siguiente a partir del último UserId visto, filtros en {filtros}
+register_query("admin.usuarios.pagina", f"""
+    SELECT {USUARIO_COLUMNAS}
+    FROM User
+    WHERE UserId > %s {{filtros}}
+    ORDER BY UserId
+    LIMIT %s
+""")
+# búsqueda por prefijo: cada rama recorre su propio índice (Name, Email, Username)
+# y la unión se ordena por UserId para seguir paginando con el mismo cursor
+register_query("admin.usuarios.buscar", f"""
+    SELECT {USUARIO_COLUMNAS}
+    FROM User
+    JOIN (
+        (SELECT UserId FROM User WHERE Name LIKE %s AND UserId > %s {{filtros}} ORDER BY UserId LIMIT %s)
+        UNION
+        (SELECT UserId FROM User WHERE Email LIKE %s AND UserId > %s {{filtros}} ORDER BY UserId LIMIT %s)
+        UNION
+        (SELECT UserId FROM User WHERE Username LIKE %s AND UserId > %s {{filtros}} ORDER BY UserId LIMIT %s)
+    ) AS coincidencias USING (UserId)
+    ORDER BY UserId
+    LIMIT %s
+""")
+register_query("admin.usuarios.obtener", f"SELECT {USUARIO_COLUMNAS} FROM User WHERE UserId=%s")
+register_query("admin.usuarios.rol_actual", "SELECT Rol FROM User WHERE UserId=%s FOR UPDATE")
+register_query("admin.usuarios.editar_con_password", """
+    UPDATE User SET Name=%s, Email=%s, Rol=%s, AccountStatus=%s, Username=%s, Password=%s WHERE UserId=%s
+""")
+register_query("admin.usuarios.editar", """
+    UPDATE User SET Name=%s, Email=%s, Rol=%s, AccountStatus=%s, Username=%s WHERE UserId=%s
+""")
+register_query("admin.usuarios.eliminar", "UPDATE User SET AccountStatus='deleted' WHERE UserId=%s")
+# operaciones masivas: ids por páginas del PK y un UPDATE por bloque, {cambios} son columnas fijas
+register_query("admin.usuarios.ids_pagina", """
+    SELECT UserId FROM User
+    WHERE UserId > %s {filtros}
+    ORDER BY UserId
+    LIMIT %s
+""")
+register_query("admin.usuarios.actualizar_bloque", """
+    UPDATE User SET {cambios} WHERE UserId IN ({ids})
+""")
+
+
+router = APIRouter(dependencies=[Depends(requiere_admin)])
+def escapar_like(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@router.get("/admin/usuarios") # Listar usuarios, paginado por UserId
+async def listar_usuarios(
+    request: Request,
+    cursor: int = Query(0, ge=0),  # último UserId de la página anterior
+    limit: int = Query(50, ge=1, le=200),
+    status: Optional[str] = Query(None, pattern="^(active|deactivated|deleted)$"),
+    rol: Optional[str] = Query(None, pattern="^(user|administrator)$"),
+    q: Optional[str] = Query(None, min_length=1, max_length=150),  # prefijo de nombre, correo o usuario
+):
     try:
-        pool = await get_db_pool(request.app)
+        # las condiciones son fijas, solo los valores viajan como parámetros
+        filtros = ""
+        filtro_params = []
+        if status:
+            filtros += " AND AccountStatus = %s"
+            filtro_params.append(status)
+        if rol:
+            filtros += " AND Rol = %s"
+            filtro_params.append(rol)
 
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute("SELECT * FROM User")
-                usuarios = await cursor.fetchall()
-                return {"usuarios": usuarios}
+        # se pide una fila de más para saber si hay otra página
+        async with db_connection(request.app) as conn:
+            if q:
+                prefijo = escapar_like(q) + "%"
+                rama = [prefijo, cursor, *filtro_params, limit + 1]
+                usuarios = await fetch_all(
+                    conn, "admin.usuarios.buscar", (*rama, *rama, *rama, limit + 1), filtros=filtros
+                )
+            else:
+                usuarios = await fetch_all(
+                    conn, "admin.usuarios.pagina", (cursor, *filtro_params, limit + 1), filtros=filtros
+                )
+
+        next_cursor = None
+        if len(usuarios) > limit:
+            usuarios = usuarios[:limit]
+            next_cursor = usuarios[-1]["UserId"]
+        return RespuestaJSON({"usuarios": usuarios, "next_cursor": next_cursor})
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar usuarios: {str(e)}")
@@ -40,15 +149,11 @@ async def listar_usuarios(request: Request):
 @router.get("/admin/usuarios/{usuario_id}") # Obtener usuario específico
 async def obtener_usuario(request: Request, usuario_id: int):
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute("SELECT * FROM User WHERE UserId=%s", (usuario_id,))
-                usuario = await cursor.fetchone()
-                if not usuario:
-                    raise HTTPException(status_code=404, detail="Usuario no encontrado")
-                return {"usuario": usuario}
+        async with db_connection(request.app) as conn:
+            usuario = await fetch_one(conn, "admin.usuarios.obtener", (usuario_id,))
+            if not usuario:
+                raise HTTPException(status_code=404, detail="Usuario no encontrado")
+            return {"usuario": usuario}
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener usuario: {str(e)}")
@@ -58,24 +163,32 @@ async def obtener_usuario(request: Request, usuario_id: int):
 @router.put("/admin/usuarios/{usuario_id}") # Editar usuario específico
 async def editar_usuario(request: Request, usuario_id: int, user_data: userData):
     try:
-        pool = await get_db_pool(request.app)
         data = await request.json()
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                # Si viene nueva contraseña, actualiza también ese campo
-                if "newPassword" in data and data["newPassword"]:
-                    hashed = bcrypt.hashpw(data["newPassword"].encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                    await cursor.execute(
-                        "UPDATE User SET Name=%s, Email=%s, Rol=%s, AccountStatus=%s, Username=%s, Password=%s WHERE UserId=%s",
-                        (user_data.name, user_data.email, user_data.rol, user_data.accountStatus, user_data.user, hashed, usuario_id)
-                    )
-                else:
-                    await cursor.execute(
-                        "UPDATE User SET Name=%s, Email=%s, Rol=%s, AccountStatus=%s, Username=%s WHERE UserId=%s",
-                        (user_data.name, user_data.email, user_data.rol, user_data.accountStatus, user_data.user, usuario_id)
-                    )
-                await conn.commit()
-                return {"message": "Usuario actualizado correctamente"}
+        # Si viene nueva contraseña, actualiza también ese campo
+        hashed = None
+        if "newPassword" in data and data["newPassword"]:
+            hashed = await hash_password(data["newPassword"])
+        async with db_connection(request.app, transaction=True) as conn:
+            anterior = await fetch_one(conn, "admin.usuarios.rol_actual", (usuario_id,))
+            if hashed:
+                await execute(
+                    conn, "admin.usuarios.editar_con_password",
+                    (user_data.name, user_data.email, user_data.rol, user_data.accountStatus, user_data.user, hashed, usuario_id)
+                )
+            else:
+                await execute(
+                    conn, "admin.usuarios.editar",
+                    (user_data.name, user_data.email, user_data.rol, user_data.accountStatus, user_data.user, usuario_id)
+                )
+            # una cuenta desactivada pierde sus sesiones abiertas; con otro rol, el
+            # claim rol de los tokens ya emitidos deja de ser válido
+            cambio_rol = anterior is not None and anterior["Rol"] != user_data.rol
+            if user_data.accountStatus != "active" or cambio_rol:
+                await revocar_usuario(conn, usuario_id)
+        invalidar(USUARIOS)
+        return {"message": "Usuario actualizado correctamente"}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error al editar usuario: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al editar usuario: {str(e)}")
@@ -85,16 +198,133 @@ async def editar_usuario(request: Request, usuario_id: int, user_data: userData)
 @router.delete("/admin/usuarios/{usuario_id}") # Eliminar usuario específico, marcando su AccountStatus como "deleted"
 async def eliminar_usuario(request: Request, usuario_id: int):
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute(
-                    "UPDATE User SET AccountStatus='deleted' WHERE UserId=%s",
-                    (usuario_id,)
-                )
-                await conn.commit()
-                return {"message": "Usuario eliminado correctamente"}
+        async with db_connection(request.app, transaction=True) as conn:
+            await execute(conn, "admin.usuarios.eliminar", (usuario_id,))
+            await revocar_usuario(conn, usuario_id)
+        invalidar(USUARIOS)
+        return {"message": "Usuario eliminado correctamente"}
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al eliminar usuario: {str(e)}")
+
+
+
+async def _bloques_de_ids(app, operacion: OperacionMasiva, excluir: int):
+    """
+    Ids a modificar en bloques de USER_BULK_CHUNK_SIZE, ordenados por UserId.
+    Con filtro, el usuario `excluir` (quien hace la petición) nunca se selecciona.
+    """
+    if operacion.user_ids is not None:
+        ids = sorted(set(operacion.user_ids))
+        for i in range(0, len(ids), USER_BULK_CHUNK_SIZE):
+            yield ids[i:i + USER_BULK_CHUNK_SIZE]
+        return
+
+    filtro = operacion.filtro
+    filtros = " AND UserId <> %s"
+    filtro_params = [excluir]
+    if filtro.status:
+        filtros += " AND AccountStatus = %s"
+        filtro_params.append(filtro.status)
+    if filtro.rol:
+        filtros += " AND Rol = %s"
+        filtro_params.append(filtro.rol)
+    if filtro.registrado_desde:
+        filtros += " AND RegisterDate >= %s"
+        filtro_params.append(filtro.registrado_desde)
+    if filtro.registrado_hasta:
+        filtros += " AND RegisterDate < %s"
+        filtro_params.append(filtro.registrado_hasta)
+    # se pagina por UserId, así cambiar AccountStatus o Rol de un bloque
+    # no altera qué usuarios entran en el siguiente
+    ultimo = 0
+    while True:
+        async with db_connection(app) as conn:
+            rows = await fetch_all(
+                conn, "admin.usuarios.ids_pagina", (ultimo, *filtro_params, USER_BULK_CHUNK_SIZE),
+                filtros=filtros
+            )
+        if not rows:
+            return
+        ultimo = rows[-1]["UserId"]
+        yield [row["UserId"] for row in rows]
+
+
+@router.post("/admin/usuarios/masivo") # Cambiar estado y/o rol de muchos usuarios
+async def operacion_masiva(request: Request, operacion: OperacionMasiva, claims: dict = Depends(requiere_admin)):
+    if (operacion.user_ids is None) == (operacion.filtro is None):
+        raise HTTPException(status_code=400, detail="Indique user_ids o filtro, no ambos")
+    if operacion.user_ids is not None and not operacion.user_ids:
+        raise HTTPException(status_code=400, detail="user_ids está vacío")
+    if operacion.user_ids is not None and len(operacion.user_ids) > USER_BULK_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Se admiten hasta {USER_BULK_MAX_IDS} ids por petición; use un filtro")
+    if operacion.filtro is not None and not any(
+        valor is not None for valor in operacion.filtro.model_dump().values()
+    ):
+        # un filtro vacío seleccionaría todas las cuentas
+        raise HTTPException(status_code=400, detail="El filtro debe tener al menos un criterio")
+    if operacion.accountStatus is None and operacion.rol is None:
+        raise HTTPException(status_code=400, detail="Indique accountStatus y/o rol")
+
+    cambios = []
+    valores = []
+    if operacion.accountStatus is not None:
+        cambios.append("AccountStatus = %s")
+        valores.append(operacion.accountStatus)
+    if operacion.rol is not None:
+        cambios.append("Rol = %s")
+        valores.append(operacion.rol)
+    # el token lleva el rol: una cuenta desactivada o con otro rol pierde sus sesiones
+    revocar = operacion.rol is not None or operacion.accountStatus != "active"
+
+    propio = int(claims["sub"])
+    inicio = time.perf_counter()
+    seleccionados = 0
+    actualizados = 0
+    revocados = 0
+    omitidos = []
+    bloques = []
+    error = None
+    try:
+        async for ids in _bloques_de_ids(request.app, operacion, propio):
+            # el administrador no puede desactivarse ni quitarse el rol a sí mismo
+            if propio in ids:
+                ids = [user_id for user_id in ids if user_id != propio]
+                omitidos.append(propio)
+            if not ids:
+                continue
+            inicio_bloque = time.perf_counter()
+            async with db_connection(request.app, transaction=True) as conn:
+                result = await execute(
+                    conn, "admin.usuarios.actualizar_bloque", (*valores, *ids),
+                    cambios=", ".join(cambios), ids=placeholders(len(ids))
+                )
+                revocados_bloque = await revocar_usuarios(conn, ids) if revocar else 0
+            seleccionados += len(ids)
+            actualizados += result.rowcount
+            revocados += revocados_bloque
+            bloques.append({
+                "desde": ids[0],
+                "hasta": ids[-1],
+                "usuarios": len(ids),
+                "actualizados": result.rowcount,
+                "ms": round((time.perf_counter() - inicio_bloque) * 1000, 2),
+            })
+    except Exception as e:
+        # los bloques anteriores ya quedaron confirmados
+        logger.exception("Error en operación masiva de usuarios")
+        error = str(e)
+
+    if bloques:
+        invalidar(USUARIOS)
+    reporte = {
+        "seleccionados": seleccionados,
+        "actualizados": actualizados,
+        "sesiones_revocadas": revocados,
+        "omitidos": omitidos,
+        "bloques": bloques,
+        "duracion_s": round(time.perf_counter() - inicio, 3),
+    }
+    if error:
+        return RespuestaJSON(status_code=500, content={**reporte, "interrumpido": error})
+    return reporte
@@ -1,13 +1,21 @@
-import aiomysql
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, HTTPException, Query
 from pydantic import BaseModel
-from database import get_db_pool
+from typing import Optional
+from queries import db_connection, fetch_all, fetch_one, fetch_parallel, register_query
+from export import exportar
+from cache import cache, CACHE_TTL_REPORTES, SERVICIOS, SUSCRIPCIONES, USUARIOS
+from auth import requiere_admin
+from respuestas import RespuestaJSON
 
 """
 Endpoints para generar reportes de suscripciones:
 - Suscripciones por usuario
 - Suscripciones por categoría
 - Total de ingresos por suscripciones
+
+Los reportes tabulares aceptan ?format=csv|ndjson para descargarlos
+completos en streaming (ver export.py). Las respuestas JSON agregadas se
+guardan en la caché de resultados (ver cache.py).
 """
 
 class SuscripcionUsuario(BaseModel):
@@ -33,41 +41,86 @@ class IngresoServicio(BaseModel):
     IngresosTotales: float
     PromedioIngreso: float
 
-router = APIRouter()
+register_query("reportes.por_usuario", """
+    SELECT 
+        u.Name as Usuario,
+        srv.Name as Servicio,
+        srv.Category as Categoria,
+        p.Type as TipoPlan,
+        s.Status as Estado
+    FROM User u
+    JOIN Subscription s ON u.UserId = s.UserId
+    JOIN Plan p ON s.PlanId = p.PlanId
+    JOIN Service srv ON p.ServiceId = srv.ServiceId
+    ORDER BY u.Name DESC;
+""")
+register_query("reportes.por_categoria", """
+    SELECT 
+        srv.Category as Categoria,
+        srv.Name as Servicio,
+        COUNT(s.SubscriptionId) as TotalSuscripciones,
+        COUNT(CASE WHEN s.Status = 'active' THEN 1 END) as Activas,
+        COUNT(CASE WHEN s.Status = 'cancelled' THEN 1 END) as Canceladas,
+        COUNT(CASE WHEN s.Status = 'expired' THEN 1 END) as Expiradas,
+        COALESCE(SUM(s.AmountPaid), 0) as IngresosPorServicio
+    FROM Service srv
+    LEFT JOIN Plan p ON srv.ServiceId = p.ServiceId
+    LEFT JOIN Subscription s ON p.PlanId = s.PlanId
+    GROUP BY srv.Category, srv.ServiceId, srv.Name
+    ORDER BY srv.Category, IngresosPorServicio DESC
+""")
+register_query("reportes.total_ingresos", """
+    SELECT 
+        srv.Name as Servicio,
+        srv.Category as Categoria,
+        COUNT(s.SubscriptionId) as TotalSuscripciones,
+        SUM(s.AmountPaid) as IngresosTotales,
+        ROUND(AVG(s.AmountPaid), 2) as PromedioIngreso
+    FROM Service srv
+    JOIN Plan p ON srv.ServiceId = p.ServiceId
+    JOIN Subscription s ON p.PlanId = s.PlanId
+    GROUP BY srv.ServiceId, srv.Name, srv.Category
+    ORDER BY IngresosTotales DESC
+    LIMIT 10
+""")
+register_query("reportes.resumen.usuarios", "SELECT COUNT(*) as total FROM User")
+register_query("reportes.resumen.servicios", "SELECT COUNT(*) as total FROM Service")
+register_query("reportes.resumen.suscripciones", "SELECT COUNT(*) as total FROM Subscription")
+register_query("reportes.resumen.activas", "SELECT COUNT(*) as total FROM Subscription WHERE Status = 'active'")
+register_query("reportes.resumen.ingresos", "SELECT SUM(AmountPaid) as total FROM Subscription")
+register_query("reportes.resumen.top_categorias", """
+    SELECT srv.Category, COUNT(s.SubscriptionId) as total
+    FROM Service srv
+    JOIN Plan p ON srv.ServiceId = p.ServiceId
+    JOIN Subscription s ON p.PlanId = s.PlanId
+    GROUP BY srv.Category
+    ORDER BY total DESC
+    LIMIT 3
+""")
+
+router = APIRouter(dependencies=[Depends(requiere_admin)])
 
 @router.get("/admin/reportes/suscripciones-por-usuario")
-async def suscripciones_por_usuario(request: Request):
+async def suscripciones_por_usuario(
+    request: Request,
+    formato: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+):
     """
     Obtiene un reporte de todas las suscripciones organizadas por usuario
     """
+    if formato:
+        return exportar(request, "reportes.por_usuario", formato, "suscripciones-por-usuario")
+
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                query = """
-                    SELECT 
-                        u.Name as Usuario,
-                        srv.Name as Servicio,
-                        srv.Category as Categoria,
-                        p.Type as TipoPlan,
-                        s.Status as Estado
-                    FROM User u
-                    JOIN Subscription s ON u.UserId = s.UserId
-                    JOIN Plan p ON s.PlanId = p.PlanId
-                    JOIN Service srv ON p.ServiceId = srv.ServiceId
-                    ORDER BY u.Name DESC;
-                """
-                
-                await cursor.execute(query)
-                suscripciones = await cursor.fetchall()
-                
-                return {
-                    "success": True,
-                    "message": "Reporte de suscripciones por usuario obtenido exitosamente",
-                    "data": suscripciones,
-                    "total_registros": len(suscripciones)
-                }
+        async with db_connection(request.app) as conn:
+            suscripciones = await fetch_all(conn, "reportes.por_usuario")
+            
+            return RespuestaJSON({
+                "success": True,
+                "message": "Reporte de suscripciones por usuario obtenido exitosamente",
+                "data": suscripciones,
+                "total_registros": len(suscripciones)
+            })
             
     except Exception as e:
         raise HTTPException(
@@ -76,50 +129,38 @@ async def suscripciones_por_usuario(request: Request):
         )
 
 @router.get("/admin/reportes/suscripciones-por-categoria")
-async def suscripciones_por_categoria(request: Request):
+async def suscripciones_por_categoria(
+    request: Request,
+    formato: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+):
     """
     Obtiene un reporte de suscripciones agrupadas por categoría de servicio
     """
-    try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                query = """
-                SELECT 
-                    srv.Category as Categoria,
-                    srv.Name as Servicio,
-                    COUNT(s.SubscriptionId) as TotalSuscripciones,
-                    COUNT(CASE WHEN s.Status = 'active' THEN 1 END) as Activas,
-                    COUNT(CASE WHEN s.Status = 'cancelled' THEN 1 END) as Canceladas,
-                    COUNT(CASE WHEN s.Status = 'expired' THEN 1 END) as Expiradas,
-                    COALESCE(SUM(s.AmountPaid), 0) as IngresosPorServicio
-                FROM Service srv
-                LEFT JOIN Plan p ON srv.ServiceId = p.ServiceId
-                LEFT JOIN Subscription s ON p.PlanId = s.PlanId
-                GROUP BY srv.Category, srv.ServiceId, srv.Name
-                ORDER BY srv.Category, IngresosPorServicio DESC
-                """
-                
-                await cursor.execute(query)
-                suscripciones = await cursor.fetchall()
-                
-                # Agrupar por categoría para mejor organización
-                categorias = {}
-                for row in suscripciones:
-                    categoria = row['Categoria']
-                    if categoria not in categorias:
-                        categorias[categoria] = []
-                    categorias[categoria].append(row)
-                
-                return {
-                    "success": True,
-                    "message": "Reporte de suscripciones por categoría obtenido exitosamente",
-                    "data": suscripciones,
-                    "data_agrupada": categorias,
-                    "total_registros": len(suscripciones)
-                }
+    if formato:
+        return exportar(request, "reportes.por_categoria", formato, "suscripciones-por-categoria")
+
+    async def cargar():
+        async with db_connection(request.app) as conn:
+            suscripciones = await fetch_all(conn, "reportes.por_categoria")
+            
+            # Agrupar por categoría para mejor organización
+            categorias = {}
+            for row in suscripciones:
+                categoria = row['Categoria']
+                if categoria not in categorias:
+                    categorias[categoria] = []
+                categorias[categoria].append(row)
             
+            return {
+                "success": True,
+                "message": "Reporte de suscripciones por categoría obtenido exitosamente",
+                "data": suscripciones,
+                "data_agrupada": categorias,
+                "total_registros": len(suscripciones)
+            }
+
+    try:
+        return RespuestaJSON(await cache.obtener("reportes.por_categoria", CACHE_TTL_REPORTES, (SUSCRIPCIONES, SERVICIOS), cargar))
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -127,49 +168,38 @@ async def suscripciones_por_categoria(request: Request):
         )
 
 @router.get("/admin/reportes/total-ingresos")
-async def total_ingresos_suscripciones(request: Request):
+async def total_ingresos_suscripciones(
+    request: Request,
+    formato: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+):
     """
     Obtiene un reporte de ingresos totales por servicio (top 10)
     """
-    try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                query = """
-                SELECT 
-                    srv.Name as Servicio,
-                    srv.Category as Categoria,
-                    COUNT(s.SubscriptionId) as TotalSuscripciones,
-                    SUM(s.AmountPaid) as IngresosTotales,
-                    ROUND(AVG(s.AmountPaid), 2) as PromedioIngreso
-                FROM Service srv
-                JOIN Plan p ON srv.ServiceId = p.ServiceId
-                JOIN Subscription s ON p.PlanId = s.PlanId
-                GROUP BY srv.ServiceId, srv.Name, srv.Category
-                ORDER BY IngresosTotales DESC
-                LIMIT 10
-                """
-                
-                await cursor.execute(query)
-                ingresos = await cursor.fetchall()
-                
-                # Calcular estadísticas adicionales
-                total_general = sum(row['IngresosTotales'] for row in ingresos)
-                total_suscripciones = sum(row['TotalSuscripciones'] for row in ingresos)
-                
-                return {
-                    "success": True,
-                    "message": "Reporte de ingresos totales obtenido exitosamente",
-                    "data": ingresos,
-                    "estadisticas": {
-                        "ingresos_totales": total_general,
-                        "total_suscripciones": total_suscripciones,
-                        "promedio_general": round(total_general / len(ingresos), 2) if ingresos else 0
-                    },
-                    "total_registros": len(ingresos)
-                }
+    if formato:
+        return exportar(request, "reportes.total_ingresos", formato, "total-ingresos")
+
+    async def cargar():
+        async with db_connection(request.app) as conn:
+            ingresos = await fetch_all(conn, "reportes.total_ingresos")
             
+            # Calcular estadísticas adicionales
+            total_general = sum(row['IngresosTotales'] for row in ingresos)
+            total_suscripciones = sum(row['TotalSuscripciones'] for row in ingresos)
+            
+            return {
+                "success": True,
+                "message": "Reporte de ingresos totales obtenido exitosamente",
+                "data": ingresos,
+                "estadisticas": {
+                    "ingresos_totales": total_general,
+                    "total_suscripciones": total_suscripciones,
+                    "promedio_general": round(total_general / len(ingresos), 2) if ingresos else 0
+                },
+                "total_registros": len(ingresos)
+            }
+
+    try:
+        return RespuestaJSON(await cache.obtener("reportes.total_ingresos", CACHE_TTL_REPORTES, (SUSCRIPCIONES, SERVICIOS), cargar))
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -182,67 +212,49 @@ async def resumen_reportes(request: Request):
     """
     Obtiene un resumen general de todos los reportes
     """
+    async def cargar():
+        # consultas independientes, cada una en su propia conexión del pool
+        r = await fetch_parallel(request.app, {
+            "usuarios": (fetch_one, "reportes.resumen.usuarios"),
+            "servicios": (fetch_one, "reportes.resumen.servicios"),
+            "suscripciones": (fetch_one, "reportes.resumen.suscripciones"),
+            "activas": (fetch_one, "reportes.resumen.activas"),
+            "ingresos": (fetch_one, "reportes.resumen.ingresos"),
+            "top_categorias": (fetch_all, "reportes.resumen.top_categorias"),
+        })
+        total_usuarios = r["usuarios"]['total']
+        total_servicios = r["servicios"]['total']
+        total_suscripciones = r["suscripciones"]['total']
+        suscripciones_activas = r["activas"]['total']
+        ingresos_totales = r["ingresos"]['total'] or 0
+        # Categorías más populares
+        top_categorias = r["top_categorias"]
+
+        return {
+            "success": True,
+            "message": "Resumen de reportes obtenido exitosamente",
+            "data": {
+                "usuarios": {
+                    "total": total_usuarios
+                },
+                "servicios": {
+                    "total": total_servicios
+                },
+                "suscripciones": {
+                    "total": total_suscripciones,
+                    "activas": suscripciones_activas,
+                    "inactivas": total_suscripciones - suscripciones_activas
+                },
+                "ingresos": {
+                    "total": float(ingresos_totales),
+                    "promedio_por_suscripcion": round(float(ingresos_totales) / total_suscripciones, 2) if total_suscripciones > 0 else 0
+                },
+                "top_categorias": top_categorias
+            }
+        }
+
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                
-                # Total de usuarios
-                await cursor.execute("SELECT COUNT(*) as total FROM User")
-                total_usuarios = (await cursor.fetchone())['total']
-                
-                # Total de servicios
-                await cursor.execute("SELECT COUNT(*) as total FROM Service")
-                total_servicios = (await cursor.fetchone())['total']
-                
-                # Total de suscripciones
-                await cursor.execute("SELECT COUNT(*) as total FROM Subscription")
-                total_suscripciones = (await cursor.fetchone())['total']
-                
-                # Suscripciones activas
-                await cursor.execute("SELECT COUNT(*) as total FROM Subscription WHERE Status = 'active'")
-                suscripciones_activas = (await cursor.fetchone())['total']
-                
-                # Ingresos totales
-                await cursor.execute("SELECT SUM(AmountPaid) as total FROM Subscription")
-                ingresos_totales = (await cursor.fetchone())['total'] or 0
-                
-                # Categorías más populares
-                await cursor.execute("""
-                    SELECT srv.Category, COUNT(s.SubscriptionId) as total
-                    FROM Service srv
-                    JOIN Plan p ON srv.ServiceId = p.ServiceId
-                    JOIN Subscription s ON p.PlanId = s.PlanId
-                    GROUP BY srv.Category
-                    ORDER BY total DESC
-                    LIMIT 3
-                """)
-                top_categorias = await cursor.fetchall()
-                
-                return {
-                    "success": True,
-                    "message": "Resumen de reportes obtenido exitosamente",
-                    "data": {
-                        "usuarios": {
-                            "total": total_usuarios
-                        },
-                        "servicios": {
-                            "total": total_servicios
-                        },
-                        "suscripciones": {
-                            "total": total_suscripciones,
-                            "activas": suscripciones_activas,
-                            "inactivas": total_suscripciones - suscripciones_activas
-                        },
-                        "ingresos": {
-                            "total": float(ingresos_totales),
-                            "promedio_por_suscripcion": round(float(ingresos_totales) / total_suscripciones, 2) if total_suscripciones > 0 else 0
-                        },
-                        "top_categorias": top_categorias
-                    }
-                }
-            
+        return RespuestaJSON(await cache.obtener("reportes.resumen", CACHE_TTL_REPORTES, (SUSCRIPCIONES, SERVICIOS, USUARIOS), cargar))
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -1,27 +1,53 @@
-from fastapi import APIRouter, HTTPException, Request, BackgroundTasks
-from database import get_db_pool
+from fastapi import APIRouter, Depends, HTTPException, Request
+from queries import db_connection, execute, fetch_one, register_query
+from auth import crear_token, requiere_usuario, revocar_token, usuario_actual
 from pydantic import BaseModel, EmailStr
-import bcrypt
+from hashing import hash_password, verify_password
 from typing import Optional
-from mailer import send_email
+from outbox import encolar_correo
+from metricas import registrar_usuario
+from cache import invalidar, USUARIOS
 import secrets
 from datetime import datetime, timedelta
-import aiomysql
 
 router = APIRouter()
 
-# Función para obtener la conexión a la base de datos
-async def get_db_connection(request: Request):
-    pool = await get_db_pool(request.app)
-    conn = await pool.acquire()
-    return pool, conn
+register_query("usuarios.existe_email", "SELECT 1 FROM `User` WHERE Email = %s")
+register_query("usuarios.existe_username", "SELECT 1 FROM `User` WHERE Username = %s")
+register_query("usuarios.insertar", """
+    INSERT INTO `User` (Username, Name, Email, Rol, Password, ConfirmationCode)
+    VALUES (%s, %s, %s, %s, %s, %s)
+""")
+register_query("wallet.crear", """
+    INSERT INTO PaymentMethod (UserId, Type, WalletBalance)
+    VALUES (%s, 'wallet', 0)
+""")
+register_query("usuarios.codigo_confirmacion", """
+    SELECT ConfirmationCode
+    FROM User
+    WHERE Email = %s
+""")
+register_query("usuarios.confirmar_email", """
+    UPDATE User
+    SET ConfirmationCode = NULL, ConfirmedEmail = 'yes'
+    WHERE Email = %s
+""")
+register_query("usuarios.login", "SELECT * FROM User WHERE Email = %s OR Username = %s")
+register_query("usuarios.por_id", "SELECT * FROM User WHERE UserId = %s")
+register_query("usuarios.email_en_uso", "SELECT 1 FROM User WHERE Email = %s AND UserId != %s")
+register_query("usuarios.username_en_uso", "SELECT 1 FROM User WHERE Username = %s AND UserId != %s")
+register_query("usuarios.actualizar_username", "UPDATE User SET Username = %s WHERE UserId = %s")
+register_query("usuarios.actualizar_nombre", "UPDATE User SET Name = %s WHERE UserId = %s")
+register_query("usuarios.actualizar_email", "UPDATE User SET Email = %s WHERE UserId = %s")
+register_query("usuarios.actualizar_password", "UPDATE User SET Password = %s WHERE UserId = %s")
 
 
 class UserData(BaseModel):
+    # sin rol: el registro público siempre crea usuarios 'user'; los
+    # administradores se asignan desde /admin/usuarios
     username: str
     name: str
     email: str
-    rol : str = "user"
     password: str
 
 class LoginUser(BaseModel):
@@ -42,70 +68,51 @@ class ConfirmData(BaseModel):
 
 
 @router.post("/register")
-async def register_user(request: Request, user_data: UserData, background_tasks: BackgroundTasks):
-    pool, conn = await get_db_connection(request)
+async def register_user(request: Request, user_data: UserData):
     try:
-        async with conn.cursor() as cursor:
-            # Verificar email y username
-            await cursor.execute("SELECT 1 FROM `User` WHERE Email = %s", (user_data.email,))
-            if await cursor.fetchone():
+        # Verificar email y username
+        async with db_connection(request.app) as conn:
+            if await fetch_one(conn, "usuarios.existe_email", (user_data.email,)):
                 raise HTTPException(status_code=400, detail="El usuario ya existe")
 
-            await cursor.execute("SELECT 1 FROM `User` WHERE Username = %s", (user_data.username,))
-            if await cursor.fetchone():
+            if await fetch_one(conn, "usuarios.existe_username", (user_data.username,)):
                 raise HTTPException(status_code=400, detail="El nombre de usuario ya está en uso")
 
-            # Hashear la contraseña
-            hashed_password = bcrypt.hashpw(
-                user_data.password.encode('utf-8'),
-                bcrypt.gensalt()
-            )
+        # Hashear la contraseña
+        hashed_password = await hash_password(user_data.password)
+
+        # Generar el código de confirmación
+        codigo = secrets.token_hex(4).upper()
 
+        # Usuario, wallet y correo de confirmación en una sola transacción
+        async with db_connection(request.app, transaction=True) as conn:
             # Insertar el usuario
-            await cursor.execute("""
-                INSERT INTO `User` (Username, Name, Email, Rol, Password)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
+            result = await execute(conn, "usuarios.insertar", (
                 user_data.username,
                 user_data.name,
                 user_data.email,
-                user_data.rol,
-                hashed_password
+                'user',
+                hashed_password,
+                codigo
             ))
-            await conn.commit()
-
-            # Obtener el UserId recién creado
-            await cursor.execute("SELECT UserId FROM User WHERE Email = %s", (user_data.email,))
-            user_row = await cursor.fetchone()
-            user_id = user_row[0] if user_row else None
+            user_id = result.lastrowid
 
             # Crear wallet con saldo 0
-            if user_id:
-                await cursor.execute("""
-                    INSERT INTO PaymentMethod (UserId, Type, WalletBalance)
-                    VALUES (%s, 'wallet', 0)
-                """, (user_id,))
-                await conn.commit()
-
-            # Generar y guardar el código
-            codigo = secrets.token_hex(4).upper()
-
-            await cursor.execute("""
-                UPDATE User
-                SET ConfirmationCode = %s
-                WHERE Email = %s
-            """, (codigo, user_data.email))
-            await conn.commit()
-
-            # Enviar email
-            background_tasks.add_task(
-                send_email,
+            await execute(conn, "wallet.crear", (user_id,))
+
+            # Contador de usuarios del panel de control
+            await registrar_usuario(conn)
+
+            # Encolar el email, lo envía el dispatcher del outbox
+            await encolar_correo(
+                conn,
                 "Confirma tu cuenta",
                 user_data.email,
                 "confirm.html",
                 {"name": user_data.name, "code": codigo}
             )
 
+        invalidar(USUARIOS)
         return {"status": "success", "message": "Usuario registrado. Revisa tu correo."}
     
     except HTTPException:
@@ -113,125 +120,101 @@ async def register_user(request: Request, user_data: UserData, background_tasks:
     except Exception as e:
         print(f"Error al registrar usuario: {e}")
         raise HTTPException(status_code=500, detail="Error interno al registrar usuario")
-    finally:
-        pool.release(conn)
 
 
 
 @router.post("/confirmEmail")#para confirmar el email al registrarse
 async def confirm_email(request: Request, data: ConfirmData):
 
-    pool, conn = await get_db_connection(request)
-    try:
-        async with conn.cursor(aiomysql.DictCursor) as cursor:
-            await cursor.execute("""
-                SELECT ConfirmationCode
-                FROM User
-                WHERE Email = %s
-            """, (data.email,))
-
-            row = await cursor.fetchone()
+    async with db_connection(request.app) as conn:
+        row = await fetch_one(conn, "usuarios.codigo_confirmacion", (data.email,))
 
-            if not row or row["ConfirmationCode"] != data.code:
-                raise HTTPException(400, "Código inválido")
+        if not row or row["ConfirmationCode"] != data.code:
+            raise HTTPException(400, "Código inválido")
 
-            # Marcar usuario como confirmado 
-            await cursor.execute("""
-                UPDATE User
-                SET ConfirmationCode = NULL, ConfirmedEmail = 'yes'
-                WHERE Email = %s
-            """, (data.email,))
-            await conn.commit()
+        # Marcar usuario como confirmado 
+        await execute(conn, "usuarios.confirmar_email", (data.email,))
 
-        return {"status": "success", "message": "Correo confirmado"}
-    finally:
-        pool.release(conn)
+    return {"status": "success", "message": "Correo confirmado"}
 
 
 
 @router.post("/login")
 async def login_user(request: Request, login_data: LoginUser):
-    pool, conn = await get_db_connection(request)
     try:
-        async with conn.cursor() as cursor:
-            await cursor.execute(
-                "SELECT * FROM User WHERE Email = %s OR Username = %s",
-                (login_data.email, login_data.email)
-            )
-            user = await cursor.fetchone()
-            if not user:
-                raise HTTPException(status_code=400, detail="Credenciales incorrectas")
-            
-            hashed_password = user[6]  # Ajusta el índice si la contraseña está en otra columna
-            if not bcrypt.checkpw(login_data.password.encode('utf-8'), hashed_password.encode('utf-8')):
-                raise HTTPException(status_code=400, detail="Credenciales incorrectas")
-            
-            activo = False if user[4] or user[5] == 'inactive' else True
-            rol = 'admin' if user[3] == 'administrator' else 'user'
-
-            return {
-                "status": "success",
-                "message": "Login exitoso",
-                "user_id": user[0], 
-                "user_name": user[1],
-                "user_email": user[2],
-                "user_rol": rol,
-                "user_username": user[8],
-                "activo": activo     
-            }
+        async with db_connection(request.app) as conn:
+            user = await fetch_one(conn, "usuarios.login", (login_data.email, login_data.email))
+        if not user:
+            raise HTTPException(status_code=400, detail="Credenciales incorrectas")
+        
+        if not await verify_password(login_data.password, user["Password"]):
+            raise HTTPException(status_code=400, detail="Credenciales incorrectas")
+
+        # una cuenta desactivada o eliminada no recibe token: su revocación quedaría sin efecto
+        if user["AccountStatus"] != 'active':
+            raise HTTPException(status_code=403, detail="La cuenta no está activa")
+
+        activo = False if user["SessionStatus"] or user["AccountStatus"] == 'inactive' else True
+        rol = 'admin' if user["Rol"] == 'administrator' else 'user'
+
+        return {
+            "status": "success",
+            "message": "Login exitoso",
+            "token": crear_token(user["UserId"], rol),
+            "user_id": user["UserId"], 
+            "user_name": user["Name"],
+            "user_email": user["Email"],
+            "user_rol": rol,
+            "user_username": user["Username"],
+            "activo": activo     
+        }
         
     except HTTPException:
         raise
     except Exception as e:
         print(f"Error al iniciar sesión: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        pool.release(conn)
 
 
-@router.put("/update_user/{user_id}")
+@router.post("/logout")
+async def logout_user(request: Request, claims: dict = Depends(usuario_actual)):
+    async with db_connection(request.app) as conn:
+        await revocar_token(conn, claims)
+    return {"status": "success", "message": "Sesión cerrada"}
+
+
+@router.put("/update_user/{user_id}", dependencies=[Depends(requiere_usuario)])
 async def update_user(request: Request, user_id: int, update_data: UpdateUserData):
-    pool, conn = await get_db_connection(request)
     try:
-        async with conn.cursor() as cursor:
+        async with db_connection(request.app) as conn:
             # Verificar si el usuario existe
-            await cursor.execute("SELECT * FROM User WHERE UserId = %s", (user_id,))
-            user = await cursor.fetchone()
+            user = await fetch_one(conn, "usuarios.por_id", (user_id,))
             if not user:
                 raise HTTPException(status_code=404, detail="Usuario no encontrado")
             
             # Verificar si el nuevo email ya está en uso por otro usuario
             if update_data.email:
-                await cursor.execute(
-                    "SELECT * FROM User WHERE Email = %s AND UserId != %s",
-                    (update_data.email, user_id)
-                )
-                existing_email = await cursor.fetchone()
-                if existing_email:
+                if await fetch_one(conn, "usuarios.email_en_uso", (update_data.email, user_id)):
                     raise HTTPException(status_code=400, detail="El correo electrónico ya está en uso por otro usuario")
             
             # Verificar si el nuevo username ya está en uso por otro usuario
             if update_data.username:
-                await cursor.execute(
-                    "SELECT * FROM User WHERE Username = %s AND UserId != %s",
-                    (update_data.username, user_id)
-                )
-                existing_username = await cursor.fetchone()
-                if existing_username:
+                if await fetch_one(conn, "usuarios.username_en_uso", (update_data.username, user_id)):
                     raise HTTPException(status_code=400, detail="El nombre de usuario ya está en uso por otro usuario")
 
-            # Actualizar los campos proporcionados
+        if update_data.password:
+            hashed_password = await hash_password(update_data.password)
+
+        # Actualizar los campos proporcionados
+        async with db_connection(request.app, transaction=True) as conn:
             if update_data.username:
-                await cursor.execute("UPDATE User SET Username = %s WHERE UserId = %s", (update_data.username, user_id))
+                await execute(conn, "usuarios.actualizar_username", (update_data.username, user_id))
             if update_data.name:
-                await cursor.execute("UPDATE User SET Name = %s WHERE UserId = %s", (update_data.name, user_id))
+                await execute(conn, "usuarios.actualizar_nombre", (update_data.name, user_id))
             if update_data.email:
-                await cursor.execute("UPDATE User SET Email = %s WHERE UserId = %s", (update_data.email, user_id))
+                await execute(conn, "usuarios.actualizar_email", (update_data.email, user_id))
             if update_data.password:
-                hashed_password = bcrypt.hashpw(update_data.password.encode('utf-8'), bcrypt.gensalt())
-                await cursor.execute("UPDATE User SET Password = %s WHERE UserId = %s", (hashed_password.decode('utf-8'), user_id))
-
-            await conn.commit()
+                await execute(conn, "usuarios.actualizar_password", (hashed_password, user_id))
 
         return {"status": "success", "message": "Usuario actualizado exitosamente"}
     
@@ -240,5 +223,3 @@ async def update_user(request: Request, user_id: int, update_data: UpdateUserDat
     except Exception as e:
         print(f"Error al actualizar usuario: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        pool.release(conn)
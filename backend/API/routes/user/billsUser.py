@@ -1,66 +1,229 @@
-from fastapi import APIRouter, HTTPException, Request, Query
-from database import get_db_pool
-from typing import List
-from datetime import date, datetime
-import aiomysql
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from queries import db_connection, fetch_all, register_query
+from auth import requiere_usuario
+from respuestas import RespuestaJSON
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from pydantic import BaseModel
 
-router = APIRouter()
+"""
+Gastos del usuario: deducciones de la wallet y pagos de suscripciones.
+
+Cada rama del UNION filtra por usuario y rango de fechas sobre su índice
+(WalletTransaction (UserId, Type, TransactionDate) y Subscription
+(UserId, StartDate)), así el costo depende del rango pedido y no de todo
+el historial. El listado se pagina con un cursor (fecha, origen, id) del
+último gasto devuelto; el resumen agrupa por mes y categoría en MySQL.
+"""
 
-async def get_db_connection(request: Request):
-    pool = await get_db_pool(request.app)
-    conn = await pool.acquire()
-    return pool, conn
+router = APIRouter()
 
 class ExpenseOut(BaseModel):
     id: int
+    origen: str  # wallet o suscripcion: los id de cada tabla se repiten
     categoria: str
     monto: float
     fecha: date
 
-@router.get("/expenses/{user_id}", response_model=List[ExpenseOut])
-async def get_expenses(user_id: int, request: Request):
+class ExpensesPage(BaseModel):
+    gastos: List[ExpenseOut]
+    next_cursor: Optional[str]
+
+# sin from/to se toma todo el historial
+DESDE_MINIMO = datetime(1970, 1, 1)
+HASTA_MAXIMO = datetime(9999, 12, 31)
+
+# {cursor_wallet} / {cursor_suscripcion}: condición de keyset, vacía en la primera página.
+# Cada rama trae a lo sumo limit + 1 filas ya ordenadas por su índice.
+register_query("gastos.listar", """
+    (
+        SELECT
+            TransactionId AS Id,
+            'wallet' AS Origen,
+            'Gasto general' AS Categoria,
+            Amount AS Monto,
+            TransactionDate AS Fecha
+        FROM WalletTransaction
+        WHERE UserId = %s AND Type = 'deduction'
+          AND TransactionDate >= %s AND TransactionDate < %s {cursor_wallet}
+        ORDER BY TransactionDate DESC, TransactionId DESC
+        LIMIT %s
+    )
+    UNION ALL
+    (
+        SELECT
+            s.SubscriptionId AS Id,
+            'suscripcion' AS Origen,
+            sv.Category AS Categoria,
+            s.AmountPaid AS Monto,
+            s.StartDate AS Fecha
+        FROM Subscription s
+        JOIN Plan p ON s.PlanId = p.PlanId
+        JOIN Service sv ON p.ServiceId = sv.ServiceId
+        WHERE s.UserId = %s
+          AND s.StartDate >= %s AND s.StartDate < %s {cursor_suscripcion}
+        ORDER BY s.StartDate DESC, s.SubscriptionId DESC
+        LIMIT %s
+    )
+    ORDER BY Fecha DESC, Origen DESC, Id DESC
+    LIMIT %s
+""")
+register_query("gastos.resumen", """
+    SELECT
+        DATE_FORMAT(Fecha, '%%Y-%%m') AS Mes,
+        Categoria,
+        SUM(Monto) AS Total,
+        COUNT(*) AS Transacciones
+    FROM (
+        SELECT 'Gasto general' AS Categoria, Amount AS Monto, TransactionDate AS Fecha
+        FROM WalletTransaction
+        WHERE UserId = %s AND Type = 'deduction'
+          AND TransactionDate >= %s AND TransactionDate < %s
+        UNION ALL
+        SELECT sv.Category, s.AmountPaid, s.StartDate
+        FROM Subscription s
+        JOIN Plan p ON s.PlanId = p.PlanId
+        JOIN Service sv ON p.ServiceId = sv.ServiceId
+        WHERE s.UserId = %s
+          AND s.StartDate >= %s AND s.StartDate < %s
+    ) AS gastos
+    GROUP BY Mes, Categoria
+    ORDER BY Mes, Categoria
+""")
+
+
+def _condicion_cursor(fecha: str, origen: str, id_columna: str) -> str:
+    # el rango sobre la fecha usa el índice; el desempate por (origen, id) solo
+    # se evalúa en las filas con la misma fecha del cursor
+    return f" AND ({fecha} < %s OR ({fecha} = %s AND ('{origen}', {id_columna}) < (%s, %s)))"
+
+
+def _leer_cursor(cursor: str):
+    try:
+        fecha, origen, id_ = cursor.split("|")
+        if origen not in ("wallet", "suscripcion"):
+            raise ValueError(origen)
+        return datetime.fromisoformat(fecha), origen, int(id_)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _rango(desde: Optional[date], hasta: Optional[date]):
+    """from/to son fechas inclusivas; se consulta [desde, hasta + 1 día)."""
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="from no puede ser posterior a to")
+    inicio = datetime.combine(desde, datetime.min.time()) if desde else DESDE_MINIMO
+    fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time()) if hasta else HASTA_MAXIMO
+    return inicio, fin
+
+
+@router.get("/expenses/{user_id}", dependencies=[Depends(requiere_usuario)], response_model=ExpensesPage)
+async def get_expenses(
+    user_id: int,
+    request: Request,
+    desde: Optional[date] = Query(None, alias="from"),
+    hasta: Optional[date] = Query(None, alias="to"),
+    cursor: Optional[str] = Query(None, max_length=60),  # next_cursor de la página anterior
+    limit: int = Query(50, ge=1, le=200),
+):
     """
-    Devuelve la lista de gastos del usuario, incluyendo deducciones y suscripciones (todos los años y meses).
+    Gastos del usuario (deducciones y suscripciones) entre from y to, del más
+    reciente al más antiguo, de a `limit` por página.
     """
+    inicio, fin = _rango(desde, hasta)
+    cursor_wallet = cursor_suscripcion = ""
+    cursor_params = ()
+    if cursor:
+        fecha, origen, id_ = _leer_cursor(cursor)
+        cursor_wallet = _condicion_cursor("TransactionDate", "wallet", "TransactionId")
+        cursor_suscripcion = _condicion_cursor("s.StartDate", "suscripcion", "s.SubscriptionId")
+        cursor_params = (fecha, fecha, origen, id_)
     try:
-        pool = await get_db_pool(request.app)
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute("""
-                    (
-                        SELECT 
-                            TransactionId AS Id,
-                            'Gasto general' AS Categoria,
-                            Amount AS Monto,
-                            TransactionDate AS Fecha
-                        FROM WalletTransaction
-                        WHERE UserId = %s AND Type = 'deduction'
-                    )
-                    UNION ALL
-                    (
-                        SELECT 
-                            s.SubscriptionId AS Id,
-                            sv.Category AS Categoria,
-                            s.AmountPaid AS Monto,
-                            s.StartDate AS Fecha
-                        FROM Subscription s
-                        JOIN Plan p ON s.PlanId = p.PlanId
-                        JOIN Service sv ON p.ServiceId = sv.ServiceId
-                        WHERE s.UserId = %s
-                    )
-                    ORDER BY Fecha DESC
-                """, (user_id, user_id))
-                gastos = await cursor.fetchall()
-        return [
+        # se pide una fila de más para saber si hay otra página
+        async with db_connection(request.app) as conn:
+            gastos = await fetch_all(
+                conn, "gastos.listar",
+                (
+                    user_id, inicio, fin, *cursor_params, limit + 1,
+                    user_id, inicio, fin, *cursor_params, limit + 1,
+                    limit + 1,
+                ),
+                cursor_wallet=cursor_wallet, cursor_suscripcion=cursor_suscripcion,
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    next_cursor = None
+    if len(gastos) > limit:
+        gastos = gastos[:limit]
+        ultimo = gastos[-1]
+        next_cursor = f"{ultimo['Fecha'].isoformat()}|{ultimo['Origen']}|{ultimo['Id']}"
+    # página de a lo sumo 200 filas: se devuelve el dict para que FastAPI lo valide con ExpensesPage
+    return {
+        "gastos": [
             {
-                "id": g[0],
-                "categoria": g[1],
-                "monto": float(g[2]),
-                "fecha": g[3].strftime('%Y-%m-%d') if hasattr(g[3], 'strftime') else str(g[3]),
+                "id": g["Id"],
+                "origen": g["Origen"],
+                "categoria": g["Categoria"],
+                "monto": float(g["Monto"]),
+                "fecha": g["Fecha"].date(),
             }
             for g in gastos
-        ]
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/expenses/{user_id}/summary", dependencies=[Depends(requiere_usuario)])
+async def get_expenses_summary(
+    user_id: int,
+    request: Request,
+    desde: Optional[date] = Query(None, alias="from"),
+    hasta: Optional[date] = Query(None, alias="to"),
+):
+    """
+    Totales por mes y categoría entre from y to, calculados en MySQL. El
+    tamaño de la respuesta depende de los meses del rango, no de la
+    cantidad de gastos.
+    """
+    inicio, fin = _rango(desde, hasta)
+    try:
+        async with db_connection(request.app) as conn:
+            filas = await fetch_all(conn, "gastos.resumen", (user_id, inicio, fin, user_id, inicio, fin))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    # por mes y por categoría salen de las filas ya agrupadas (meses x categorías)
+    por_mes = {}
+    por_categoria = {}
+    total = Decimal(0)
+    transacciones = 0
+    for fila in filas:
+        for clave, grupo in ((fila["Mes"], por_mes), (fila["Categoria"], por_categoria)):
+            acumulado = grupo.setdefault(clave, [Decimal(0), 0])
+            acumulado[0] += fila["Total"]
+            acumulado[1] += fila["Transacciones"]
+        total += fila["Total"]
+        transacciones += fila["Transacciones"]
+    return RespuestaJSON({
+        "total": float(total),
+        "transacciones": transacciones,
+        "por_mes": [
+            {"mes": mes, "total": float(monto), "transacciones": n}
+            for mes, (monto, n) in por_mes.items()
+        ],
+        "por_categoria": [
+            {"categoria": categoria, "total": float(monto), "transacciones": n}
+            for categoria, (monto, n) in sorted(por_categoria.items(), key=lambda c: c[1][0], reverse=True)
+        ],
+        "por_mes_categoria": [
+            {
+                "mes": fila["Mes"],
+                "categoria": fila["Categoria"],
+                "total": float(fila["Total"]),
+                "transacciones": fila["Transacciones"],
+            }
+            for fila in filas
+        ],
+    })
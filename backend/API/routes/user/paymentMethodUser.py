@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, Request, BackgroundTasks, Body
-from database import get_db_pool
+from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks, Body
+from queries import db_connection, execute, fetch_all, fetch_one, register_query
+from auth import requiere_usuario, usuario_actual
+from respuestas import RespuestaJSON
+from wallet import mover_saldo, saldo, RECARGA, DEDUCCION, SaldoInsuficiente, WalletNoEncontrada
 from datetime import datetime
-import aiomysql
 from pydantic import BaseModel
 from decimal import Decimal
 import random
@@ -9,11 +11,6 @@ from typing import Optional
 
 router = APIRouter()
 
-async def get_db_connection(request: Request):
-    pool = await get_db_pool(request.app)
-    conn = await pool.acquire()
-    return pool, conn
-
 class WalletTransactionRequest(BaseModel):
     tipo: str 
     monto: float 
@@ -26,42 +23,84 @@ class PaymentMethod(BaseModel):
     vencimiento: Optional[str] = None  # Solo para tarjetas
     balance: float = 0  # Solo para billetera
 
-@router.get("/payment-methods/{user_id}")
+register_query("metodos_pago.listar", """
+    SELECT 
+        pm.PaymentMethodId, 
+        pm.Type, 
+        pm.CardNumber, 
+        pm.CardHolder, 
+        pm.ExpiryDate, 
+        pm.WalletBalance
+    FROM PaymentMethod pm
+    WHERE pm.UserId = %s
+""")
+register_query("metodos_pago.efectivo_existente", """
+    SELECT PaymentMethodId FROM PaymentMethod
+    WHERE UserId = %s AND Type = 'cash'
+""")
+register_query("metodos_pago.insertar", """
+    INSERT INTO PaymentMethod (UserId, Type, CardNumber, CardHolder, ExpiryDate, WalletBalance)
+    VALUES (%s, %s, %s, %s, %s, %s)
+""")
+register_query("metodos_pago.eliminar", """
+    DELETE FROM PaymentMethod
+    WHERE UserId = %s AND PaymentMethodId = %s
+""")
+register_query("metodos_pago.tipo", """
+    SELECT Type FROM PaymentMethod
+    WHERE UserId = %s AND PaymentMethodId = %s
+    FOR UPDATE
+""")
+#el saldo de la wallet solo cambia con movimientos del libro mayor (wallet.py);
+#el tipo no se puede cambiar (update_payment_method lo valida), así una
+#tarjeta no pasa a ser una segunda wallet con saldo enviado por el cliente
+register_query("metodos_pago.actualizar", """
+    UPDATE PaymentMethod
+    SET 
+        WalletBalance = IF(Type = 'wallet', WalletBalance, %s),
+        Type = %s,
+        CardNumber = %s,
+        CardHolder = %s,
+        ExpiryDate = %s
+    WHERE UserId = %s AND PaymentMethodId = %s
+""")
+register_query("wallet.transacciones", """
+    SELECT TransactionId, Type, Amount, TransactionDate, BalanceAfter
+    FROM WalletTransaction
+    WHERE UserId = %s
+    ORDER BY TransactionDate DESC
+""")
+register_query("metodos_pago.saldo_metodo", """
+    SELECT WalletBalance FROM PaymentMethod
+    WHERE PaymentMethodId = %s AND UserId = %s AND Type = %s
+""")
+#el saldo se verifica en el mismo UPDATE: si no alcanza no afecta filas
+register_query("metodos_pago.descontar_saldo", """
+    UPDATE PaymentMethod
+    SET WalletBalance = WalletBalance - %s
+    WHERE PaymentMethodId = %s AND UserId = %s AND Type = %s AND WalletBalance >= %s
+""")
+
+@router.get("/payment-methods/{user_id}", dependencies=[Depends(requiere_usuario)])
 async def get_payment_method(user_id: int, request: Request):
     """
     Obtiene los métodos de pago registrados para un usuario específico.
     """
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-        
-                await cursor.execute("""
-                    SELECT 
-                        pm.PaymentMethodId, 
-                        pm.Type, 
-                        pm.CardNumber, 
-                        pm.CardHolder, 
-                        pm.ExpiryDate, 
-                        pm.WalletBalance
-                    FROM PaymentMethod pm
-                    WHERE pm.UserId = %s
-                """, (user_id,))
-
-                metodos = await cursor.fetchall()
-
-                if not metodos:
-                    return {
-                        "success": False,
-                        "message": "No se encontraron métodos de pago registrados"
-                    }
+        async with db_connection(request.app) as conn:
+            metodos = await fetch_all(conn, "metodos_pago.listar", (user_id,), dict_rows=False)
 
+            if not metodos:
                 return {
-                    "success": True,
-                    "data": metodos
+                    "success": False,
+                    "message": "No se encontraron métodos de pago registrados"
                 }
 
+            return {
+                "success": True,
+                "data": metodos
+            }
+
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -69,13 +108,15 @@ async def get_payment_method(user_id: int, request: Request):
         )
 
 @router.post("/payment-methods")
-async def add_payment_method(request: Request, metodo: PaymentMethod = Body(...)):
+async def add_payment_method(request: Request, metodo: PaymentMethod = Body(...), claims: dict = Depends(usuario_actual)):
     """
     Agrega un nuevo método de pago (tarjeta, efectivo, billetera).
     Solo se permite un método de efectivo por usuario.
     """
     try:
         user_id = metodo.user_id
+        if claims["sub"] != user_id and claims["rol"] != "admin":
+            raise HTTPException(status_code=403, detail="No puedes acceder a datos de otro usuario")
         tipo = metodo.tipo
         numero = metodo.numero
         titular = metodo.titular
@@ -84,28 +125,23 @@ async def add_payment_method(request: Request, metodo: PaymentMethod = Body(...)
         # Asignar saldo según el tipo de método
         if tipo == "card":
             balance = random.randint(250, 600)
+        elif tipo == "wallet":
+            # la wallet nace vacía, su saldo solo cambia con recargas
+            balance = 0
         else:
             balance = metodo.balance if metodo.balance is not None else 0
 
-        pool = await get_db_pool(request.app)
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                if tipo == "cash":
-                    # Verificar si ya existe un método efectivo para este usuario
-                    await cursor.execute("""
-                        SELECT PaymentMethodId FROM PaymentMethod
-                        WHERE UserId = %s AND Type = 'cash'
-                    """, (user_id,))
-                    existe = await cursor.fetchone()
-                    if existe:
-                        raise HTTPException(status_code=400, detail="Solo puedes tener un método de efectivo. Usa la opción de editar para modificar el saldo.")
-
-                await cursor.execute("""
-                    INSERT INTO PaymentMethod (UserId, Type, CardNumber, CardHolder, ExpiryDate, WalletBalance)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (user_id, tipo, numero, titular, vencimiento, balance))
-
-                await conn.commit()
+        async with db_connection(request.app) as conn:
+            if tipo == "cash":
+                # Verificar si ya existe un método efectivo para este usuario
+                existe = await fetch_one(conn, "metodos_pago.efectivo_existente", (user_id,))
+                if existe:
+                    raise HTTPException(status_code=400, detail="Solo puedes tener un método de efectivo. Usa la opción de editar para modificar el saldo.")
+
+            await execute(
+                conn, "metodos_pago.insertar",
+                (user_id, tipo, numero, titular, vencimiento, balance)
+            )
 
         return {
             "success": True,
@@ -117,22 +153,14 @@ async def add_payment_method(request: Request, metodo: PaymentMethod = Body(...)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al agregar el método de pago: {str(e)}")
 
-@router.delete("/payment-methods/{user_id}/{payment_method_id}")
+@router.delete("/payment-methods/{user_id}/{payment_method_id}", dependencies=[Depends(requiere_usuario)])
 async def delete_payment_method(user_id: int, payment_method_id: int, request: Request):
     """
     Elimina un método de pago específico del usuario
     """
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute("""
-                    DELETE FROM PaymentMethod
-                    WHERE UserId = %s AND PaymentMethodId = %s
-                """, (user_id, payment_method_id))
-
-            await conn.commit()
+        async with db_connection(request.app) as conn:
+            await execute(conn, "metodos_pago.eliminar", (user_id, payment_method_id))
 
         return {
             "success": True,
@@ -143,7 +171,7 @@ async def delete_payment_method(user_id: int, payment_method_id: int, request: R
         raise HTTPException(status_code=500, detail=f"Error al eliminar el método de pago: {str(e)}")
 
 
-@router.put("/payment-methods/{user_id}/{payment_method_id}")
+@router.put("/payment-methods/{user_id}/{payment_method_id}", dependencies=[Depends(requiere_usuario)])
 async def update_payment_method(user_id: int, payment_method_id: int, metodo: dict, request: Request):
     """
     Actualiza los datos de un método de pago específico del usuario.
@@ -156,85 +184,57 @@ async def update_payment_method(user_id: int, payment_method_id: int, metodo: di
         vencimiento = metodo.get("vencimiento") or metodo.get("expiryDate")
         balance = metodo.get("balance") or metodo.get("walletBalance")
 
-        pool = await get_db_pool(request.app)
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute("""
-                    UPDATE PaymentMethod
-                    SET 
-                        Type = %s,
-                        CardNumber = %s,
-                        CardHolder = %s,
-                        ExpiryDate = %s,
-                        WalletBalance = %s
-                    WHERE UserId = %s AND PaymentMethodId = %s
-                """, (
-                    tipo,
-                    numero,
-                    titular,
-                    vencimiento,
-                    balance,
-                    user_id,
-                    payment_method_id
-                ))
-            await conn.commit()
+        async with db_connection(request.app, transaction=True) as conn:
+            actual = await fetch_one(conn, "metodos_pago.tipo", (user_id, payment_method_id))
+            if not actual:
+                raise HTTPException(status_code=404, detail="Método de pago no encontrado")
+            if tipo and tipo != actual["Type"]:
+                raise HTTPException(status_code=400, detail="No se puede cambiar el tipo de un método de pago; agrega uno nuevo.")
+            await execute(conn, "metodos_pago.actualizar", (
+                balance,
+                actual["Type"],
+                numero,
+                titular,
+                vencimiento,
+                user_id,
+                payment_method_id
+            ))
 
         return {
             "success": True,
             "message": "Método de pago actualizado exitosamente"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al actualizar el método de pago: {str(e)}")
 
 
-@router.post("/wallet/update/{user_id}")
+@router.post("/wallet/update/{user_id}", dependencies=[Depends(requiere_usuario)])
 async def wallet_update(user_id: int, transaction_data: WalletTransactionRequest, request: Request):
     """
-    Recarga o deduce el saldo de la billetera digital de un usuario usando el campo Amount en WalletTransaction.
+    Recarga o deduce el saldo de la billetera digital de un usuario y registra el movimiento en WalletTransaction.
     """
     try:
         tipo = transaction_data.tipo  
-        monto = Decimal(transaction_data.monto)  
+        monto = Decimal(str(transaction_data.monto))  
 
         
         if monto <= 0:
             raise HTTPException(status_code=400, detail="El monto debe ser mayor a cero.")
 
        
-        if tipo not in ['recharge', 'deduction']:
+        if tipo not in [RECARGA, DEDUCCION]:
             raise HTTPException(status_code=400, detail="Tipo de transacción inválido.")
 
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                
-                await cursor.execute("""
-                    SELECT SUM(Amount) as total_balance
-                    FROM WalletTransaction
-                    WHERE UserId = %s AND Type = 'recharge'
-                """, (user_id,))
-                result = await cursor.fetchone()
-
-                
-                total_balance = Decimal(result[0]) if result[0] is not None else Decimal(0)
-
-                
-                if tipo == 'recharge':
-                    new_balance = total_balance + monto  
-                elif tipo == 'deduction':
-                    
-                    if total_balance < monto:
-                        raise HTTPException(status_code=400, detail="Saldo insuficiente para la deducción.")
-                    new_balance = total_balance - monto 
-
-                await cursor.execute("""
-                    INSERT INTO WalletTransaction (UserId, Type, Amount)
-                    VALUES (%s, %s, %s)
-                """, (user_id, tipo, monto))
-
-            await conn.commit()
+        try:
+            async with db_connection(request.app, transaction=True) as conn:
+                new_balance = await mover_saldo(conn, user_id, tipo, monto)
+        except SaldoInsuficiente:
+            raise HTTPException(status_code=400, detail="Saldo insuficiente para la deducción.")
+        except WalletNoEncontrada:
+            raise HTTPException(status_code=404, detail="El usuario no tiene una billetera registrada.")
 
         return {
             "success": True,
@@ -248,107 +248,72 @@ async def wallet_update(user_id: int, transaction_data: WalletTransactionRequest
         raise HTTPException(status_code=500, detail=f"Error al actualizar la billetera: {str(e)}")
 
 
-@router.get("/wallet/transactions/{user_id}")
+@router.get("/wallet/transactions/{user_id}", dependencies=[Depends(requiere_usuario)])
 async def get_transaction(user_id: int, request: Request):
     """
     Obtiene el historial de transacciones de la billetera de un usuario.
     """
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute("""
-                    SELECT TransactionId, Type, Amount, TransactionDate
-                    FROM WalletTransaction
-                    WHERE UserId = %s
-                    ORDER BY TransactionDate DESC
-                """, (user_id,))
-                transacciones = await cursor.fetchall()
-
-                if not transacciones:
-                    return {
-                        "success": False,
-                        "message": "No se encontraron transacciones para este usuario."
-                    }
+        async with db_connection(request.app) as conn:
+            transacciones = await fetch_all(conn, "wallet.transacciones", (user_id,), dict_rows=False)
 
+            if not transacciones:
                 return {
-                    "success": True,
-                    "data": transacciones
+                    "success": False,
+                    "message": "No se encontraron transacciones para este usuario."
                 }
 
+            return RespuestaJSON({
+                "success": True,
+                "data": transacciones
+            })
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener las transacciones: {str(e)}")
 
-@router.post("/wallet/recharge-from-method/{user_id}")
+@router.post("/wallet/recharge-from-method/{user_id}", dependencies=[Depends(requiere_usuario)])
 async def recharge_wallet_from_method(user_id: int, data: dict, request: Request):
     """
     Recarga la wallet usando una tarjeta o efectivo como fuente.
     """
     payment_method_id = data.get("payment_method_id")
-    monto = Decimal(data.get("monto", 0))
+    monto = Decimal(str(data.get("monto", 0)))
     tipo = data.get("tipo")  # "card" o "cash"
 
     if monto <= 0:
         raise HTTPException(status_code=400, detail="El monto debe ser mayor a cero.")
 
-    pool = await get_db_pool(request.app)
-    async with pool.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cursor:
-            # Verifica el saldo disponible en el método seleccionado
-            await cursor.execute("""
-                SELECT WalletBalance FROM PaymentMethod
-                WHERE PaymentMethodId = %s AND UserId = %s AND Type = %s
-            """, (payment_method_id, user_id, tipo))
-            metodo = await cursor.fetchone()
+    #débito del método, crédito a la wallet y registro en una sola transacción
+    async with db_connection(request.app, transaction=True) as conn:
+        # Descuenta el saldo del método seleccionado solo si alcanza
+        result = await execute(
+            conn, "metodos_pago.descontar_saldo", (monto, payment_method_id, user_id, tipo, monto)
+        )
+        if result.rowcount == 0:
+            # sin filas afectadas: el método no existe o no tiene saldo suficiente
+            metodo = await fetch_one(conn, "metodos_pago.saldo_metodo", (payment_method_id, user_id, tipo))
             if not metodo:
                 raise HTTPException(status_code=404, detail="Método de pago no encontrado.")
-            saldo_actual = Decimal(metodo["WalletBalance"] or 0)
-            if saldo_actual < monto:
-                raise HTTPException(status_code=400, detail="Saldo insuficiente en el método seleccionado.")
-
-            # Descuenta el saldo del método seleccionado
-            await cursor.execute("""
-                UPDATE PaymentMethod
-                SET WalletBalance = WalletBalance - %s
-                WHERE PaymentMethodId = %s
-            """, (monto, payment_method_id))
-
-            # Suma el saldo a la wallet (tipo 'wallet')
-            await cursor.execute("""
-                UPDATE PaymentMethod
-                SET WalletBalance = WalletBalance + %s
-                WHERE UserId = %s AND Type = 'wallet'
-            """, (monto, user_id))
-
-            # Registra la transacción en WalletTransaction
-            await cursor.execute("""
-                INSERT INTO WalletTransaction (UserId, Type, Amount)
-                VALUES (%s, %s, %s)
-            """, (user_id, "recharge", monto))
-
-        await conn.commit()
+            raise HTTPException(status_code=400, detail="Saldo insuficiente en el método seleccionado.")
+
+        # Suma el saldo a la wallet y registra el movimiento en el libro mayor
+        try:
+            await mover_saldo(conn, user_id, RECARGA, monto)
+        except WalletNoEncontrada:
+            raise HTTPException(status_code=404, detail="El usuario no tiene una billetera registrada.")
 
     return {"success": True, "message": "Recarga exitosa"}
 
-@router.get("/wallet/balance/{user_id}")
+@router.get("/wallet/balance/{user_id}", dependencies=[Depends(requiere_usuario)])
 async def get_wallet_balance(user_id: int, request: Request):
     """
     Devuelve el saldo actual de la wallet del usuario.
     """
     try:
-        pool = await get_db_pool(request.app)
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute("""
-                    SELECT WalletBalance
-                    FROM PaymentMethod
-                    WHERE UserId = %s AND Type = 'wallet'
-                    LIMIT 1
-                """, (user_id,))
-                row = await cursor.fetchone()
-                if not row:
-                    return {"success": False, "balance": 0}
-                return {"success": True, "balance": float(row[0])}
+        async with db_connection(request.app) as conn:
+            balance = await saldo(conn, user_id)
+            if balance is None:
+                return {"success": False, "balance": 0}
+            return {"success": True, "balance": float(balance)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener el saldo de la wallet: {str(e)}")
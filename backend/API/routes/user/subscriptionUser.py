@@ -1,17 +1,20 @@
-from fastapi import APIRouter, HTTPException, Request, BackgroundTasks
-from database import get_db_pool
-from datetime import datetime
-import aiomysql
+from fastapi import APIRouter, Depends, HTTPException, Request
+from queries import db_connection, execute, execute_many, fetch_all, fetch_one, register_query
+from auth import requiere_usuario
+from respuestas import RespuestaJSON
+from datetime import date, datetime
+from decimal import Decimal
 from pydantic import BaseModel
-from mailer import send_email
+from typing import List, Optional
+import calendar
+import os
+from outbox import encolar_correo
+from metricas import cambiar_estado, registrar_suscripcion, registrar_suscripciones
+from cache import invalidar, SUSCRIPCIONES
+from wallet import descontar_varios, mover_saldo, DEDUCCION, SaldoInsuficiente, WalletNoEncontrada
 
 router = APIRouter()
 
-async def get_db_connection(request: Request):
-    pool = await get_db_pool(request.app)
-    conn = await pool.acquire()
-    return pool, conn
-
 
 class PlanSubscription(BaseModel):
     service_id: int
@@ -22,56 +25,103 @@ class PlanSubscription(BaseModel):
     PaymentMethod: str # Método de pago
 
 
+class CheckoutItem(BaseModel):
+    service_id: int
+    plant_type: str  # monthly, annual
+
+
+class Checkout(BaseModel):
+    items: List[CheckoutItem]
+    PaymentMethod: str  # card, cash, wallet
+    start_date: Optional[str] = None  # Formato 'YYYY-MM-DD', hoy si no se envía
+
+
+# planes que se pueden comprar en un mismo checkout
+CHECKOUT_MAX_ITEMS = int(os.getenv("CHECKOUT_MAX_ITEMS", 20))
+
+register_query("planes.por_servicio_tipo", """
+    SELECT PlanId FROM Plan WHERE ServiceId = %s AND Type = %s
+""")
+#todos los planes del carrito en una consulta, por pares (ServiceId, Type)
+register_query("planes.resolver_carrito", """
+    SELECT p.PlanId, p.ServiceId, p.Type, p.Price, srv.Name AS Servicio
+    FROM Plan AS p
+    JOIN Service AS srv ON p.ServiceId = srv.ServiceId
+    WHERE (p.ServiceId, p.Type) IN ({pares})
+""")
+register_query("usuarios.contacto", """
+    SELECT Name, Email FROM User WHERE UserId = %s
+""")
+register_query("suscripciones.insertar", """
+    INSERT INTO Subscription 
+    (UserId, PlanId, StartDate, EndDate, AmountPaid, PaymentMethod)
+    VALUES (%s, %s, %s, %s, %s, %s)
+""")
+register_query("suscripciones.historial", """
+    SELECT
+        s.SubscriptionId as SubscriptionId, 
+        srv.Name as Servicio,
+        p.Type as TipoPlan,
+        s.StartDate as FechaInicio,
+        s.EndDate as FechaFin,
+        s.Status as Estado
+    FROM User u
+    JOIN Subscription s ON u.UserId = s.UserId
+    JOIN Plan p ON s.PlanId = p.PlanId
+    JOIN Service srv ON p.ServiceId = srv.ServiceId
+    WHERE u.UserId = %s
+    ORDER BY s.StartDate DESC;
+""")
+register_query("suscripciones.activa_de_usuario", """
+    SELECT SubscriptionId, Status 
+    FROM Subscription 
+    WHERE UserId = %s AND SubscriptionId = %s AND Status = 'active'
+""")
+register_query("suscripciones.cancelar", """
+    UPDATE Subscription
+    SET Status = 'cancelled', EndDate = %s
+    WHERE SubscriptionId = %s AND Status = 'active'
+""")
 
-@router.post("/pay/plan/{user_id}")
-async def pay_plan_subscription(request: Request, user_id: int, plan_subscription: PlanSubscription, background_tasks: BackgroundTasks):
+
+@router.post("/pay/plan/{user_id}", dependencies=[Depends(requiere_usuario)])
+async def pay_plan_subscription(request: Request, user_id: int, plan_subscription: PlanSubscription):
     """
     Permite a un usuario suscribirse a un plan específico
     """
-    pool, conn = await get_db_connection(request)
     try:
-        async with conn.cursor(aiomysql.DictCursor) as cursor:
+        async with db_connection(request.app) as conn:
 
             #plan_subscription es el id del ServiceId, entonces debemos obtener el PlanId a partir de ese ServiceId
-            await cursor.execute(
-                """
-                SELECT PlanId FROM Plan WHERE ServiceId = %s AND Type = %s
-                """, (plan_subscription.service_id, plan_subscription.plant_type)
+            plan_row = await fetch_one(
+                conn, "planes.por_servicio_tipo",
+                (plan_subscription.service_id, plan_subscription.plant_type)
             )
-            plan_row = await cursor.fetchone()
             if not plan_row:
                 raise HTTPException(404, "Plan no encontrado")
             plan_id = plan_row["PlanId"]
 
-            if plan_subscription.PaymentMethod == "wallet":
-                # Verificar saldo
-                await cursor.execute(
-                    "SELECT WalletBalance FROM PaymentMethod WHERE UserId = %s AND Type = 'wallet'",
-                    (user_id,)
-                )
-                row = await cursor.fetchone()
-                saldo_actual = float(row["WalletBalance"] or 0)
-                if saldo_actual < plan_subscription.AmountPaid:
-                    raise HTTPException(400, "Saldo insuficiente en la wallet.")
+            #obtener el nombre del cliente, así como su email
+            user_info = await fetch_one(conn, "usuarios.contacto", (user_id,))
+            if not user_info:
+                raise HTTPException(status_code=404, detail="Usuario no encontrado")
+            user_name = user_info["Name"]
+            user_email = user_info["Email"]
 
-                # Descontar saldo
-                await cursor.execute(
-                    "UPDATE PaymentMethod SET WalletBalance = WalletBalance - %s WHERE UserId = %s AND Type = 'wallet'",
-                    (plan_subscription.AmountPaid, user_id)
-                )
+        #pago, suscripción y correo de confirmación en una sola transacción
+        async with db_connection(request.app, transaction=True) as conn:
 
-                # Registrar transacción
-                await cursor.execute(
-                    "INSERT INTO WalletTransaction (UserId, Type, Amount) VALUES (%s, %s, %s)",
-                    (user_id, "deduction", plan_subscription.AmountPaid)
-                )
+            if plan_subscription.PaymentMethod == "wallet":
+                # Descontar saldo y registrar el movimiento en el libro mayor
+                try:
+                    await mover_saldo(conn, user_id, DEDUCCION, plan_subscription.AmountPaid)
+                except SaldoInsuficiente:
+                    raise HTTPException(400, "Saldo insuficiente en la wallet.")
+                except WalletNoEncontrada:
+                    raise HTTPException(404, "El usuario no tiene una billetera registrada.")
 
-            await cursor.execute(
-                """
-                INSERT INTO Subscription 
-                (UserId, PlanId, StartDate, EndDate, AmountPaid, PaymentMethod)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
+            await execute(
+                conn, "suscripciones.insertar",
                 (
                 user_id,
                 int(plan_id),
@@ -81,23 +131,18 @@ async def pay_plan_subscription(request: Request, user_id: int, plan_subscriptio
                 plan_subscription.PaymentMethod
                 )
             )
-            await conn.commit()
 
-            #obtener el nombre del cliente, así como su email
-            await cursor.execute(
-                """
-                SELECT Name, Email FROM User WHERE UserId = %s
-                """, (user_id,)
+            #contadores del panel de control, en la misma transacción
+            await registrar_suscripcion(
+                conn,
+                plan_subscription.service_id,
+                plan_subscription.start_date,
+                plan_subscription.AmountPaid
             )
-            user_info = await cursor.fetchone()
-            if not user_info:
-                raise HTTPException(status_code=404, detail="Usuario no encontrado")
-            user_name = user_info["Name"]
-            user_email = user_info["Email"]
 
-            #Enviar confirmación de pago
-            background_tasks.add_task(
-                send_email,
+            #Encolar confirmación de pago
+            await encolar_correo(
+                conn,
                 "Pago realizado con éxito",
                 user_email,
                 "confirm_payment.html",
@@ -107,51 +152,144 @@ async def pay_plan_subscription(request: Request, user_id: int, plan_subscriptio
                 }
             )
 
+        invalidar(SUSCRIPCIONES)
         return {"success": True, "message": "Suscripción exitosa"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Error al procesar la suscripción: {e}")
-    finally:
-        pool.release(conn)
 
 
 
 
-@router.get("/subscription/{user_id}")
+def _sumar_meses(fecha: date, meses: int) -> date:
+    #el día se ajusta al último del mes si no existe (31 de enero + 1 mes = 28/29 de febrero)
+    mes = fecha.month - 1 + meses
+    anio = fecha.year + mes // 12
+    mes = mes % 12 + 1
+    return fecha.replace(year=anio, month=mes, day=min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+@router.post("/checkout/{user_id}", dependencies=[Depends(requiere_usuario)])
+async def checkout(request: Request, user_id: int, carrito: Checkout):
+    """
+    Compra varios planes a la vez: resuelve todos los planes en una consulta,
+    cobra el total una sola vez y crea todas las suscripciones y sus contadores
+    con INSERT multi-fila en una misma transacción, con un único correo de
+    comprobante. Si algo falla no se crea ninguna.
+    """
+    items = carrito.items
+    if not items:
+        raise HTTPException(400, "El carrito está vacío.")
+    if len(items) > CHECKOUT_MAX_ITEMS:
+        raise HTTPException(400, f"El carrito admite hasta {CHECKOUT_MAX_ITEMS} planes.")
+    if len({item.service_id for item in items}) != len(items):
+        raise HTTPException(400, "El carrito tiene el mismo servicio más de una vez.")
+    if any(item.plant_type not in ("monthly", "annual") for item in items):
+        raise HTTPException(400, "Tipo de plan inválido.")
+    if carrito.PaymentMethod not in ("card", "cash", "wallet"):
+        raise HTTPException(400, "Método de pago inválido.")
+    try:
+        inicio = date.fromisoformat(carrito.start_date) if carrito.start_date else date.today()
+    except ValueError:
+        raise HTTPException(400, "start_date debe tener el formato YYYY-MM-DD.")
+
+    async with db_connection(request.app) as conn:
+        planes = await fetch_all(
+            conn, "planes.resolver_carrito",
+            [valor for item in items for valor in (item.service_id, item.plant_type)],
+            pares=", ".join(["(%s, %s)"] * len(items))
+        )
+        user_info = await fetch_one(conn, "usuarios.contacto", (user_id,))
+    if not user_info:
+        raise HTTPException(404, "Usuario no encontrado")
+
+    por_item = {(plan["ServiceId"], plan["Type"]): plan for plan in planes}
+    faltantes = [item.service_id for item in items if (item.service_id, item.plant_type) not in por_item]
+    if faltantes:
+        raise HTTPException(404, f"Plan no encontrado para los servicios {faltantes}")
+
+    #mismo orden que el carrito
+    comprados = []
+    for item in items:
+        plan = por_item[(item.service_id, item.plant_type)]
+        fin = _sumar_meses(inicio, 1 if item.plant_type == "monthly" else 12)
+        comprados.append((plan, fin))
+    total = sum((Decimal(plan["Price"]) for plan, _ in comprados), Decimal(0))
+
+    nuevo_saldo = None
+    #cobro, suscripciones, contadores y comprobante en una sola transacción
+    async with db_connection(request.app, transaction=True) as conn:
+        if carrito.PaymentMethod == "wallet":
+            try:
+                nuevo_saldo = await descontar_varios(conn, user_id, [plan["Price"] for plan, _ in comprados])
+            except SaldoInsuficiente:
+                raise HTTPException(400, "Saldo insuficiente en la wallet.")
+            except WalletNoEncontrada:
+                raise HTTPException(404, "El usuario no tiene una billetera registrada.")
+
+        #un INSERT multi-fila para todas las suscripciones
+        await execute_many(
+            conn, "suscripciones.insertar",
+            [
+                (user_id, plan["PlanId"], inicio, fin, plan["Price"], carrito.PaymentMethod)
+                for plan, fin in comprados
+            ]
+        )
+        #contadores del panel: un INSERT multi-fila por tabla resumen (metricas.sumar_*
+        #solo lleva %s en VALUES), no una sentencia por plan del carrito
+        await registrar_suscripciones(
+            conn, [(plan["ServiceId"], inicio, plan["Price"]) for plan, _ in comprados]
+        )
+
+        await encolar_correo(
+            conn,
+            "Compra realizada con éxito",
+            user_info["Email"],
+            "checkout_receipt.html",
+            {
+                "name": user_info["Name"],
+                "items": [
+                    {
+                        "service": plan["Servicio"],
+                        "plan_type": "Mensual" if plan["Type"] == "monthly" else "Anual",
+                        "amount": plan["Price"],
+                        "end_date": fin.isoformat(),
+                    }
+                    for plan, fin in comprados
+                ],
+                "total": total,
+            }
+        )
+
+    invalidar(SUSCRIPCIONES)
+    respuesta = {
+        "success": True,
+        "message": "Compra exitosa",
+        "suscripciones": len(comprados),
+        "total": float(total),
+    }
+    if nuevo_saldo is not None:
+        respuesta["saldo"] = float(nuevo_saldo)
+    return respuesta
+
+
+@router.get("/subscription/{user_id}", dependencies=[Depends(requiere_usuario)])
 async def get_history_subscription(request: Request, user_id: int):
     """
     Obtiene el historial de suscripciones del usuario logueado por user_id
     """
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                query = """
-                    SELECT
-                        s.SubscriptionId as SubscriptionId, 
-                        srv.Name as Servicio,
-                        p.Type as TipoPlan,
-                        s.StartDate as FechaInicio,
-                        s.EndDate as FechaFin,
-                        s.Status as Estado
-                    FROM User u
-                    JOIN Subscription s ON u.UserId = s.UserId
-                    JOIN Plan p ON s.PlanId = p.PlanId
-                    JOIN Service srv ON p.ServiceId = srv.ServiceId
-                    WHERE u.UserId = %s
-                    ORDER BY s.StartDate DESC;
-                """
-
-                await cursor.execute(query, (user_id,))
-                suscripciones = await cursor.fetchall()
-
-                return {
-                    "success": True,
-                    "message": "Historial de suscripciones obtenido exitosamente",
-                    "data": suscripciones,
-                    "total_registros": len(suscripciones)
-                }
+        async with db_connection(request.app) as conn:
+            suscripciones = await fetch_all(conn, "suscripciones.historial", (user_id,))
+
+            return RespuestaJSON({
+                "success": True,
+                "message": "Historial de suscripciones obtenido exitosamente",
+                "data": suscripciones,
+                "total_registros": len(suscripciones)
+            })
 
     except Exception as e:
         raise HTTPException(
@@ -160,41 +298,35 @@ async def get_history_subscription(request: Request, user_id: int):
         )
 
 
-@router.put("/subscription/cancelled/{user_id}/{subscription_id}")
+@router.put("/subscription/cancelled/{user_id}/{subscription_id}", dependencies=[Depends(requiere_usuario)])
 async def cancel_subscription(user_id: int, subscription_id: int, request: Request):
     """
     Cancela una suscripción activa específica de un usuario por su SubscriptionId
     """
     try:
-        pool = await get_db_pool(request.app)
-
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute("""
-                    SELECT SubscriptionId, Status 
-                    FROM Subscription 
-                    WHERE UserId = %s AND SubscriptionId = %s AND Status = 'active'
-                """, (user_id, subscription_id))
-                subscription = await cursor.fetchone()
-
-                if not subscription:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail="La suscripción no está activa o no existe."
-                    )
-
-                await cursor.execute("""
-                    UPDATE Subscription
-                    SET Status = 'cancelled', EndDate = %s
-                    WHERE SubscriptionId = %s
-                """, (datetime.now().strftime('%Y-%m-%d'), subscription_id))
-                
-                await conn.commit()
-
-                return {
-                    "success": True,
-                    "message": "Suscripción cancelada exitosamente"
-                }
+        async with db_connection(request.app, transaction=True) as conn:
+            subscription = await fetch_one(
+                conn, "suscripciones.activa_de_usuario", (user_id, subscription_id)
+            )
+
+            if not subscription:
+                raise HTTPException(
+                    status_code=400, 
+                    detail="La suscripción no está activa o no existe."
+                )
+
+            result = await execute(
+                conn, "suscripciones.cancelar",
+                (datetime.now().strftime('%Y-%m-%d'), subscription_id)
+            )
+            # solo cuenta si esta transacción fue la que cambió el estado
+            await cambiar_estado(conn, "active", "cancelled", result.rowcount)
+
+        invalidar(SUSCRIPCIONES)
+        return {
+            "success": True,
+            "message": "Suscripción cancelada exitosamente"
+        }
 
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -1,69 +1,257 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from datetime import datetime, timedelta
-import aiomysql
-from database import get_db_pool
+import asyncio
+import logging
+import os
+import time
 from mailer import send_email
+from outbox import encolar_correo
+from queries import db_connection, execute, fetch_all, fetch_one, register_query, stream
+from metricas import cambiar_estado
+from cache import invalidar, SUSCRIPCIONES
 from apscheduler.triggers.cron import CronTrigger
 import pytz
 from fastapi import Request
 
 """
 Scheduler para enviar correos de suscripciones que están por vencer
+y marcar como 'expired' las que ya vencieron
 """
 
-async def job_notify_expiring(app):
-    pool = await get_db_pool(app)
-    async with pool.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cursor:
-            
-            #Calcula la fecha en 3 días
-            cursor_date = (datetime.utcnow() + timedelta(days=3)).strftime("%Y-%m-%d")
-
-            #Busca suscripciones que venzan ese día y que aún estén 'active'
-            await cursor.execute("""
-                SELECT u.Email, u.Name, s.EndDate, p.Type, s.AmountPaid
-                FROM Subscription AS s
-                JOIN `User` AS u ON s.UserId = u.UserId
-                JOIN Plan AS p ON s.PlanId = p.PlanId
-                WHERE s.Status = 'active'
-                AND DATE(s.EndDate) = %s;
-            """, (cursor_date,))
-            rows = await cursor.fetchall()
-
-    #para cada fila, envía un correo
-    for row in rows:
-
-        #traducir el plan_type
-        if row["Type"] == "monthly":
-            row["Type"] = "Mensual"
-        elif row["Type"] == "annual":
-            row["Type"] = "Anual"
-        else:
-            row["Type"] = "Desconocido"
-        
-        #formatea el cuerpo 
-        context = {
-            "name": row["Name"],
-            "end_date": row["EndDate"].strftime("%Y-%m-%d"),
-            "plan_type": row["Type"],
-            "amount": row["AmountPaid"],
-        }
-        # encola el envío (no bloquea)
-        await send_email(
-            subject="Tu suscripción vence pronto",
-            to=row["Email"],
-            template_name="expiring.html",
-            context=context
-        )
+logger = logging.getLogger(__name__)
+
+JOB_NOTIFY_EXPIRING = "notify_expiring"
+
+# correos enviados en paralelo y filas leídas del cursor por bloque
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", 20))
+NOTIFY_CHUNK_SIZE = int(os.getenv("NOTIFY_CHUNK_SIZE", 500))
+# filas vencidas por transacción y segundos de pausa entre bloques, para no
+# retener bloqueos sobre Subscription ni acaparar MySQL en horario de uso
+EXPIRE_CHUNK_SIZE = int(os.getenv("EXPIRE_CHUNK_SIZE", 500))
+EXPIRE_CHUNK_PAUSE = float(os.getenv("EXPIRE_CHUNK_PAUSE", 0.1))
+
+
+register_query("checkpoint.leer", """
+    SELECT LastId, Processed, Finished
+    FROM JobCheckpoint
+    WHERE JobName = %s AND TargetDate = %s
+""")
+register_query("checkpoint.guardar", """
+    INSERT INTO JobCheckpoint (JobName, TargetDate, LastId, Processed, Finished)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        LastId = VALUES(LastId),
+        Processed = VALUES(Processed),
+        Finished = VALUES(Finished)
+""")
+register_query("checkpoint.pendientes", """
+    SELECT TargetDate FROM JobCheckpoint
+    WHERE JobName = %s AND Finished = 'no' AND TargetDate >= CURDATE()
+    ORDER BY TargetDate
+""")
+register_query("sesion.net_write_timeout", "SET SESSION net_write_timeout = %s")
+#Busca suscripciones que venzan ese día y que aún estén 'active'
+register_query("scheduler.por_vencer", """
+    SELECT s.SubscriptionId, u.Email, u.Name, s.EndDate, p.Type, s.AmountPaid
+    FROM Subscription AS s
+    JOIN `User` AS u ON s.UserId = u.UserId
+    JOIN Plan AS p ON s.PlanId = p.PlanId
+    WHERE s.Status = 'active'
+    AND s.EndDate >= %s AND s.EndDate < %s
+    AND s.SubscriptionId > %s
+    ORDER BY s.SubscriptionId
+""")
+#Vence un bloque de suscripciones activas con EndDate pasado. Recorre
+#IX_Subscription_Status_EndDate en orden: las filas actualizadas salen del
+#rango 'active', así el bloque siguiente empieza donde terminó este
+register_query("scheduler.vencer_bloque", """
+    UPDATE Subscription
+    SET Status = 'expired'
+    WHERE Status = 'active' AND EndDate < NOW()
+    ORDER BY EndDate, SubscriptionId
+    LIMIT %s
+""")
+
+
+async def leer_checkpoint(app, job_name, target_date):
+    async with db_connection(app) as conn:
+        return await fetch_one(conn, "checkpoint.leer", (job_name, target_date))
+
+
+async def guardar_checkpoint(app, job_name, target_date, last_id, processed, finished=False):
+    async with db_connection(app) as conn:
+        await _guardar_checkpoint(conn, job_name, target_date, last_id, processed, finished)
+
+
+async def _guardar_checkpoint(conn, job_name, target_date, last_id, processed, finished=False):
+    await execute(
+        conn, "checkpoint.guardar",
+        (job_name, target_date, last_id, processed, "yes" if finished else "no")
+    )
+
+
+ASUNTO_VENCIMIENTO = "Tu suscripción vence pronto"
+
+
+def contexto_vencimiento(row):
+    #traducir el plan_type
+    tipos = {"monthly": "Mensual", "annual": "Anual"}
+
+    #formatea el cuerpo
+    return {
+        "name": row["Name"],
+        "end_date": row["EndDate"].strftime("%Y-%m-%d"),
+        "plan_type": tipos.get(row["Type"], "Desconocido"),
+        "amount": row["AmountPaid"],
+    }
+
+
+async def notificar_vencimiento(row, semaforo):
+    async with semaforo:
+        try:
+            await send_email(
+                subject=ASUNTO_VENCIMIENTO,
+                to=row["Email"],
+                template_name="expiring.html",
+                context=contexto_vencimiento(row)
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error al notificar suscripción {row['SubscriptionId']}: {e}")
+            return False
+
+
+async def job_notify_expiring(app, target_date=None):
+    #Calcula la fecha en 3 días
+    if target_date is None:
+        target_date = (datetime.utcnow() + timedelta(days=3)).date()
+
+    #retoma desde el último bloque confirmado si una ejecución anterior se interrumpió
+    checkpoint = await leer_checkpoint(app, JOB_NOTIFY_EXPIRING, target_date)
+    if checkpoint and checkpoint["Finished"] == "yes":
+        logger.info(f"Notificaciones para {target_date} ya enviadas")
+        return
+    last_id = checkpoint["LastId"] if checkpoint else 0
+    processed = checkpoint["Processed"] if checkpoint else 0
+    if last_id:
+        logger.info(f"Reanudando notificaciones para {target_date} desde SubscriptionId {last_id}")
+
+    semaforo = asyncio.Semaphore(NOTIFY_CONCURRENCY)
+    inicio = time.perf_counter()
+    procesadas = 0
+    fallidas = 0
+
+    async with db_connection(app) as conn:
+        #el envío de cada bloque ocurre con el cursor abierto, se amplía el
+        #tiempo que MySQL espera a que el cliente lea el siguiente bloque
+        await execute(conn, "sesion.net_write_timeout", (3600,))
+
+        #cursor del lado del servidor: las filas se leen por bloques, no todas a memoria
+        async for rows in stream(
+            conn, "scheduler.por_vencer",
+            (target_date, target_date + timedelta(days=1), last_id),
+            chunk_size=NOTIFY_CHUNK_SIZE
+        ):
+            #envía el bloque con concurrencia acotada
+            resultados = await asyncio.gather(
+                *[notificar_vencimiento(row, semaforo) for row in rows]
+            )
+            fallidos = [row for row, enviado in zip(rows, resultados) if not enviado]
+            fallidas += len(fallidos)
+            procesadas += len(rows)
+
+            #guarda el avance tras cada bloque completo; los envíos fallidos pasan
+            #al outbox en la misma transacción, que los reintenta con backoff, así
+            #avanzar LastId no pierde ningún aviso
+            last_id = rows[-1]["SubscriptionId"]
+            async with db_connection(app, transaction=True) as conn_tx:
+                for row in fallidos:
+                    await encolar_correo(
+                        conn_tx, ASUNTO_VENCIMIENTO, row["Email"], "expiring.html", contexto_vencimiento(row)
+                    )
+                await _guardar_checkpoint(
+                    conn_tx, JOB_NOTIFY_EXPIRING, target_date, last_id, processed + procesadas
+                )
+
+    await guardar_checkpoint(
+        app, JOB_NOTIFY_EXPIRING, target_date, last_id, processed + procesadas, finished=True
+    )
+
+    duracion = time.perf_counter() - inicio
+    logger.info(
+        f"Notificaciones de vencimiento {target_date}: {procesadas} filas en {duracion:.1f}s "
+        f"({procesadas / duracion if duracion else 0:.1f} filas/s), {fallidas} fallidas encoladas en el outbox"
+    )
+
+
+async def resume_notify_expiring(app):
+    #al iniciar, completa las ejecuciones que quedaron a medias
+    async with db_connection(app) as conn:
+        pendientes = await fetch_all(conn, "checkpoint.pendientes", (JOB_NOTIFY_EXPIRING,))
+
+    for row in pendientes:
+        await job_notify_expiring(app, row["TargetDate"])
+
+
+async def job_expire_subscriptions(app):
+    """
+    Marca como 'expired' las suscripciones activas ya vencidas, en bloques de
+    EXPIRE_CHUNK_SIZE filas con una transacción corta por bloque. Cada bloque
+    mueve también los contadores de estado de las tablas resumen.
+    """
+    inicio = time.perf_counter()
+    vencidas = 0
+    bloques_ms = []
+
+    while True:
+        inicio_bloque = time.perf_counter()
+        async with db_connection(app, transaction=True) as conn:
+            result = await execute(conn, "scheduler.vencer_bloque", (EXPIRE_CHUNK_SIZE,))
+            await cambiar_estado(conn, "active", "expired", result.rowcount)
+        ms = (time.perf_counter() - inicio_bloque) * 1000
+        if result.rowcount > 0:
+            vencidas += result.rowcount
+            bloques_ms.append(round(ms, 1))
+            invalidar(SUSCRIPCIONES)
+            logger.info(f"Vencimiento: bloque de {result.rowcount} suscripciones en {ms:.1f}ms")
+        if result.rowcount < EXPIRE_CHUNK_SIZE:
+            break
+        #deja pasar a las transacciones de los usuarios entre bloque y bloque
+        await asyncio.sleep(EXPIRE_CHUNK_PAUSE)
+
+    duracion = time.perf_counter() - inicio
+    reporte = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "vencidas": vencidas,
+        "bloques": len(bloques_ms),
+        "bloque_ms": {
+            "promedio": round(sum(bloques_ms) / len(bloques_ms), 1) if bloques_ms else 0,
+            "max": max(bloques_ms) if bloques_ms else 0,
+            "detalle": bloques_ms,
+        },
+        "duracion_s": round(duracion, 2),
+    }
+    app.state.ultimo_vencimiento = reporte
+    logger.info(
+        f"Vencimiento de suscripciones: {vencidas} filas en {len(bloques_ms)} bloques, {duracion:.1f}s"
+    )
+    return reporte
+
 
 def start_scheduler(app):
     #define la zona horaria de Guatemala
     tz = pytz.timezone("America/Guatemala")
 
     scheduler = AsyncIOScheduler(timezone=tz)
-    
+
     #crea un trigger cron a las 12:00pm en esa zona
     trigger = CronTrigger(hour=00, minute=46, timezone=tz)
 
     scheduler.add_job(job_notify_expiring, trigger, args=[app])
+    #vence las suscripciones cada hora y una vez al iniciar
+    scheduler.add_job(
+        job_expire_subscriptions, CronTrigger(minute=5, timezone=tz), args=[app],
+        next_run_time=datetime.now(tz), max_instances=1, coalesce=True
+    )
+    scheduler.add_job(resume_notify_expiring, next_run_time=datetime.now(tz), args=[app])
     scheduler.start()
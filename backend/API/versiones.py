@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+from fastapi import Request, Response
+from queries import db_connection, execute, fetch_all, register_query
+
+"""
+Versiones de datos para GET condicionales (ETag / If-None-Match).
+
+Cada listado que cambia poco (el catálogo de servicios) tiene un contador
+en DataVersion que sus escrituras incrementan dentro de su transacción.
+Cada worker guarda una copia en memoria, refrescada cada
+DATA_VERSION_REFRESH segundos, así responder 304 no consulta MySQL.
+
+El ETag es fuerte y sale del contador compartido, no del proceso: dos
+workers con la misma versión sirven el mismo contenido. Un worker que
+aún no refrescó puede responder 304 con la versión anterior como mucho
+durante DATA_VERSION_REFRESH segundos.
+
+Uso en un endpoint de lectura:
+
+    etag = etag_de("servicios")
+    if no_modificado(request, etag):
+        return respuesta_304(etag)
+    ...
+    marcar_etag(response, etag)
+
+y en las escrituras:
+
+    async with db_connection(app, transaction=True) as conn:
+        ...
+        version = await incrementar_version(conn, "servicios")
+    publicar_version("servicios", version)
+"""
+
+logger = logging.getLogger(__name__)
+
+DATA_VERSION_REFRESH = float(os.getenv("DATA_VERSION_REFRESH", 5))  # segundos
+
+register_query("versiones.leer", "SELECT Name, Version FROM DataVersion")
+# LAST_INSERT_ID(expr) deja la versión nueva en lastrowid sin otra consulta
+register_query("versiones.incrementar", """
+    INSERT INTO DataVersion (Name, Version) VALUES (%s, LAST_INSERT_ID(1))
+    ON DUPLICATE KEY UPDATE Version = LAST_INSERT_ID(Version + 1)
+""")
+
+
+class DataVersions:
+
+    def __init__(self):
+        self.versiones = {}
+        self.cargado = False
+
+    def version(self, nombre: str):
+        if not self.cargado:
+            return None
+        return self.versiones.get(nombre, 0)
+
+    def publicar(self, nombre: str, version: int):
+        self.versiones[nombre] = max(self.versiones.get(nombre, 0), version)
+
+    async def refrescar(self, app):
+        async with db_connection(app) as conn:
+            rows = await fetch_all(conn, "versiones.leer")
+        versiones = {row["Name"]: row["Version"] for row in rows}
+        # nunca retrocede una versión que este worker ya publicó
+        for nombre, version in self.versiones.items():
+            versiones[nombre] = max(versiones.get(nombre, 0), version)
+        self.versiones = versiones
+        self.cargado = True
+
+    async def run(self, app):
+        while True:
+            try:
+                await self.refrescar(app)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error al refrescar las versiones de datos: {e}")
+            await asyncio.sleep(DATA_VERSION_REFRESH)
+
+
+data_versions = DataVersions()
+
+
+async def incrementar_version(conn, nombre: str) -> int:
+    """Sube la versión en la transacción del llamador y devuelve la nueva."""
+    result = await execute(conn, "versiones.incrementar", (nombre,))
+    return result.lastrowid
+
+
+def publicar_version(nombre: str, version: int):
+    """Llamar después del commit, para que este worker use la versión nueva de inmediato."""
+    data_versions.publicar(nombre, version)
+
+
+def etag_de(nombre: str):
+    version = data_versions.version(nombre)
+    if version is None:
+        # sin versiones cargadas no hay ETag confiable
+        return None
+    return f'"{nombre}-{version}"'
+
+
+def no_modificado(request: Request, etag) -> bool:
+    if etag is None:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    candidatos = [c.strip().removeprefix("W/") for c in header.split(",")]
+    return etag in candidatos
+
+
+def marcar_etag(response: Response, etag):
+    if etag is not None:
+        response.headers["ETag"] = etag
+        # el navegador guarda la respuesta pero revalida siempre con If-None-Match
+        response.headers["Cache-Control"] = "private, no-cache"
+
+
+def respuesta_304(etag) -> Response:
+    response = Response(status_code=304)
+    marcar_etag(response, etag)
+    return response
+
+
+def start_version_refresh(app):
+    app.state.versiones_task = asyncio.create_task(data_versions.run(app))
+
+
+async def stop_version_refresh(app):
+    task = getattr(app.state, "versiones_task", None)
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,180 @@
+import os
+from decimal import Decimal
+from queries import execute, execute_many, fetch_one, register_query
+
+"""
+Libro mayor de la wallet.
+
+El saldo vigente es PaymentMethod.WalletBalance de la fila 'wallet' del
+usuario y solo cambia con mover_saldo(), que en la misma transacción
+actualiza esa fila y agrega a WalletTransaction el movimiento con el
+saldo resultante (BalanceAfter). Leer el saldo es una sola fila, sin
+sumar el historial.
+
+Las deducciones son un único UPDATE con la condición de saldo suficiente
+en el WHERE: MySQL evalúa la condición con la fila ya bloqueada, así dos
+compras concurrentes no pueden pasar ambas la verificación y dejar la
+wallet en negativo. Si el UPDATE no afecta filas, no hubo cambios.
+
+Cada WALLET_SNAPSHOT_EVERY movimientos de un usuario se guarda una fila en
+WalletSnapshot; verificar() reconstruye el saldo desde la última y compara
+con el vigente, así la comprobación nunca recorre más que ese número de
+movimientos.
+"""
+
+WALLET_SNAPSHOT_EVERY = int(os.getenv("WALLET_SNAPSHOT_EVERY", 100))
+
+RECARGA = "recharge"
+DEDUCCION = "deduction"
+
+
+class WalletNoEncontrada(Exception):
+    """El usuario no tiene un método de pago de tipo 'wallet'."""
+
+
+class SaldoInsuficiente(Exception):
+    """La deducción dejaría la wallet en negativo."""
+
+
+register_query("wallet.acreditar", """
+    UPDATE PaymentMethod
+    SET WalletBalance = WalletBalance + %s
+    WHERE UserId = %s AND Type = 'wallet'
+    ORDER BY PaymentMethodId
+    LIMIT 1
+""")
+register_query("wallet.debitar", """
+    UPDATE PaymentMethod
+    SET WalletBalance = WalletBalance - %s
+    WHERE UserId = %s AND Type = 'wallet' AND WalletBalance >= %s
+    ORDER BY PaymentMethodId
+    LIMIT 1
+""")
+register_query("wallet.registrar_movimiento", """
+    INSERT INTO WalletTransaction (UserId, Type, Amount, BalanceAfter)
+    VALUES (%s, %s, %s, %s)
+""")
+# movimientos posteriores al último snapshot, en una sola consulta
+register_query("wallet.pendientes_snapshot", """
+    SELECT COUNT(*) AS movimientos
+    FROM WalletTransaction
+    WHERE UserId = %s AND TransactionId > (
+        SELECT COALESCE(MAX(TransactionId), 0) FROM WalletSnapshot WHERE UserId = %s
+    )
+""")
+register_query("wallet.ultimo_snapshot", """
+    SELECT TransactionId, Balance
+    FROM WalletSnapshot
+    WHERE UserId = %s
+    ORDER BY TransactionId DESC
+    LIMIT 1
+""")
+register_query("wallet.movimientos_desde", """
+    SELECT
+        COUNT(*) AS movimientos,
+        COALESCE(SUM(CASE WHEN Type = 'recharge' THEN Amount ELSE -Amount END), 0) AS neto
+    FROM WalletTransaction
+    WHERE UserId = %s AND TransactionId > %s
+""")
+register_query("wallet.guardar_snapshot", """
+    INSERT INTO WalletSnapshot (UserId, TransactionId, Balance) VALUES (%s, %s, %s)
+""")
+register_query("wallet.balance", """
+    SELECT WalletBalance
+    FROM PaymentMethod
+    WHERE UserId = %s AND Type = 'wallet'
+    ORDER BY PaymentMethodId
+    LIMIT 1
+""")
+
+
+async def saldo(conn, user_id: int):
+    """Saldo vigente de la wallet, None si el usuario no tiene una."""
+    row = await fetch_one(conn, "wallet.balance", (user_id,))
+    if not row:
+        return None
+    return Decimal(row["WalletBalance"] or 0)
+
+
+async def _snapshot_si_corresponde(conn, user_id: int, transaction_id: int, nuevo: Decimal):
+    pendientes = await fetch_one(conn, "wallet.pendientes_snapshot", (user_id, user_id))
+    if pendientes["movimientos"] >= WALLET_SNAPSHOT_EVERY:
+        await execute(conn, "wallet.guardar_snapshot", (user_id, transaction_id, nuevo))
+
+
+async def _sin_cambios(conn, user_id: int, monto: Decimal):
+    # el UPDATE no afectó filas: distingue wallet inexistente de saldo insuficiente
+    actual = await saldo(conn, user_id)
+    if actual is None:
+        raise WalletNoEncontrada(f"El usuario {user_id} no tiene wallet")
+    raise SaldoInsuficiente(f"Saldo {actual} insuficiente para descontar {monto}")
+
+
+async def mover_saldo(conn, user_id: int, tipo: str, monto) -> Decimal:
+    """
+    Recarga o descuenta monto de la wallet y devuelve el saldo nuevo.
+    Debe llamarse dentro de una transacción (db_connection(app, transaction=True)).
+    """
+    monto = Decimal(str(monto))
+    if tipo not in (RECARGA, DEDUCCION):
+        raise ValueError(f"Tipo de movimiento inválido: {tipo}")
+
+    # verificación y cambio en una sola sentencia; la fila queda bloqueada
+    # hasta el commit, los movimientos concurrentes del usuario esperan
+    if tipo == RECARGA:
+        result = await execute(conn, "wallet.acreditar", (monto, user_id))
+    else:
+        result = await execute(conn, "wallet.debitar", (monto, user_id, monto))
+    if result.rowcount == 0:
+        await _sin_cambios(conn, user_id, monto)
+
+    # con la fila bloqueada por esta transacción la lectura ve el saldo recién escrito
+    nuevo = await saldo(conn, user_id)
+    result = await execute(conn, "wallet.registrar_movimiento", (user_id, tipo, monto, nuevo))
+    await _snapshot_si_corresponde(conn, user_id, result.lastrowid, nuevo)
+    return nuevo
+
+
+async def descontar_varios(conn, user_id: int, montos) -> Decimal:
+    """
+    Descuenta la suma de montos con un único UPDATE condicionado y registra
+    un movimiento por monto con un INSERT multi-fila. Todo o nada: si el
+    total no alcanza no se descuenta ninguno. Devuelve el saldo nuevo.
+    """
+    montos = [Decimal(str(monto)) for monto in montos]
+    total = sum(montos, Decimal(0))
+    result = await execute(conn, "wallet.debitar", (total, user_id, total))
+    if result.rowcount == 0:
+        await _sin_cambios(conn, user_id, total)
+
+    nuevo = await saldo(conn, user_id)
+    # saldo después de cada movimiento, en el orden en que se insertan
+    saldos = []
+    restante = nuevo + total
+    for monto in montos:
+        restante -= monto
+        saldos.append(restante)
+    result = await execute_many(
+        conn, "wallet.registrar_movimiento",
+        [(user_id, DEDUCCION, monto, despues) for monto, despues in zip(montos, saldos)]
+    )
+    # lastrowid de un INSERT multi-fila es el id de la primera fila
+    await _snapshot_si_corresponde(conn, user_id, result.lastrowid, saldos[0])
+    return nuevo
+
+
+async def verificar(conn, user_id: int) -> dict:
+    """Reconstruye el saldo desde el último snapshot y lo compara con el vigente."""
+    vigente = await saldo(conn, user_id)
+    ultimo = await fetch_one(conn, "wallet.ultimo_snapshot", (user_id,))
+    desde = ultimo["TransactionId"] if ultimo else 0
+    base = Decimal(ultimo["Balance"]) if ultimo else Decimal(0)
+    pendientes = await fetch_one(conn, "wallet.movimientos_desde", (user_id, desde))
+    reconstruido = base + Decimal(pendientes["neto"])
+    return {
+        "saldo": vigente,
+        "reconstruido": reconstruido,
+        "snapshot_transaction_id": desde,
+        "movimientos_repetidos": pendientes["movimientos"],
+        "consistente": vigente is not None and vigente == reconstruido,
+    }
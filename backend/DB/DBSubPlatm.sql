@@ -16,7 +16,11 @@ CREATE TABLE User(
     ConfirmedEmail VARCHAR(20) DEFAULT 'no' CHECK(ConfirmedEmail IN ('yes','no'))NOT NULL,
     Username VARCHAR(20) NOT NULL UNIQUE,
     ConfirmationCode VARCHAR(64),
-    RegisterDate DATETIME DEFAULT CURRENT_TIMESTAMP
+    RegisterDate DATETIME DEFAULT CURRENT_TIMESTAMP,
+    -- listado paginado por UserId con filtros de estado/rol y búsqueda por prefijo de nombre
+    INDEX IX_User_AccountStatus_Rol (AccountStatus, Rol),
+    INDEX IX_User_Rol (Rol),
+    INDEX IX_User_Name (Name)
 );
 
 -- ALTER TABLE User CHANGE User Username VARCHAR(20) NOT NULL UNIQUE;
@@ -26,7 +30,9 @@ CREATE TABLE Service(
 	ServiceId INT PRIMARY KEY AUTO_INCREMENT,
     Name VARCHAR(150) NOT NULL,
     Category VARCHAR(50) NOT NULL,
-    Description VARCHAR(250)
+    Description VARCHAR(250),
+    INDEX IX_Service_Category (Category),
+    INDEX IX_Service_Name (Name)
 );
 
 CREATE TABLE Plan(
@@ -34,6 +40,7 @@ CREATE TABLE Plan(
     ServiceId INT NOT NULL,
     Type VARCHAR(20) CHECK (Type IN ('monthly','annual')) NOT NULL,
     Price DECIMAL(10,2) NOT NULL,
+    INDEX IX_Plan_ServiceId_Type (ServiceId, Type),
     CONSTRAINT FK_Service_Plan FOREIGN KEY (ServiceId) REFERENCES Service(ServiceId)
 );
 
@@ -46,6 +53,13 @@ CREATE TABLE Subscription(
     Status VARCHAR(20) DEFAULT 'active' CHECK (Status IN ('active','cancelled','expired')),
     AmountPaid DECIMAL(10,2) NOT NULL,
     PaymentMethod VARCHAR(20) CHECK (PaymentMethod IN ('card','cash','wallet')) NOT NULL,
+    -- filtros del listado de administración: estado + rango de vencimiento/inicio y plan + estado
+    INDEX IX_Subscription_Status_EndDate (Status, EndDate),
+    INDEX IX_Subscription_EndDate (EndDate),
+    INDEX IX_Subscription_StartDate (StartDate),
+    INDEX IX_Subscription_PlanId_Status (PlanId, Status),
+    -- historial y gastos de un usuario
+    INDEX IX_Subscription_UserId_StartDate (UserId, StartDate),
     CONSTRAINT FK_User_Subscription FOREIGN KEY (UserId) REFERENCES User(UserId),
     CONSTRAINT FK_Plan_Subscription FOREIGN KEY (PlanId) REFERENCES Plan(PlanId)
 );
@@ -58,6 +72,7 @@ CREATE TABLE PaymentMethod(
     CardHolder VARCHAR(150),
     ExpiryDate VARCHAR(7),
     WalletBalance DECIMAL(10,2) DEFAULT 0,
+    INDEX IX_PaymentMethod_UserId_Type (UserId, Type),
     CONSTRAINT FK_User_PaymentMethod FOREIGN KEY (UserId) REFERENCES User(UserId)
 );
 
@@ -67,9 +82,23 @@ CREATE TABLE WalletTransaction(
     Type VARCHAR(20) CHECK (Type IN ('recharge','deduction')) NOT NULL,
     Amount DECIMAL(10,2) NOT NULL,
     TransactionDate DATETIME DEFAULT CURRENT_TIMESTAMP,
+    BalanceAfter DECIMAL(10,2),  -- saldo de la wallet después del movimiento
+    INDEX IX_WalletTransaction_UserId_Type_Date (UserId, Type, TransactionDate),
+    INDEX IX_WalletTransaction_UserId_Date (UserId, TransactionDate),
+    INDEX IX_WalletTransaction_UserId_Id (UserId, TransactionId),
     CONSTRAINT FK_User_WalletTransaction FOREIGN KEY (UserId) REFERENCES User(UserId)
 );
 
+-- Saldo de la wallet cada cierto número de movimientos, punto de partida para verificarlo
+CREATE TABLE WalletSnapshot(
+    UserId INT NOT NULL,
+    TransactionId INT NOT NULL,
+    Balance DECIMAL(10,2) NOT NULL,
+    CreatedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (UserId, TransactionId),
+    CONSTRAINT FK_User_WalletSnapshot FOREIGN KEY (UserId) REFERENCES User(UserId)
+);
+
 CREATE TABLE Notification(
     NotificationId INT PRIMARY KEY AUTO_INCREMENT,
     UserId INT NOT NULL,
@@ -80,6 +109,85 @@ CREATE TABLE Notification(
     CONSTRAINT FK_User_Notification FOREIGN KEY (UserId) REFERENCES User(UserId)
 );
 
+-- Avance de los jobs del scheduler, permite reanudar una ejecución interrumpida
+CREATE TABLE JobCheckpoint(
+    JobName VARCHAR(50) NOT NULL,
+    TargetDate DATE NOT NULL,
+    LastId INT NOT NULL DEFAULT 0,
+    Processed INT NOT NULL DEFAULT 0,
+    Finished VARCHAR(3) DEFAULT 'no' CHECK (Finished IN ('yes','no')) NOT NULL,
+    UpdatedAt DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (JobName, TargetDate)
+);
+
+-- Outbox transaccional de correos, se escribe en la misma transacción que la fila de negocio
+CREATE TABLE EmailOutbox(
+    OutboxId BIGINT PRIMARY KEY AUTO_INCREMENT,
+    Recipient VARCHAR(150) NOT NULL,
+    Subject VARCHAR(250) NOT NULL,
+    TemplateName VARCHAR(100) NOT NULL,
+    Context JSON NOT NULL,
+    Status VARCHAR(20) DEFAULT 'pending' CHECK (Status IN ('pending','sending','sent','failed')) NOT NULL,
+    Attempts INT NOT NULL DEFAULT 0,
+    NextAttemptAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    ClaimedAt DATETIME,
+    SentAt DATETIME,
+    LastError VARCHAR(250),
+    CreatedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX IX_EmailOutbox_Status_Next (Status, NextAttemptAt)
+);
+
+-- Tokens de sesión revocados: un Jti concreto (logout) o todos los de un usuario hasta RevokedAt
+CREATE TABLE TokenRevocation(
+    RevocationId INT PRIMARY KEY AUTO_INCREMENT,
+    Jti VARCHAR(32),
+    UserId INT NOT NULL,
+    RevokedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    ExpiresAt DATETIME NOT NULL,
+    INDEX IX_TokenRevocation_ExpiresAt (ExpiresAt),
+    CONSTRAINT FK_User_TokenRevocation FOREIGN KEY (UserId) REFERENCES User(UserId)
+);
+
+
+-- Tablas resumen del panel de control, se actualizan en la misma transacción que
+-- la suscripción o el usuario (ver backend/API/metricas.py). Cada contador se reparte
+-- en varias filas (Slot) para no serializar las escrituras concurrentes en una sola.
+CREATE TABLE ServiceSubscriptionStats(
+    ServiceId INT NOT NULL,
+    Slot TINYINT NOT NULL,
+    Subscriptions INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (ServiceId, Slot),
+    CONSTRAINT FK_Service_ServiceSubscriptionStats FOREIGN KEY (ServiceId) REFERENCES Service(ServiceId)
+);
+
+CREATE TABLE MonthlyRevenue(
+    Month CHAR(7) NOT NULL,  -- YYYY-MM de StartDate
+    Slot TINYINT NOT NULL,
+    Revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    Subscriptions INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Month, Slot)
+);
+
+CREATE TABLE SubscriptionStatusCount(
+    Status VARCHAR(20) NOT NULL,
+    Slot TINYINT NOT NULL,
+    Total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Status, Slot)
+);
+
+CREATE TABLE MetricCounter(
+    Name VARCHAR(50) NOT NULL,
+    Slot TINYINT NOT NULL,
+    Value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Name, Slot)
+);
+
+-- Versión de los listados que cambian poco (catálogo de servicios), base de los ETag
+CREATE TABLE DataVersion(
+    Name VARCHAR(50) PRIMARY KEY,
+    Version BIGINT NOT NULL DEFAULT 0
+);
+
 
 -- Insertar datos en la tabla User
 -- Nota: las contraseñas de usuario son test para todos
@@ -190,6 +298,34 @@ INSERT INTO Notification (UserId, Message, Type, NotificationDate, ReadStatus) V
 (9, 'Tu suscripción a Zoom Pro expira en 5 días', 'expiration', '2024-03-15 12:00:00', 'no'),
 (10, 'Bienvenido a Adobe Creative Cloud', 'other', '2024-01-05 14:16:00', 'yes');
 
+-- Tablas resumen a partir de los datos de ejemplo (equivalente a python -m metricas)
+INSERT INTO ServiceSubscriptionStats (ServiceId, Slot, Subscriptions)
+SELECT p.ServiceId, 0, COUNT(*) FROM Subscription AS sub JOIN Plan AS p ON sub.PlanId = p.PlanId GROUP BY p.ServiceId;
+INSERT INTO MonthlyRevenue (Month, Slot, Revenue, Subscriptions)
+SELECT DATE_FORMAT(StartDate, '%Y-%m'), 0, SUM(AmountPaid), COUNT(*) FROM Subscription GROUP BY DATE_FORMAT(StartDate, '%Y-%m');
+INSERT INTO SubscriptionStatusCount (Status, Slot, Total)
+SELECT Status, 0, COUNT(*) FROM Subscription WHERE Status IS NOT NULL GROUP BY Status;
+INSERT INTO MetricCounter (Name, Slot, Value)
+SELECT 'users', 0, COUNT(*) FROM `User`;
+
+-- Saldo de cada movimiento de ejemplo hacia atrás desde el saldo vigente y snapshot
+-- inicial (igual que la migración 003_wallet_ledger)
+UPDATE WalletTransaction AS wt
+JOIN (
+    SELECT TransactionId,
+        COALESCE(SUM(CASE WHEN Type = 'recharge' THEN Amount ELSE -Amount END)
+            OVER (PARTITION BY UserId ORDER BY TransactionId ROWS BETWEEN 1 FOLLOWING AND UNBOUNDED FOLLOWING), 0) AS Posterior
+    FROM WalletTransaction
+) AS mov ON mov.TransactionId = wt.TransactionId
+JOIN PaymentMethod AS pm ON pm.UserId = wt.UserId AND pm.Type = 'wallet'
+SET wt.BalanceAfter = pm.WalletBalance - mov.Posterior;
+INSERT INTO WalletSnapshot (UserId, TransactionId, Balance)
+SELECT wt.UserId, wt.TransactionId, wt.BalanceAfter
+FROM WalletTransaction AS wt
+JOIN (SELECT UserId, MAX(TransactionId) AS TransactionId FROM WalletTransaction GROUP BY UserId) AS ultimo
+    ON ultimo.TransactionId = wt.TransactionId
+WHERE wt.BalanceAfter IS NOT NULL;
+
 
 
 -- SELECT * FROM USER;
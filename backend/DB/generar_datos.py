@@ -0,0 +1,433 @@
+"""
+Generador de datos sintéticos para el esquema de DBSubPlatm.sql.
+
+Con --escala N se generan N x 10.000 usuarios con sus métodos de pago,
+suscripciones, movimientos de wallet (con BalanceAfter y snapshots) y
+notificaciones, todo referencialmente consistente:
+  - la popularidad de los servicios sigue una distribución de Zipf;
+  - las altas de usuarios se concentran en los meses recientes;
+  - las suscripciones empiezan después del registro y su estado depende
+    de si ya vencieron;
+  - cada suscripción pagada con wallet es una deducción del libro mayor y
+    el saldo nunca queda negativo (se recarga antes si no alcanza);
+  - un 1% de usuarios intensivos acumula varias veces más historial.
+Escala 1 son unas 160.000 filas; escala 100, unos 16 millones.
+
+Las filas se escriben en archivos TSV, uno por tabla, junto con cargar.sql,
+que los carga con LOAD DATA LOCAL INFILE y recalcula las tablas resumen del
+panel de control. Todos los usuarios tienen la contraseña "test" y el primero
+generado es administrador.
+
+Uso (desde backend/DB):
+    python generar_datos.py --escala 10 --salida datos
+    mysql --local-infile=1 -h HOST -u USER -p SubscriptionPlatform < datos/cargar.sql
+
+    # o generar a continuación de los ids existentes y cargar directamente
+    # (usa DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME de backend/API/.env)
+    python generar_datos.py --escala 10 --salida datos --cargar
+
+El servidor debe tener local_infile=ON. Sin --cargar los ids empiezan en 1:
+cargar en una base con el esquema recién creado y sin los datos de ejemplo.
+"""
+import argparse
+import bisect
+import calendar
+import math
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+USUARIOS_POR_ESCALA = 10_000
+DIAS_HISTORIA = 3 * 365
+# mismo intervalo que wallet.py, así verificar() encuentra sus snapshots
+WALLET_SNAPSHOT_EVERY = int(os.getenv("WALLET_SNAPSHOT_EVERY", 100))
+# hash bcrypt de "test", igual que los datos de ejemplo
+PASSWORD_TEST = "$2a$12$qrSpR.YfjJjnr.xXMzhkFOcP/hOcrT.JM09Jetoj0pdAcHMu.uGiG"
+
+# orden de carga: cada tabla después de las que referencia
+COLUMNAS = {
+    "User": ("UserId", "Name", "Email", "Rol", "SessionStatus", "AccountStatus", "Password",
+             "ConfirmedEmail", "Username", "ConfirmationCode", "RegisterDate"),
+    "Service": ("ServiceId", "Name", "Category", "Description"),
+    "Plan": ("PlanId", "ServiceId", "Type", "Price"),
+    "PaymentMethod": ("PaymentMethodId", "UserId", "Type", "CardNumber", "CardHolder", "ExpiryDate", "WalletBalance"),
+    "Subscription": ("SubscriptionId", "UserId", "PlanId", "StartDate", "EndDate", "Status", "AmountPaid", "PaymentMethod"),
+    "WalletTransaction": ("TransactionId", "UserId", "Type", "Amount", "TransactionDate", "BalanceAfter"),
+    "WalletSnapshot": ("UserId", "TransactionId", "Balance", "CreatedAt"),
+    "Notification": ("NotificationId", "UserId", "Message", "Type", "NotificationDate", "ReadStatus"),
+}
+# columna autoincremental de cada tabla, para continuar después de los ids existentes
+IDS = {
+    "User": "UserId",
+    "Service": "ServiceId",
+    "Plan": "PlanId",
+    "PaymentMethod": "PaymentMethodId",
+    "Subscription": "SubscriptionId",
+    "WalletTransaction": "TransactionId",
+    "Notification": "NotificationId",
+}
+
+CATEGORIAS = {
+    "Streaming": 30, "Música": 20, "Productividad": 12, "Software": 10,
+    "Educación": 10, "Juegos": 8, "Noticias": 5, "Fitness": 5,
+}
+MARCAS = ["Nova", "Prime", "Flux", "Orbit", "Pulse", "Zen", "Vibe", "Atlas", "Echo", "Luma", "Peak", "Quanta"]
+NOMBRES = ["Juan", "María", "Carlos", "Ana", "Luis", "Sofía", "Jorge", "Carmen", "Pedro", "Lucía",
+           "Diego", "Valeria", "Roberto", "Andrea", "Miguel", "Paula", "José", "Daniela", "Fernando", "Isabel"]
+APELLIDOS = ["Pérez", "García", "López", "Martínez", "Hernández", "González", "Rodríguez", "Silva",
+             "Vargas", "Ramírez", "Torres", "Flores", "Castillo", "Morales", "Ortiz", "Reyes"]
+
+NULO = "\\N"
+
+
+def _monto(centavos: int) -> str:
+    return f"{centavos // 100}.{centavos % 100:02d}"
+
+
+def _sumar_meses(fecha: datetime, meses: int) -> datetime:
+    mes = fecha.month - 1 + meses
+    anio = fecha.year + mes // 12
+    mes = mes % 12 + 1
+    return fecha.replace(year=anio, month=mes, day=min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+def _elegir(rnd, pesos_acumulados: list) -> int:
+    """Índice elegido con probabilidad proporcional a su peso."""
+    return bisect.bisect_right(pesos_acumulados, rnd.random() * pesos_acumulados[-1])
+
+
+class Tabla:
+    """Archivo TSV de una tabla, escrito por bloques."""
+
+    def __init__(self, directorio: str, nombre: str):
+        self.nombre = nombre
+        self.ruta = os.path.abspath(os.path.join(directorio, f"{nombre}.tsv"))
+        self._archivo = open(self.ruta, "w", encoding="utf-8", newline="\n")
+        self._buffer = []
+        self.filas = 0
+
+    def fila(self, *valores):
+        self._buffer.append("\t".join(valores))
+        self.filas += 1
+        if len(self._buffer) >= 10_000:
+            self._vaciar()
+
+    def _vaciar(self):
+        if self._buffer:
+            self._archivo.write("\n".join(self._buffer) + "\n")
+            self._buffer = []
+
+    def cerrar(self):
+        self._vaciar()
+        self._archivo.close()
+
+
+class Generador:
+
+    def __init__(self, args, ids_iniciales: dict):
+        self.rnd = random.Random(args.semilla)
+        self.args = args
+        self.ahora = datetime.now().replace(microsecond=0)
+        self.siguiente = {tabla: ids_iniciales.get(tabla, 0) + 1 for tabla in IDS}
+        self.tablas = {nombre: Tabla(args.salida, nombre) for nombre in COLUMNAS}
+
+    def _id(self, tabla: str) -> int:
+        valor = self.siguiente[tabla]
+        self.siguiente[tabla] += 1
+        return valor
+
+    def _fecha_entre(self, desde: datetime, hasta: datetime) -> datetime:
+        segundos = max(int((hasta - desde).total_seconds()), 0)
+        return desde + timedelta(seconds=self.rnd.randint(0, segundos))
+
+    def catalogo(self, n_servicios: int):
+        """Servicios con un plan mensual y uno anual; devuelve los planes por popularidad."""
+        rnd = self.rnd
+        categorias = list(CATEGORIAS)
+        pesos_categoria = []
+        acumulado = 0
+        for categoria in categorias:
+            acumulado += CATEGORIAS[categoria]
+            pesos_categoria.append(acumulado)
+
+        self.planes = []  # (PlanId mensual, centavos, PlanId anual, centavos, nombre)
+        for _ in range(n_servicios):
+            service_id = self._id("Service")
+            categoria = categorias[_elegir(rnd, pesos_categoria)]
+            nombre = f"{rnd.choice(MARCAS)} {categoria} {service_id}"
+            self.tablas["Service"].fila(
+                str(service_id), nombre, categoria, f"Servicio de {categoria.lower()} por suscripción"
+            )
+            mensual = rnd.randint(2, 50) * 100 - 1
+            anual = mensual * rnd.choice((10, 11, 12)) - rnd.choice((0, 1, 12))
+            plan_mensual = self._id("Plan")
+            plan_anual = self._id("Plan")
+            self.tablas["Plan"].fila(str(plan_mensual), str(service_id), "monthly", _monto(mensual))
+            self.tablas["Plan"].fila(str(plan_anual), str(service_id), "annual", _monto(anual))
+            self.planes.append((plan_mensual, mensual, plan_anual, anual, nombre))
+
+        # Zipf: el servicio en la posición k tiene peso 1 / k^s
+        self.popularidad = []
+        acumulado = 0.0
+        for k in range(1, n_servicios + 1):
+            acumulado += 1 / k ** self.args.zipf
+            self.popularidad.append(acumulado)
+
+    def usuario(self, primero: bool):
+        rnd = self.rnd
+        tablas = self.tablas
+        user_id = self._id("User")
+        # random() ** 0.5 se concentra cerca de 1: más registros recientes
+        registro = self.ahora - timedelta(seconds=int(DIAS_HISTORIA * 86400 * (1 - rnd.random() ** 0.5)))
+        nombre = f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}"
+        confirmado = primero or rnd.random() < 0.92
+        tablas["User"].fila(
+            str(user_id), nombre, f"usuario{user_id}@datos.local",
+            "administrator" if primero or rnd.random() < 0.001 else "user",
+            "active" if rnd.random() < 0.3 else "inactive",
+            "active" if primero else rnd.choices(("active", "deactivated", "deleted"), (94, 4, 2))[0],
+            PASSWORD_TEST,
+            "yes" if confirmado else "no",
+            f"u{user_id}",
+            NULO if confirmado else f"{rnd.getrandbits(32):08X}",
+            str(registro),
+        )
+
+        intensivo = rnd.random() < 0.01
+        factor = 20 if intensivo else 1
+        n_suscripciones = int(rnd.expovariate(1 / self.args.suscripciones) * factor)
+        n_movimientos = int(rnd.expovariate(1 / self.args.movimientos) * factor)
+
+        eventos = []  # (fecha, tipo, centavos) de la wallet
+        metodos_usados = set()
+        for _ in range(n_suscripciones):
+            plan_mensual, mensual, plan_anual, anual, servicio = self.planes[_elegir(rnd, self.popularidad)]
+            es_anual = rnd.random() < 0.25
+            plan_id, precio = (plan_anual, anual) if es_anual else (plan_mensual, mensual)
+            inicio = self._fecha_entre(registro, self.ahora)
+            fin = _sumar_meses(inicio, 12 if es_anual else 1)
+            if fin < self.ahora:
+                estado = "expired" if rnd.random() < 0.85 else "cancelled"
+            else:
+                estado = "active" if rnd.random() < 0.92 else "cancelled"
+            metodo = rnd.choices(("card", "wallet", "cash"), (55, 30, 15))[0]
+            metodos_usados.add(metodo)
+            tablas["Subscription"].fila(
+                str(self._id("Subscription")), str(user_id), str(plan_id), str(inicio), str(fin),
+                estado, _monto(precio), metodo,
+            )
+            if metodo == "wallet":
+                eventos.append((inicio, "deduction", precio))
+            self._notificaciones(user_id, servicio, precio, inicio, fin, estado)
+
+        for _ in range(n_movimientos):
+            fecha = self._fecha_entre(registro, self.ahora)
+            if rnd.random() < 0.6:
+                eventos.append((fecha, "recharge", rnd.choice((10, 20, 25, 50, 100, 200)) * 100))
+            else:
+                eventos.append((fecha, "deduction", rnd.randint(100, 6000)))
+
+        saldo = self._movimientos(user_id, eventos)
+
+        if "card" in metodos_usados or rnd.random() < 0.6:
+            tablas["PaymentMethod"].fila(
+                str(self._id("PaymentMethod")), str(user_id), "card",
+                "".join(str(rnd.randint(0, 9)) for _ in range(16)), nombre,
+                f"{rnd.randint(1, 12):02d}/{self.ahora.year + rnd.randint(1, 5)}", "0.00",
+            )
+        if "cash" in metodos_usados or rnd.random() < 0.2:
+            tablas["PaymentMethod"].fila(
+                str(self._id("PaymentMethod")), str(user_id), "cash", NULO, NULO, NULO, "0.00",
+            )
+        # el registro siempre crea la wallet
+        tablas["PaymentMethod"].fila(
+            str(self._id("PaymentMethod")), str(user_id), "wallet", NULO, NULO, NULO, _monto(saldo),
+        )
+
+    def _movimientos(self, user_id: int, eventos: list) -> int:
+        """Libro mayor en orden cronológico; devuelve el saldo final en centavos."""
+        rnd = self.rnd
+        transacciones = self.tablas["WalletTransaction"]
+        eventos.sort()
+        saldo = 0
+        cantidad = 0
+
+        def registrar(fecha, tipo, centavos):
+            nonlocal saldo, cantidad
+            saldo += centavos if tipo == "recharge" else -centavos
+            transaction_id = self._id("WalletTransaction")
+            transacciones.fila(
+                str(transaction_id), str(user_id), tipo, _monto(centavos), str(fecha), _monto(saldo)
+            )
+            cantidad += 1
+            if cantidad % WALLET_SNAPSHOT_EVERY == 0:
+                self.tablas["WalletSnapshot"].fila(str(user_id), str(transaction_id), _monto(saldo), str(fecha))
+
+        for fecha, tipo, centavos in eventos:
+            if tipo == "deduction" and centavos > saldo:
+                # nadie paga sin saldo: recarga redondeada hacia arriba un rato antes
+                faltante = centavos - saldo
+                recarga = (math.ceil(faltante / 1000) + rnd.randint(0, 5)) * 1000
+                registrar(fecha - timedelta(minutes=rnd.randint(1, 120)), "recharge", recarga)
+            registrar(fecha, tipo, centavos)
+        return saldo
+
+    def _notificaciones(self, user_id, servicio, precio, inicio, fin, estado):
+        rnd = self.rnd
+        notificaciones = self.tablas["Notification"]
+
+        def agregar(mensaje, tipo, fecha):
+            notificaciones.fila(
+                str(self._id("Notification")), str(user_id), mensaje, tipo, str(fecha),
+                "yes" if rnd.random() < 0.6 else "no",
+            )
+
+        if rnd.random() < 0.6:
+            agregar(f"Pago confirmado por ${_monto(precio)} para {servicio}", "payment_confirmation",
+                    inicio + timedelta(minutes=1))
+        aviso = fin - timedelta(days=3)
+        if aviso < self.ahora and rnd.random() < 0.7:
+            agregar(f"Tu suscripción a {servicio} expira en 3 días", "expiration", aviso)
+        if estado == "cancelled" and rnd.random() < 0.5:
+            agregar(f"Suscripción a {servicio} cancelada exitosamente", "other",
+                    self._fecha_entre(inicio, min(fin, self.ahora)))
+
+    def cerrar(self):
+        for tabla in self.tablas.values():
+            tabla.cerrar()
+
+
+def script_carga(tablas: dict) -> str:
+    """cargar.sql: LOAD DATA de cada archivo y recálculo de las tablas resumen."""
+    lineas = [
+        "-- Generado por generar_datos.py",
+        "SET FOREIGN_KEY_CHECKS = 0;",
+        "SET UNIQUE_CHECKS = 0;",
+    ]
+    for nombre, tabla in tablas.items():
+        ruta = tabla.ruta.replace("\\", "/")
+        lineas.append(
+            f"LOAD DATA LOCAL INFILE '{ruta}' INTO TABLE `{nombre}` CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(COLUMNAS[nombre])});"
+        )
+    lineas += [
+        "SET UNIQUE_CHECKS = 1;",
+        "SET FOREIGN_KEY_CHECKS = 1;",
+        "-- Tablas resumen recalculadas desde las tablas base (igual que python -m metricas)",
+        "START TRANSACTION;",
+        "DELETE FROM ServiceSubscriptionStats;",
+        "DELETE FROM MonthlyRevenue;",
+        "DELETE FROM SubscriptionStatusCount;",
+        "DELETE FROM MetricCounter;",
+        "INSERT INTO ServiceSubscriptionStats (ServiceId, Slot, Subscriptions) "
+        "SELECT p.ServiceId, 0, COUNT(*) FROM Subscription AS sub JOIN Plan AS p ON sub.PlanId = p.PlanId GROUP BY p.ServiceId;",
+        "INSERT INTO MonthlyRevenue (Month, Slot, Revenue, Subscriptions) "
+        "SELECT DATE_FORMAT(StartDate, '%Y-%m'), 0, SUM(AmountPaid), COUNT(*) FROM Subscription GROUP BY DATE_FORMAT(StartDate, '%Y-%m');",
+        "INSERT INTO SubscriptionStatusCount (Status, Slot, Total) "
+        "SELECT Status, 0, COUNT(*) FROM Subscription WHERE Status IS NOT NULL GROUP BY Status;",
+        "INSERT INTO MetricCounter (Name, Slot, Value) SELECT 'users', 0, COUNT(*) FROM `User`;",
+        "COMMIT;",
+        "-- el catálogo cambió: los ETag de /admin/servicios dejan de valer",
+        "INSERT INTO DataVersion (Name, Version) VALUES ('servicios', 1) ON DUPLICATE KEY UPDATE Version = Version + 1;",
+        "ANALYZE TABLE `User`, Service, Plan, PaymentMethod, Subscription, WalletTransaction, WalletSnapshot, Notification;",
+    ]
+    return "\n".join(lineas) + "\n"
+
+
+def _conectar():
+    import pymysql
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "API", ".env"))
+    except ImportError:
+        pass
+    return pymysql.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+        charset="utf8mb4",
+        local_infile=True,
+        autocommit=True,
+    )
+
+
+def ids_existentes(conn) -> dict:
+    with conn.cursor() as cursor:
+        resultado = {}
+        for tabla, columna in IDS.items():
+            cursor.execute(f"SELECT COALESCE(MAX({columna}), 0) FROM `{tabla}`")
+            resultado[tabla] = cursor.fetchone()[0]
+    return resultado
+
+
+def cargar(conn, script: str):
+    with conn.cursor() as cursor:
+        for sentencia in script.split(";\n"):
+            lineas = [linea for linea in sentencia.splitlines() if not linea.startswith("--")]
+            sentencia = "\n".join(lineas).strip()
+            if not sentencia:
+                continue
+            inicio = time.perf_counter()
+            cursor.execute(sentencia)
+            if sentencia.startswith("LOAD DATA"):
+                tabla = sentencia.split("INTO TABLE ")[1].split()[0]
+                duracion = time.perf_counter() - inicio
+                print(f"  {tabla:22} {cursor.rowcount:>12,} filas en {duracion:7.1f}s "
+                      f"({cursor.rowcount / duracion if duracion else 0:,.0f} filas/s)")
+            elif sentencia.startswith("ANALYZE"):
+                cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Datos sintéticos para SubscriptionPlatform")
+    parser.add_argument("--escala", type=float, default=1, help=f"x {USUARIOS_POR_ESCALA} usuarios")
+    parser.add_argument("--salida", default="datos", help="directorio de los TSV y cargar.sql")
+    parser.add_argument("--servicios", type=int, help="servicios del catálogo (por defecto 100 x raíz de la escala)")
+    parser.add_argument("--suscripciones", type=float, default=3, help="suscripciones promedio por usuario")
+    parser.add_argument("--movimientos", type=float, default=4, help="movimientos de wallet promedio por usuario")
+    parser.add_argument("--zipf", type=float, default=1.1, help="exponente de popularidad de los servicios")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--cargar", action="store_true", help="continúa los ids de la base y carga los archivos")
+    args = parser.parse_args()
+
+    os.makedirs(args.salida, exist_ok=True)
+    conn = _conectar() if args.cargar else None
+    try:
+        ids = ids_existentes(conn) if conn else {}
+        generador = Generador(args, ids)
+        n_usuarios = int(USUARIOS_POR_ESCALA * args.escala)
+        n_servicios = args.servicios or max(20, int(100 * math.sqrt(args.escala)))
+
+        inicio = time.perf_counter()
+        generador.catalogo(n_servicios)
+        for i in range(n_usuarios):
+            generador.usuario(primero=i == 0)
+            if (i + 1) % 100_000 == 0:
+                print(f"  {i + 1:,} usuarios generados")
+        generador.cerrar()
+        duracion = time.perf_counter() - inicio
+        total = sum(tabla.filas for tabla in generador.tablas.values())
+        for nombre, tabla in generador.tablas.items():
+            print(f"{nombre:22} {tabla.filas:>12,}")
+        print(f"{total:,} filas generadas en {duracion:.1f}s ({total / duracion:,.0f} filas/s)")
+
+        script = script_carga(generador.tablas)
+        ruta_script = os.path.join(args.salida, "cargar.sql")
+        with open(ruta_script, "w", encoding="utf-8") as f:
+            f.write(script)
+        print(f"Script de carga: {ruta_script}")
+
+        if conn:
+            inicio = time.perf_counter()
+            cargar(conn, script)
+            print(f"Carga terminada en {time.perf_counter() - inicio:.1f}s")
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
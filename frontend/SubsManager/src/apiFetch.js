@@ -0,0 +1,11 @@
+// fetch que agrega el token de sesión en la cabecera Authorization
+export default function apiFetch(url, options = {}) {
+  const token = sessionStorage.getItem('token');
+  return fetch(url, {
+    ...options,
+    headers: {
+      ...(options.headers || {}),
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+  });
+}
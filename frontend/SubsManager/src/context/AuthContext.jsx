@@ -1,4 +1,6 @@
 import { createContext, useState, useContext } from "react";
+import url_fetch from "../enviroment";
+import apiFetch from "../apiFetch";
 
 const AuthContext = createContext();
 
@@ -10,6 +12,9 @@ export function AuthProvider({ children }) {
   };
 
   const logout = () => {
+    // revoca el token en el backend, sin esperar la respuesta
+    apiFetch(`${url_fetch}/logout`, { method: "POST" }).catch(() => {});
+    sessionStorage.removeItem("token");
     setUser(null);
   };
 
@@ -41,7 +41,7 @@ export default function Login() {
 
             if (response.ok) {
                 const data = await response.json();
-                sessionStorage.setItem('token', data.user_id);
+                sessionStorage.setItem('token', data.token);
 
                 // Actualiza el contexto de autenticación
                 login({ id: data.user_id, role: data.user_rol, name: data.user_name, email: data.user_email, username: data.user_username });
@@ -4,6 +4,7 @@ import { ResponsiveBar } from "@nivo/bar";
 import { ResponsivePie } from "@nivo/pie";
 import { ResponsiveLine } from "@nivo/line";
 import url_fetch from "../../enviroment";
+import apiFetch from "../../apiFetch";
 
 export default function AdminDashboard() {
   const [userCount, setUserCount] = useState(0);
@@ -15,7 +16,7 @@ export default function AdminDashboard() {
   useEffect(() => {
     const fetchMetrics = async () => {
       try {
-        const response = await fetch(`${url_fetch}/admin/metricas`);
+        const response = await apiFetch(`${url_fetch}/admin/metricas`);
         const data = await response.json();
 
         setUserCount(data.total_users || 0);
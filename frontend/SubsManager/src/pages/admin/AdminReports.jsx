@@ -1,6 +1,7 @@
 import DashboardLayout from "../../components/DashboardLayout";
 import { FiUser, FiLayers, FiDollarSign, FiDownload } from "react-icons/fi";
 import { BsFillBarChartFill } from "react-icons/bs";
+import apiFetch from "../../apiFetch";
 
 export default function AdminReports() {
   // Datos simulados
@@ -43,7 +44,7 @@ export default function AdminReports() {
   const generateUserReport = async () => {
   try {
     // Hacer la solicitud GET al endpoint de backend
-    const response = await fetch("http://localhost:8000/admin/reportes/suscripciones-por-usuario");
+    const response = await apiFetch("http://localhost:8000/admin/reportes/suscripciones-por-usuario");
     
     // Verificar si la solicitud fue exitosa
     if (!response.ok) {
@@ -127,7 +128,7 @@ export default function AdminReports() {
 const generateCategoryReport = async () => {
   try {
     // Hacer la solicitud GET al endpoint de backend
-    const response = await fetch("http://localhost:8000/admin/reportes/suscripciones-por-categoria");
+    const response = await apiFetch("http://localhost:8000/admin/reportes/suscripciones-por-categoria");
 
     // Verificar si la solicitud fue exitosa
     if (!response.ok) {
@@ -216,7 +217,7 @@ const generateCategoryReport = async () => {
 const generateIncomeReport = async () => {
   try {
     // Hacer la solicitud GET al endpoint de backend
-    const response = await fetch("http://localhost:8000/admin/reportes/total-ingresos");
+    const response = await apiFetch("http://localhost:8000/admin/reportes/total-ingresos");
 
     // Verificar si la solicitud fue exitosa
     if (!response.ok) {
@@ -299,7 +300,7 @@ const generateIncomeReport = async () => {
 const generateSummaryReport = async () => {
   try {
     // Hacer la solicitud GET al endpoint de resumen
-    const response = await fetch("http://localhost:8000/admin/reportes/resumen");
+    const response = await apiFetch("http://localhost:8000/admin/reportes/resumen");
 
     // Verificar si la solicitud fue exitosa
     if (!response.ok) {
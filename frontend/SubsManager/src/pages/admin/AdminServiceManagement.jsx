@@ -1,6 +1,7 @@
 import { useEffect, useState } from "react";
 import DashboardLayout from "../../components/DashboardLayout";
 import url_fetch from '../../enviroment';
+import apiFetch from "../../apiFetch";
 
 export default function AdminServiceManagement() {
   const [services, setServices] = useState([]);
@@ -19,7 +20,7 @@ export default function AdminServiceManagement() {
   useEffect(() => {
     const fetchServices = async () => {
       try {
-        const response = await fetch(`${url_fetch}/admin/servicios`);
+        const response = await apiFetch(`${url_fetch}/admin/servicios`);
         const data = await response.json();
         // Procesar la respuesta según la nueva API
         setServices(
@@ -53,7 +54,7 @@ export default function AdminServiceManagement() {
     if (editing) {
       // PUT
       try {
-        await fetch(`${url_fetch}/admin/servicios/${form.id}`, {
+        await apiFetch(`${url_fetch}/admin/servicios/${form.id}`, {
           method: "PUT",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({
@@ -75,7 +76,7 @@ export default function AdminServiceManagement() {
     } else {
       // POST
       try {
-        const response = await fetch(`${url_fetch}/admin/servicios`, {
+        const response = await apiFetch(`${url_fetch}/admin/servicios`, {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({
@@ -116,7 +117,7 @@ export default function AdminServiceManagement() {
 
   const handleDelete = async (id) => {
     try {
-      await fetch(`${url_fetch}/admin/servicios/${id}`, {
+      await apiFetch(`${url_fetch}/admin/servicios/${id}`, {
         method: "DELETE",
       });
       setServices((prev) => prev.filter((s) => s.id !== id));
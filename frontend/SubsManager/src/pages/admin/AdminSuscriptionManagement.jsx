@@ -1,6 +1,7 @@
-import { useState, useMemo, useEffect } from "react";
+import { useState, useEffect } from "react";
 import DashboardLayout from "../../components/DashboardLayout";
 import url_fetch from '../../enviroment';
+import apiFetch from "../../apiFetch";
 
 export default function AdminSubscriptionManagement() {
     const [subscriptions, setSubscriptions] = useState([]);
@@ -11,44 +12,68 @@ export default function AdminSubscriptionManagement() {
     const [dateFrom, setDateFrom] = useState("");
     const [dateTo, setDateTo] = useState("");
 
-    // Obtener suscripciones del backend
+    const [categories, setCategories] = useState(["todos"]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [total, setTotal] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+
+    // Categorías disponibles a partir del catálogo de servicios
     useEffect(() => {
-        const fetchSubscriptions = async () => {
+        const fetchCategories = async () => {
             try {
-                const response = await fetch(`${url_fetch}/admin/suscripciones`);
+                const response = await apiFetch(`${url_fetch}/admin/servicios`);
                 const data = await response.json();
-                setSubscriptions(data.suscripciones || []);
+                const setCat = new Set((data.planes_servicios || []).map(s => s.Category));
+                setCategories(["todos", ...Array.from(setCat)]);
             } catch (error) {
-                setSubscriptions([]);
-            } finally {
-                setLoading(false);
+                setCategories(["todos"]);
             }
         };
-        fetchSubscriptions();
+        fetchCategories();
     }, []);
 
-    // Obtener categorías únicas
-    const categories = useMemo(() => {
-        const setCat = new Set(subscriptions.map(sub => sub.category));
-        return ["todos", ...Array.from(setCat)];
-    }, [subscriptions]);
+    // Obtener una página de suscripciones ya filtradas por el backend
+    const fetchSubscriptions = async (cursor = null) => {
+        const params = new URLSearchParams();
+        if (cursor) params.append("cursor", cursor);
+        if (statusFilter !== "todos") params.append("status", statusFilter);
+        if (categoryFilter !== "todos") params.append("category", categoryFilter);
+        const prefix = dateType === "start" ? "start" : "end";
+        if (dateFrom) params.append(`${prefix}_from`, dateFrom);
+        if (dateTo) params.append(`${prefix}_to`, dateTo);
+        const response = await apiFetch(`${url_fetch}/admin/suscripciones?${params}`);
+        const data = await response.json();
+        setNextCursor(data.next_cursor || null);
+        if (!cursor) setTotal(data.total ?? null);
+        return data.suscripciones || [];
+    };
 
-    // Filtrado
-    const filteredSubscriptions = useMemo(() => {
-        return subscriptions.filter((sub) => {
-            const matchStatus = statusFilter === "todos" || sub.Status === statusFilter || sub.status === statusFilter;
-            const matchCategory = categoryFilter === "todos" || sub.category === categoryFilter;
-            let matchDate = true;
-            const dateField = dateType === "start" ? sub.StartDate : sub.EndDate;
-            if (dateFrom) {
-                matchDate = dateField && dateField.slice(0, 10) >= dateFrom;
-            }
-            if (matchDate && dateTo) {
-                matchDate = dateField && dateField.slice(0, 10) <= dateTo;
+    // Primera página, se recarga al cambiar cualquier filtro
+    useEffect(() => {
+        const load = async () => {
+            setLoading(true);
+            try {
+                setSubscriptions(await fetchSubscriptions());
+            } catch (error) {
+                setSubscriptions([]);
+                setTotal(null);
+            } finally {
+                setLoading(false);
             }
-            return matchStatus && matchCategory && matchDate;
-        });
-    }, [subscriptions, statusFilter, categoryFilter, dateType, dateFrom, dateTo]);
+        };
+        load();
+    }, [statusFilter, categoryFilter, dateType, dateFrom, dateTo]);
+
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const page = await fetchSubscriptions(nextCursor);
+            setSubscriptions(subs => [...subs, ...page]);
+        } catch (error) {
+        } finally {
+            setLoadingMore(false);
+        }
+    };
 
     const getStatusColor = (status) => {
         switch (status) {
@@ -155,14 +180,14 @@ export default function AdminSubscriptionManagement() {
                             </tr>
                         </thead>
                         <tbody>
-                            {filteredSubscriptions.length === 0 ? (
+                            {subscriptions.length === 0 ? (
                                 <tr>
                                     <td colSpan="7" className="text-center p-4 text-gray-500">
                                         No se encontraron suscripciones con esos filtros.
                                     </td>
                                 </tr>
                             ) : (
-                                filteredSubscriptions.map((sub) => (
+                                subscriptions.map((sub) => (
                                     <tr key={sub.SubscriptionId || sub.id} className="border-t">
                                         <td className="p-2">{sub.user}</td>
                                         <td className="p-2">{sub.email}</td>
@@ -180,6 +205,23 @@ export default function AdminSubscriptionManagement() {
                     </table>
                 )}
             </div>
+
+            {!loading && (
+                <div className="flex items-center justify-between mt-4">
+                    <span className="text-sm text-gray-600">
+                        Mostrando {subscriptions.length}{total !== null ? ` de ${total}` : ""} suscripciones
+                    </span>
+                    {nextCursor && (
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="px-4 py-2 rounded bg-gray-200"
+                        >
+                            {loadingMore ? "Cargando..." : "Cargar más"}
+                        </button>
+                    )}
+                </div>
+            )}
         </DashboardLayout>
     );
 }
@@ -1,11 +1,19 @@
 import { useEffect, useState } from "react";
 import DashboardLayout from "../../components/DashboardLayout";
 import url_fetch from '../../enviroment';
+import apiFetch from "../../apiFetch";
 
 export default function UserManagement() {
   const [users, setUsers] = useState([]);
   const [loading, setLoading] = useState(true);
 
+  // Paginación y filtros del lado del servidor
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [search, setSearch] = useState("");
+  const [statusFilter, setStatusFilter] = useState("");
+  const [rolFilter, setRolFilter] = useState("");
+
   // Modal de edición
   const [showModal, setShowModal] = useState(false);
   const [editUser, setEditUser] = useState(null);
@@ -19,21 +27,44 @@ export default function UserManagement() {
   });
   const [showConfirm, setShowConfirm] = useState(false);
 
-  // Obtener usuarios del backend
+  // Obtener una página de usuarios del backend
+  const fetchUsers = async (cursor = null) => {
+    const params = new URLSearchParams();
+    if (cursor) params.append("cursor", cursor);
+    if (search.trim()) params.append("q", search.trim());
+    if (statusFilter) params.append("status", statusFilter);
+    if (rolFilter) params.append("rol", rolFilter);
+    const response = await apiFetch(`${url_fetch}/admin/usuarios?${params}`);
+    const data = await response.json();
+    setNextCursor(data.next_cursor || null);
+    return data.usuarios || [];
+  };
+
+  // Primera página, se recarga al cambiar los filtros
   useEffect(() => {
-    const fetchUsers = async () => {
+    const timer = setTimeout(async () => {
+      setLoading(true);
       try {
-        const response = await fetch(`${url_fetch}/admin/usuarios`);
-        const data = await response.json();
-        setUsers(data.usuarios || []);
+        setUsers(await fetchUsers());
       } catch (error) {
         setUsers([]);
       } finally {
         setLoading(false);
       }
-    };
-    fetchUsers();
-  }, []);
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [search, statusFilter, rolFilter]);
+
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await fetchUsers(nextCursor);
+      setUsers(users => [...users, ...page]);
+    } catch (error) {
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   // Abrir modal y cargar datos del usuario
   const openEditModal = (user) => {
@@ -76,7 +107,7 @@ export default function UserManagement() {
       if (editForm.NewPassword && editForm.NewPassword.trim() !== "") {
         body.newPassword = editForm.NewPassword;
       }
-      await fetch(`${url_fetch}/admin/usuarios/${editUser.UserId}`, {
+      await apiFetch(`${url_fetch}/admin/usuarios/${editUser.UserId}`, {
         method: "PUT",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(body),
@@ -103,10 +134,39 @@ export default function UserManagement() {
     <DashboardLayout>
       <h1 className="text-2xl font-bold mb-4">Gestión de Usuarios</h1>
 
+      <div className="flex gap-2 mb-4">
+        <input
+          type="text"
+          value={search}
+          onChange={(e) => setSearch(e.target.value)}
+          placeholder="Buscar por nombre, correo o usuario"
+          className="border px-3 py-2 rounded flex-1"
+        />
+        <select
+          value={statusFilter}
+          onChange={(e) => setStatusFilter(e.target.value)}
+          className="border px-3 py-2 rounded"
+        >
+          <option value="">Todos los estados</option>
+          <option value="active">Activo</option>
+          <option value="deactivated">Inactivo</option>
+          <option value="deleted">Eliminado</option>
+        </select>
+        <select
+          value={rolFilter}
+          onChange={(e) => setRolFilter(e.target.value)}
+          className="border px-3 py-2 rounded"
+        >
+          <option value="">Todos los roles</option>
+          <option value="user">Usuario</option>
+          <option value="administrator">Administrador</option>
+        </select>
+      </div>
+
       {loading ? (
         <p>Cargando usuarios...</p>
       ) : users.length === 0 ? (
-        <p>No hay usuarios registrados.</p>
+        <p>No se encontraron usuarios.</p>
       ) : (
         <table className="w-full text-left border">
           <thead className="bg-gray-200">
@@ -157,6 +217,18 @@ export default function UserManagement() {
         </table>
       )}
 
+      {!loading && nextCursor && (
+        <div className="flex justify-center mt-4">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="px-4 py-2 rounded bg-gray-200"
+          >
+            {loadingMore ? "Cargando..." : "Cargar más"}
+          </button>
+        </div>
+      )}
+
       {/* Modal de edición */}
       {showModal && (
         <div className="fixed inset-0 flex items-center justify-center bg-black bg-opacity-40 z-50">
@@ -3,6 +3,7 @@ import DashboardLayout from "../../components/DashboardLayout";
 import { useAuth } from "../../context/AuthContext";
 import url_fetch from '../../enviroment';
 import { useNavigate } from "react-router-dom";
+import apiFetch from "../../apiFetch";
 
 export default function PerfilUsuario() {
 
@@ -83,7 +84,7 @@ export default function PerfilUsuario() {
                 body.password = perfil.NewPassword;
             }
 
-            const response = await fetch(`${url_fetch}/update_user/${user.id}`, {
+            const response = await apiFetch(`${url_fetch}/update_user/${user.id}`, {
                 method: "PUT",
                 headers: {
                     "Content-Type": "application/json",
@@ -4,6 +4,7 @@ import { ResponsiveLine } from "@nivo/line";
 import DashboardLayout from "../../components/DashboardLayout";
 import url_fetch from "../../enviroment";
 import { useAuth } from "../../context/AuthContext";
+import apiFetch from "../../apiFetch";
 
 function decodeUtf8(text) {
   if (!text) return text;
@@ -19,8 +20,21 @@ function decodeUtf8(text) {
     .replace("Ã", "í");
 }
 
+// transacciones individuales que se muestran en el gráfico de barras
+const MAX_BARRAS = 100;
+
+// rango [from, to] del periodo elegido, en fechas YYYY-MM-DD
+function rangoPeriodo({ anio, mes }) {
+  if (mes === "Todos") return { from: `${anio}-01-01`, to: `${anio}-12-31` };
+  const ultimoDia = new Date(Number(anio), Number(mes), 0).getDate();
+  return { from: `${anio}-${mes}-01`, to: `${anio}-${mes}-${ultimoDia}` };
+}
+
 export default function SeguimientoGastos() {
   const { user } = useAuth();
+  // totales por mes y categoría de todo el historial, calculados por la API
+  const [resumen, setResumen] = useState([]);
+  // gastos individuales del periodo elegido
   const [datos, setDatos] = useState([]);
   const [periodo, setPeriodo] = useState(() => {
     const hoy = new Date();
@@ -30,89 +44,82 @@ export default function SeguimientoGastos() {
   
   useEffect(() => {
     if (user && user.id) {
-      fetch(`${url_fetch}/expenses/${user.id}`)
+      apiFetch(`${url_fetch}/expenses/${user.id}/summary`)
         .then(res => res.json())
-        .then(data => setDatos(data))
-        .catch(() => setDatos([]));
+        .then(data => setResumen(data.por_mes_categoria || []))
+        .catch(() => setResumen([]));
     }
   }, [user]);
 
+  useEffect(() => {
+    if (user && user.id && periodo.anio) {
+      const { from, to } = rangoPeriodo(periodo);
+      apiFetch(`${url_fetch}/expenses/${user.id}?from=${from}&to=${to}&limit=${MAX_BARRAS}`)
+        .then(res => res.json())
+        .then(data => setDatos(data.gastos || []))
+        .catch(() => setDatos([]));
+    } else {
+      setDatos([]);
+    }
+  }, [user, periodo]);
+
   const añosDisponibles = useMemo(() => {
-    const años = datos.map(tx => new Date(tx.fecha).getFullYear());
+    const años = resumen.map(fila => Number(fila.mes.slice(0, 4)));
     return Array.from(new Set(años)).sort((a, b) => b - a);
-  }, [datos]);
+  }, [resumen]);
 
   useEffect(() => {
-    if (datos.length > 0) {
-      const años = Array.from(new Set(datos.map(tx => new Date(tx.fecha).getFullYear()))).sort((a, b) => b - a);
-      if (!periodo.anio || !años.includes(Number(periodo.anio))) {
-        setPeriodo(prev => ({ ...prev, anio: años[0].toString() }));
+    if (añosDisponibles.length > 0) {
+      if (!periodo.anio || !añosDisponibles.includes(Number(periodo.anio))) {
+        setPeriodo(prev => ({ ...prev, anio: añosDisponibles[0].toString() }));
       }
     } else {
       setPeriodo(prev => ({ ...prev, anio: "" }));
     }
-  }, [datos]);
-
-const gastosFiltrados = useMemo(() => {
-  return datos.filter(tx => {
-    const fecha = new Date(tx.fecha + "T12:00:00");
-    const anio = fecha.getFullYear().toString();
-    const mes = (fecha.getMonth() + 1).toString().padStart(2, "0");
-    //console.log("TX:", tx, "anio:", anio, "mes:", mes, "periodo:", periodo.anio, periodo.mes);
-    if (anio !== periodo.anio) return false;
-    if (periodo.mes !== "Todos" && mes !== periodo.mes) return false;
-    return true;
-  });
-}, [datos, periodo]);
+  }, [añosDisponibles]);
 
-
-
-  useEffect(() => {
-    console.log("periodo actual:", periodo);
-    console.log("gastos filtrados:", gastosFiltrados);
-  }, [gastosFiltrados, periodo]);
+  // filas del resumen (mes, categoría) que caen en el periodo elegido
+  const resumenPeriodo = useMemo(() => {
+    return resumen.filter(fila => {
+      const [anio, mes] = fila.mes.split("-");
+      if (anio !== periodo.anio) return false;
+      if (periodo.mes !== "Todos" && mes !== periodo.mes) return false;
+      return true;
+    });
+  }, [resumen, periodo]);
 
 
   const dataParaBar = useMemo(() => {
-    return gastosFiltrados.map((tx, i) => ({
+    return datos.map((tx, i) => ({
       label: `${decodeUtf8(tx.categoria)} [${tx.id}]`, 
       monto: tx.monto,
       categoria: decodeUtf8(tx.categoria),
       fecha: tx.fecha,
       id: tx.id
     }));
-  }, [gastosFiltrados]);
+  }, [datos]);
 
 
   const totalPorMesPorCategoria = useMemo(() => {
     const anio = periodo.anio;
     const meses = Array.from({ length: 12 }, (_, i) => (i + 1).toString().padStart(2, "0"));
-    const categorias = Array.from(
-      new Set(datos
-        .filter(tx => (new Date(tx.fecha + "T12:00:00").getFullYear().toString()) === anio)
-        .map(tx => decodeUtf8(tx.categoria))
-      )
-    );
+    const delAnio = resumen.filter(fila => fila.mes.startsWith(`${anio}-`));
+    const categorias = Array.from(new Set(delAnio.map(fila => decodeUtf8(fila.categoria))));
 
     return categorias.map(categoria => ({
       id: categoria, 
       data: meses.map(mes => {
         
-        const total = datos
-          .filter(tx => {
-            const fecha = new Date(tx.fecha + "T12:00:00");
-            const a = fecha.getFullYear().toString();
-            const m = (fecha.getMonth() + 1).toString().padStart(2, "0");
-            return a === anio && m === mes && decodeUtf8(tx.categoria) === categoria;
-          })
-          .reduce((acc, tx) => acc + tx.monto, 0);
+        const total = delAnio
+          .filter(fila => fila.mes === `${anio}-${mes}` && decodeUtf8(fila.categoria) === categoria)
+          .reduce((acc, fila) => acc + fila.total, 0);
         return {
           x: new Date(0, parseInt(mes) - 1).toLocaleString("es-ES", { month: "short" }),
           y: total
         };
       })
     }));
-  }, [datos, periodo.anio]);
+  }, [resumen, periodo.anio]);
 
 
   return (
@@ -318,17 +325,17 @@ const gastosFiltrados = useMemo(() => {
             <div className="bg-blue-50 rounded-lg p-4">
               <p className="text-sm font-medium text-blue-700">Total gastado</p>
               <p className="text-2xl font-bold text-blue-900">
-                ${gastosFiltrados.reduce((a, tx) => a + tx.monto, 0).toFixed(2)}
+                ${resumenPeriodo.reduce((a, fila) => a + fila.total, 0).toFixed(2)}
               </p>
             </div>
             <div className="bg-green-50 rounded-lg p-4">
               <p className="text-sm font-medium text-green-700">Categoría principal</p>
               <p className="text-2xl font-bold text-green-900">
-                {gastosFiltrados.length > 0
+                {resumenPeriodo.length > 0
                   ? Object.entries(
-                      gastosFiltrados.reduce((acc, tx) => {
-                        const categoria = decodeUtf8(tx.categoria);
-                        acc[categoria] = (acc[categoria] || 0) + tx.monto;
+                      resumenPeriodo.reduce((acc, fila) => {
+                        const categoria = decodeUtf8(fila.categoria);
+                        acc[categoria] = (acc[categoria] || 0) + fila.total;
                         return acc;
                       }, {})
                     ).sort((a, b) => b[1] - a[1])[0][0]
@@ -337,7 +344,7 @@ const gastosFiltrados = useMemo(() => {
             </div>
             <div className="bg-purple-50 rounded-lg p-4">
               <p className="text-sm font-medium text-purple-700">N° de transacciones</p>
-              <p className="text-2xl font-bold text-purple-900">{gastosFiltrados.length}</p>
+              <p className="text-2xl font-bold text-purple-900">{resumenPeriodo.reduce((a, fila) => a + fila.transacciones, 0)}</p>
             </div>
           </div>
         </div>
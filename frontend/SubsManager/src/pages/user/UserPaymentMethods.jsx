@@ -3,6 +3,7 @@ import DashboardLayout from "../../components/DashboardLayout";
 import url_fetch from "../../enviroment";
 import { useAuth } from "../../context/AuthContext";
 import { Dialog } from "@headlessui/react";
+import apiFetch from "../../apiFetch";
 
 export default function UserPaymentMethods() {
     const { user } = useAuth();
@@ -32,7 +33,7 @@ export default function UserPaymentMethods() {
     // Obtener métodos de pago
     async function fetchPaymentMethods() {
         try {
-            const res = await fetch(`${url_fetch}/payment-methods/${user.id}`);
+            const res = await apiFetch(`${url_fetch}/payment-methods/${user.id}`);
             const data = await res.json();
             if (data.success) {
                 setMetodos(
@@ -67,7 +68,7 @@ export default function UserPaymentMethods() {
     // Obtener historial de transacciones
     async function fetchWalletTransactions() {
         try {
-            const res = await fetch(`${url_fetch}/wallet/transactions/${user.id}`);
+            const res = await apiFetch(`${url_fetch}/wallet/transactions/${user.id}`);
             const data = await res.json();
             if (data.success) {
                 setTransacciones(
@@ -122,7 +123,7 @@ export default function UserPaymentMethods() {
             balance: 0
         };
         try {
-            const res = await fetch(`${url_fetch}/payment-methods`, {
+            const res = await apiFetch(`${url_fetch}/payment-methods`, {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify(body),
@@ -142,7 +143,7 @@ export default function UserPaymentMethods() {
     // Eliminar método de pago
     async function eliminarMetodoAPI(paymentMethodId) {
         try {
-            const res = await fetch(
+            const res = await apiFetch(
                 `${url_fetch}/payment-methods/${user.id}/${paymentMethodId}`,
                 { method: "DELETE" }
             );
@@ -178,7 +179,7 @@ export default function UserPaymentMethods() {
 
     async function editarSaldoEfectivoAPI(paymentMethodId, nuevoSaldo) {
         try {
-            const res = await fetch(`${url_fetch}/payment-methods/${user.id}/${paymentMethodId}`, {
+            const res = await apiFetch(`${url_fetch}/payment-methods/${user.id}/${paymentMethodId}`, {
                 method: "PUT",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({
@@ -222,7 +223,7 @@ export default function UserPaymentMethods() {
             return;
         }
         try {
-            const res = await fetch(`${url_fetch}/wallet/recharge-from-method/${user.id}`, {
+            const res = await apiFetch(`${url_fetch}/wallet/recharge-from-method/${user.id}`, {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({
@@ -3,6 +3,7 @@ import { Dialog } from "@headlessui/react";
 import DashboardLayout from "../../components/DashboardLayout";
 import url_fetch from '../../enviroment';
 import { useAuth } from "../../context/AuthContext";
+import apiFetch from "../../apiFetch";
 
 export default function UserServiceExplorer() {
   const [busqueda, setBusqueda] = useState("");
@@ -23,7 +24,7 @@ export default function UserServiceExplorer() {
   useEffect(() => {
     const fetchServicios = async () => {
       try {
-        const response = await fetch(`${url_fetch}/admin/servicios`);
+        const response = await apiFetch(`${url_fetch}/admin/servicios`);
         const data = await response.json();
 
         // Agrupa servicios y planes según la nueva respuesta
@@ -64,7 +65,7 @@ export default function UserServiceExplorer() {
   // --- Cambia esto para que fetchWalletBalance esté disponible en todo el componente ---
   const fetchWalletBalance = async () => {
     try {
-      const res = await fetch(`${url_fetch}/wallet/balance/${user.id}`);
+      const res = await apiFetch(`${url_fetch}/wallet/balance/${user.id}`);
       const data = await res.json();
       if (data.success) {
         setUserWalletBalance(data.balance);
@@ -127,7 +128,7 @@ export default function UserServiceExplorer() {
     }
 
     try {
-      const res = await fetch(
+      const res = await apiFetch(
         `${url_fetch}/pay/plan/${user.id}`,
         {
           method: "POST",
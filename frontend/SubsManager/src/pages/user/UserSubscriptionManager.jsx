@@ -3,6 +3,7 @@ import DashboardLayout from "../../components/DashboardLayout";
 import { useAuth } from "../../context/AuthContext";
 import url_fetch from '../../enviroment';
 import { useNavigate } from "react-router-dom";
+import apiFetch from "../../apiFetch";
 
 export default function PerfilUsuario() {
   const { user } = useAuth(); 
@@ -15,11 +16,7 @@ export default function PerfilUsuario() {
   useEffect(() => {
     const fetchSuscripciones = async () => {
       try {
-        const response = await fetch(`${url_fetch}/subscription/${user.id}`, {
-          headers: {
-            Authorization: `Bearer ${localStorage.getItem("token")}`,  
-          },
-        });
+        const response = await apiFetch(`${url_fetch}/subscription/${user.id}`);
 
         const data = await response.json();
         if (data.success) {
@@ -45,7 +42,7 @@ const cancelarSuscripcion = async (subscriptionId) => {
 
   try {
 
-    const response = await fetch(`${url_fetch}/subscription/cancelled/${user.id}/${subscriptionId}`, {
+    const response = await apiFetch(`${url_fetch}/subscription/cancelled/${user.id}/${subscriptionId}`, {
       method: "PUT", 
     });
 